@@ -5,7 +5,7 @@ import logging
 from datetime import datetime, timedelta
 from functools import lru_cache
 from math import ceil, floor
-from typing import List, Tuple, Union
+from typing import Dict, List, Tuple, Union
 
 from simfantasy.actor import Actor
 from simfantasy.aura import Aura, TickingAura
@@ -48,6 +48,8 @@ class Action:
             Action(s) that are on the same recast timer. Default: None.
         sim (simfantasy.simulator.Simulation): The simulation where the action is performed.
         source (simfantasy.actor.Actor): The actor that performed the action.
+        speed_cache (Dict[datetime.timedelta, datetime.timedelta]): Delays already shortened by
+            :meth:`speed`, until auras that change the source's speed come or go.
     """
     animation: timedelta = timedelta(seconds=0.75)
     base_cast_time: timedelta = timedelta()
@@ -64,18 +66,24 @@ class Action:
         self.sim: Simulation = sim
         self.source: Actor = source
         self.can_recast_at: datetime = None
-        self.speed = lru_cache(maxsize=None)(self._speed)
+        self.speed_cache: Dict[timedelta, timedelta] = {}
 
     @property
     def ready(self):
         """Flag that indicates if the action can be performed or not.
 
+        Actions that deal damage can't be performed while the enemies are untargetable, nor
+        actions with a cast time while the encounter keeps everyone moving, see
+        :mod:`simfantasy.encounter`.
+
         Returns:
             bool: True if the action can be performed, False otherwise.
         """
         return not self.on_cooldown \
                and (self.source.animation_up or self.animation == timedelta()) \
-               and (self.is_off_gcd or self.source.gcd_up)
+               and (self.is_off_gcd or self.source.gcd_up) \
+               and not (self.sim.untargetable and self.potency) \
+               and not (self.sim.moving and self.base_cast_time)
 
     @property
     def name(self):
@@ -180,7 +188,7 @@ class Action:
         if self.potency is not None:
             self.sim.schedule(
                 DamageEvent(self.sim, self.source, self.source.target, self, self.potency,
-                            self._trait_multipliers, self._buff_multipliers, self.guarantee_crit),
+                            self._trait_multipliers, self._buff_mask, self.guarantee_crit),
                 self.animation_execute_time)
 
     def set_recast_at(self, delta: timedelta):
@@ -313,59 +321,98 @@ class Action:
     def type_ii_speed_mod(self):
         return 0
 
+    def speed(self, action_delay: timedelta) -> timedelta:
+        """Shorten an action delay by the source's speed, remembering it until
+        :attr:`speed_cache` is cleared.
+
+        Arguments:
+            action_delay (datetime.timedelta): The delay.
+
+        Returns:
+            datetime.timedelta: The shortened delay.
+        """
+        speed = self.speed_cache.get(action_delay)
+
+        if speed is None:
+            speed = self.speed_cache[action_delay] = self._speed(action_delay)
+
+        return speed
+
     def _speed(self, action_delay: timedelta) -> timedelta:
-        speed = self.source.stats[self.hastened_by]
+        return action_speed(action_delay, self.source.stats[self.hastened_by], self.source.level,
+                            self.type_ii_speed_mod)
 
-        sub_stat = sub_stat_per_level[self.source.level]
-        divisor = divisor_per_level[self.source.level]
+    @property
+    def _buff_mask(self) -> int:
+        return self.source.buff_mask
 
-        # TODO Implement all these buffs.
+    @property
+    def _trait_multipliers(self) -> Tuple[float, ...]:
+        return ()
 
-        rapid_fire = False
+    def __str__(self):
+        return '<{cls}>'.format(cls=self.__class__.__name__)
 
-        if rapid_fire:
-            return timedelta(seconds=1.5)
 
-        arrow_mod = 0
-        haste_mod = 0
-        fey_wind_mod = 0
+@lru_cache(maxsize=None)
+def action_speed(action_delay: timedelta, speed: int, level: int,
+                 type_2_mod: int = 0) -> timedelta:
+    """Shorten an action delay, e.g., the GCD, by a speed attribute and haste effects.
 
-        riddle_of_fire = False
-        riddle_of_fire_mod = 115 if riddle_of_fire else 100
+    Arguments:
+        action_delay (datetime.timedelta): The unmodified delay.
+        speed (int): Value of the attribute that hastens the action.
+        level (int): Level of the actor performing the action.
+        type_2_mod (int): Percentage haste from type II effects, e.g.,
+            :class:`~simfantasy.jobs.bard.ArmysPaeonBuff`. Default: 0.
+
+    Returns:
+        datetime.timedelta: The modified delay.
+
+    Examples:
+        >>> action_speed(timedelta(seconds=2.5), 907, 70)
+        datetime.timedelta(seconds=2, microseconds=420000)
+        >>> action_speed(timedelta(seconds=2.5), 907, 70, type_2_mod=16)
+        datetime.timedelta(seconds=2, microseconds=30000)
+    """
+    sub_stat = sub_stat_per_level[level]
+    divisor = divisor_per_level[level]
 
-        astral_umbral = False
-        astral_umbral_mod = 50 if astral_umbral else 100
+    # TODO Implement all these buffs.
 
-        type_1_mod = 0
-        type_2_mod = self.type_ii_speed_mod
+    rapid_fire = False
 
-        gcd_m = 1000 - floor(130 * (speed - sub_stat) / divisor)
-        gcd_m = floor(gcd_m * action_delay.total_seconds())
+    if rapid_fire:
+        return timedelta(seconds=1.5)
 
-        gcd_c_a = floor(100 - arrow_mod) * ((100 - type_1_mod) / 100)
-        gcd_c_a = floor(gcd_c_a * ((100 - haste_mod) / 100))
-        gcd_c_a = floor(gcd_c_a - fey_wind_mod)
-        gcd_c_b = (100 - type_2_mod) / 100
+    arrow_mod = 0
+    haste_mod = 0
+    fey_wind_mod = 0
 
-        gcd_c = ceil(gcd_c_a * gcd_c_b)
-        gcd_c = floor(gcd_c * gcd_m / 100)
-        gcd_c = floor(gcd_c * riddle_of_fire_mod / 1000)
-        gcd_c = floor(gcd_c * astral_umbral_mod / 100)
+    riddle_of_fire = False
+    riddle_of_fire_mod = 115 if riddle_of_fire else 100
 
-        gcd = gcd_c / 100
+    astral_umbral = False
+    astral_umbral_mod = 50 if astral_umbral else 100
 
-        return timedelta(seconds=gcd)
+    type_1_mod = 0
 
-    @property
-    def _buff_multipliers(self) -> List[float]:
-        return [1.0]
+    gcd_m = 1000 - floor(130 * (speed - sub_stat) / divisor)
+    gcd_m = floor(gcd_m * action_delay.total_seconds())
 
-    @property
-    def _trait_multipliers(self) -> List[float]:
-        return [1.0]
+    gcd_c_a = floor(100 - arrow_mod) * ((100 - type_1_mod) / 100)
+    gcd_c_a = floor(gcd_c_a * ((100 - haste_mod) / 100))
+    gcd_c_a = floor(gcd_c_a - fey_wind_mod)
+    gcd_c_b = (100 - type_2_mod) / 100
 
-    def __str__(self):
-        return '<{cls}>'.format(cls=self.__class__.__name__)
+    gcd_c = ceil(gcd_c_a * gcd_c_b)
+    gcd_c = floor(gcd_c * gcd_m / 100)
+    gcd_c = floor(gcd_c * riddle_of_fire_mod / 1000)
+    gcd_c = floor(gcd_c * astral_umbral_mod / 100)
+
+    gcd = gcd_c / 100
+
+    return timedelta(seconds=gcd)
 
 
 class AutoAttackAction(Action):
@@ -390,7 +437,7 @@ class AutoAttackAction(Action):
     def create_damage_event(self):
         self.sim.schedule(
             AutoAttackEvent(self.sim, self.source, self.source.target, self, self.potency,
-                            self._trait_multipliers, self._buff_multipliers, self.guarantee_crit))
+                            self._trait_multipliers, self._buff_mask, self.guarantee_crit))
 
 
 class MeleeAttackAction(AutoAttackAction):
@@ -1,16 +1,21 @@
 import logging
+import sys
 from abc import abstractmethod
 from datetime import datetime, timedelta
-from math import floor
-from typing import Any, Dict, Iterable, List, TYPE_CHECKING, Tuple, Union
+from functools import lru_cache
+from math import ceil, floor
+from typing import Any, Dict, Iterable, List, Optional, TYPE_CHECKING, Tuple, Type, Union
 
 import humanfriendly
+import numpy
 
-from simfantasy.common_math import get_base_resources_by_job, get_base_stats_by_job, \
-    get_racial_attribute_bonuses, main_stat_per_level, piety_per_level, sub_stat_per_level
+from simfantasy.common_math import base_resource_by_job, base_stats_by_job, job_index, \
+    main_attributes, main_stat_per_level, piety_per_level, race_index, racial_attribute_bonuses, \
+    sub_stat_per_level
 from simfantasy.enum import Attribute, Job, Race, Resource, Role, Slot
 from simfantasy.equipment import Item, Materia, Weapon
 from simfantasy.simulator import Simulation
+from simfantasy.stat_block import StatBlock, calculate_stat_block
 
 if TYPE_CHECKING:
     from simfantasy.aura import Aura
@@ -18,6 +23,30 @@ if TYPE_CHECKING:
 logger = logging.getLogger(__name__)
 
 
+@lru_cache(maxsize=None)
+def buff_multiplier_table(multipliers: Tuple[float, ...]) -> Tuple[Tuple[float, ...], ...]:
+    """Precompute the damage multipliers in effect for every combination of active buffs.
+
+    Bit ``n`` of a buff mask corresponds to ``multipliers[n]``, and the multipliers for a mask keep
+    that order, since each one is floored separately when applied.
+
+    Arguments:
+        multipliers (Tuple[float, ...]): Damage multiplier of each buff, in bit order.
+
+    Returns:
+        Tuple[Tuple[float, ...], ...]: The ordered multipliers, indexed by buff mask.
+
+    Examples:
+        >>> table = buff_multiplier_table((1.1, 1.2))
+        >>> table[0b00], table[0b01], table[0b10], table[0b11]
+        ((), (1.1,), (1.2,), (1.1, 1.2))
+    """
+    return tuple(
+        tuple(multiplier for bit, multiplier in enumerate(multipliers) if mask & (1 << bit))
+        for mask in range(1 << len(multipliers))
+    )
+
+
 class TargetData:
     def __init__(self, sim: Simulation, source: 'Actor') -> None:
         pass
@@ -30,10 +59,10 @@ class Actions:
     def invalidate_speed_caches(self):
         for _, action in vars(self).items():
             # Safety check in case classes dervied from Actor set instance attributes.
-            if not hasattr(action, 'speed') or not hasattr(action.speed, '__wrapped__'):
+            if not hasattr(action, 'speed_cache'):
                 continue
 
-            action.speed.cache_clear()
+            action.speed_cache.clear()
 
 
 class Buffs:
@@ -59,6 +88,8 @@ class Actor:
         name (Optional[str]): Name of the actor.
         gear (Optional[Dict[~simfantasy.enum.Slot, Union[~simfantasy.equipment.Item, ~simfantasy.equipment.Weapon]]]):
             Collection of equipment that the actor is wearing.
+        health (Optional[int]): Health pool of an enemy, see :mod:`simfantasy.health`. Default: None, for
+            an actor that never dies.
 
     Attributes:
         _target_data (Dict[~simfantasy.actor.Actor, ~simfantasy.actor.TargetData): Mapping of actors
@@ -67,10 +98,18 @@ class Actor:
             actions again without being inhibited by animation lockout.
         auras (List[simfantasy.aura.Aura]): Auras, both friendly and hostile, that exist on the
             actor.
+        buff_mask (int): Bitmask of the :attr:`damage_buffs` currently affecting damage dealt by
+            the actor.
+        buff_multiplier_table (Tuple[Tuple[float, ...], ...]): Ordered damage multipliers for
+            every value of :attr:`buff_mask`.
         gcd_unlock_at (datetime.datetime): Timestamp when the actor will be able to execute GCD
             actions again without being inhibited by GCD lockout.
         gear (Optional[Dict[~simfantasy.enum.Slot, Union[~simfantasy.equipment.Item, ~simfantasy.equipment.Weapon]]]):
             Collection of equipment that the actor is wearing.
+        health (Optional[int]): Health pool of an enemy, or None for an actor that never dies.
+        health_to_milestone (int): Health left before the next health milestone, the
+            :attr:`~simfantasy.simulator.Simulation.execute_health` and then zero. Damage events subtract from it
+            and call :meth:`reach_milestone` once it runs out.
         job (simfantasy.enum.Job): The actor's job specialization.
         level (int): Level of the actor.
         name (str): Name of the actor.
@@ -79,6 +118,8 @@ class Actor:
             tuple containing the current amount and maximum capacity.
         sim (simfantasy.simulator.Simulation): Pointer to the simulation that the actor is
             participating in.
+        stat_block (simfantasy.stat_block.StatBlock): Attribute totals from level, job, clan and
+            gear, shared by every iteration.
         statistics (Dict[str, List[Dict[Any, Any]]]): Collection of different event occurrences that
             are used for reporting and visualizations.
         stats (Dict[~simfantasy.enums.Attribute, int]): Mapping of attribute type to amount.
@@ -91,7 +132,7 @@ class Actor:
     # TODO Get rid of level?
     def __init__(self, sim: Simulation, race: Race = None, level: int = None,
                  target: 'Actor' = None, name: str = None,
-                 gear: Dict[Slot, Union[Item, Weapon]] = None) -> None:
+                 gear: Dict[Slot, Union[Item, Weapon]] = None, health: int = None) -> None:
         if level is None:
             level = 70
 
@@ -106,6 +147,11 @@ class Actor:
         self.level: int = level
         self.target: 'Actor' = target
         self.name: str = name
+        self.health: Optional[int] = health
+
+        # Health left at each milestone still ahead, the next one first.
+        self._milestones: List[int] = []
+        self.health_to_milestone: int = sys.maxsize
 
         self._target_data: Dict['Actor', TargetData] = {}
         self.actions = None
@@ -117,10 +163,19 @@ class Actor:
 
         self.stats: Dict[Attribute, int] = {}
         self.gear: Dict[Slot, Union[Item, Weapon]] = {}
+        self._stat_block: StatBlock = None
         self.equip_gear(gear)
 
         self.resources: Dict[Resource, Tuple[int, int]] = {}
 
+        damage_buffs = self.damage_buffs
+        self._buff_bits: Dict[Type[Aura], int] = {
+            aura: 1 << bit for bit, aura in enumerate(damage_buffs)
+        }
+        self.buff_multiplier_table: Tuple[Tuple[float, ...], ...] = buff_multiplier_table(
+            tuple(aura.damage_multiplier for aura in damage_buffs))
+        self.buff_mask: int = 0
+
         self.sim.actors.append(self)
         logger.debug('Initialized: %s', self)
 
@@ -128,9 +183,9 @@ class Actor:
         """Prepare the actor for combat."""
         self.auras.clear()
 
-        self.stats = self.calculate_base_stats()
-        self.apply_gear_attribute_bonuses()
+        self.stats = self.stat_block.as_dict()
         self.resources = self.calculate_resources()
+        self.buff_mask = 0
 
         self.statistics = {
             'auras': [],
@@ -145,6 +200,116 @@ class Actor:
         self.create_actions()
         self.create_buffs()
 
+        self._reset_health()
+
+    def _reset_health(self) -> None:
+        """Fill the actor's health pool, and set out the milestones on its way down."""
+        if self.health is None:
+            self._milestones = []
+            self.health_to_milestone = sys.maxsize
+
+            return
+
+        self._milestones = [0]
+
+        # The encounter's execute phase is up to the enemies it can't be won without.
+        if self.sim.execute_health is not None and self.required:
+            self._milestones.insert(0, ceil(self.health * self.sim.execute_health))
+
+        self.health_to_milestone = self.health - self._milestones[0]
+
+    @property
+    def required(self) -> bool:
+        """Whether combat ends when the actor dies, i.e., it isn't one of the adds of the
+        simulation's :attr:`~simfantasy.simulator.Simulation.encounter`.
+
+        Returns:
+            bool: True unless the actor is an add.
+        """
+        return self.sim.encounter is None or self not in self.sim.encounter.adds
+
+    @property
+    def remaining_health(self) -> Optional[int]:
+        """Health the actor has left.
+
+        Returns:
+            Optional[int]: Health left, or None if the actor has no health pool.
+        """
+        if self.health is None:
+            return None
+
+        return max(self.health_to_milestone + (self._milestones[0] if self._milestones else 0), 0)
+
+    def reach_milestone(self) -> None:
+        """Pass the health milestones that damage has brought the actor to.
+
+        Falling to the :attr:`~simfantasy.simulator.Simulation.execute_health` starts the encounter's execute
+        phase, and falling to zero ends combat. Adds that fall to zero only die, see :attr:`required`, and
+        actors targeting them turn back to the enemy.
+        """
+        from simfantasy.event import CombatEndEvent
+
+        while self._milestones and self.health_to_milestone <= 0:
+            milestone = self._milestones.pop(0)
+
+            if self._milestones:
+                self.health_to_milestone += milestone - self._milestones[0]
+                self.sim.executing = True
+
+                logger.debug('[%s] %s %s enters execute', self.sim.current_iteration,
+                             self.sim.relative_timestamp, self)
+            else:
+                logger.debug('[%s] %s %s dies', self.sim.current_iteration,
+                             self.sim.relative_timestamp, self)
+
+                if not self.required:
+                    enemy = self.sim.encounter.adds[self]
+
+                    for actor in self.sim.actors:
+                        if actor.target is self:
+                            actor.target = enemy
+
+                    continue
+
+                # Combat ends before anything else that happens at the same time.
+                end = CombatEndEvent(self.sim)
+                end.timestamp = self.sim.current_time
+                self.sim.events.put((end.timestamp, datetime.min, end))
+
+    @property
+    def damage_buffs(self) -> Tuple[Type['Aura'], ...]:
+        """Aura classes with a :attr:`~simfantasy.aura.Aura.damage_multiplier` that affect the
+        actor's damage, in the order their multipliers are applied.
+
+        Returns:
+            Tuple[Type[simfantasy.aura.Aura], ...]: Aura classes, in bit order for :attr:`buff_mask`.
+        """
+        return ()
+
+    @property
+    def stat_buffs(self) -> Tuple[Type['Aura'], ...]:
+        """Aura classes with :attr:`~simfantasy.aura.Aura.stat_multipliers` that the actor can
+        gain during combat.
+
+        Gear sets only deal the same damage if their multiplied attributes fall in the same tiers
+        too, see :meth:`TierIndex.tiers <simfantasy.tiers.TierIndex.tiers>`.
+
+        Returns:
+            Tuple[Type[simfantasy.aura.Aura], ...]: Aura classes.
+        """
+        return ()
+
+    def buff_bit(self, aura: 'Aura') -> int:
+        """Return the bit representing an aura in :attr:`buff_mask`.
+
+        Arguments:
+            aura (simfantasy.aura.Aura): The aura to look up.
+
+        Returns:
+            int: The aura's bit, or 0 if it isn't one of the actor's :attr:`damage_buffs`.
+        """
+        return self._buff_bits.get(type(aura), 0)
+
     def create_actions(self):
         self.actions = Actions(self.sim, self)
 
@@ -160,13 +325,12 @@ class Actor:
         In particular, sets the HP, MP and TP resource levels.
         """
         main_stat = main_stat_per_level[self.level]
-        job_resources = get_base_resources_by_job(self.job)
 
         # FIXME It's broken.
         # @formatter:off
-        hp = floor(3600 * (job_resources[Resource.HP] / 100)) + floor(
+        hp = floor(3600 * (base_resource_by_job(self.job, Resource.HP) / 100)) + floor(
             (self.stats[Attribute.VITALITY] - main_stat) * 21.5)
-        mp = floor((job_resources[Resource.MP] / 100) * ((6000 * (self.stats[Attribute.PIETY] - 292) / 2170) + 12000))
+        mp = floor((base_resource_by_job(self.job, Resource.MP) / 100) * ((6000 * (self.stats[Attribute.PIETY] - 292) / 2170) + 12000))
         # @formatter:on
 
         return {
@@ -257,6 +421,34 @@ class Actor:
         """
         return self.animation_unlock_at is None or self.animation_unlock_at <= self.sim.current_time
 
+    @property
+    def stat_block(self) -> StatBlock:
+        """Return the attribute totals for the actor's level, job, clan and gear.
+
+        The block is computed once and reused by every iteration. Equipping gear through
+        :meth:`equip_gear` updates it incrementally; items that are modified in place afterwards
+        must be re-equipped to be noticed.
+
+        Returns:
+            simfantasy.stat_block.StatBlock: The memoized attribute totals.
+
+        Examples:
+            .. testsetup::
+                >>> sim = Simulation()
+                >>> actor = Actor(sim, race=Race.HIGHLANDER)
+
+            >>> actor.stat_block.as_dict() == {**dict.fromkeys(Attribute, 0),
+            ...                                **actor.calculate_base_stats()}
+            True
+        """
+        stat_block = self._stat_block
+
+        if stat_block is None or stat_block.level != self.level or stat_block.race is not self.race:
+            stat_block = self._stat_block = calculate_stat_block(self.level, self.job, self.role,
+                                                                 self.race, self.gear)
+
+        return stat_block
+
     def equip_gear(self, gear: Dict[Slot, Union[Weapon, Item]]):
         """Equip items in the appropriate slots."""
         for slot, item in gear.items():
@@ -265,6 +457,15 @@ class Actor:
 
             self.gear[slot] = item
 
+            if self._stat_block is not None:
+                self._stat_block = self._stat_block.with_item(slot, item)
+
+    def unequip_gear(self, slots: Iterable[Slot]):
+        """Empty equipment slots."""
+        for slot in slots:
+            if self.gear.pop(slot, None) is not None and self._stat_block is not None:
+                self._stat_block = self._stat_block.with_item(slot, None)
+
     def apply_gear_attribute_bonuses(self):
         """Apply stat bonuses gained from items and melds.
 
@@ -345,8 +546,8 @@ class Actor:
         Returns:
             Dict[Attribute, int]: Mapping of attributes to amounts.
         """
-        base_main_stat = main_stat_per_level[self.level]
-        base_sub_stat = sub_stat_per_level[self.level]
+        base_main_stat = int(main_stat_per_level[self.level])
+        base_sub_stat = int(sub_stat_per_level[self.level])
 
         base_stats = {
             Attribute.STRENGTH: 0,
@@ -362,14 +563,14 @@ class Actor:
             Attribute.PIETY: base_main_stat,
         }
 
-        job_stats = get_base_stats_by_job(self.job)
-        race_stats = get_racial_attribute_bonuses(self.race)
+        bonuses = numpy.floor(base_main_stat * (base_stats_by_job[job_index(self.job)] / 100)) + \
+            racial_attribute_bonuses[race_index(self.race)]
 
-        for stat, bonus in job_stats.items():
-            base_stats[stat] += floor(base_main_stat * (bonus / 100)) + race_stats[stat]
+        for stat in main_attributes:
+            base_stats[stat] += int(bonuses[stat.value])
 
         if self.role is Role.HEALER:
-            base_stats[Attribute.PIETY] += piety_per_level[self.level]
+            base_stats[Attribute.PIETY] += int(piety_per_level[self.level])
 
         return base_stats
 
@@ -2,10 +2,10 @@ import logging
 from abc import ABC, abstractmethod
 from datetime import datetime, timedelta
 from math import floor
-from typing import TYPE_CHECKING
+from typing import Dict, TYPE_CHECKING
 
 from simfantasy.actor import Actor
-from simfantasy.enum import RefreshBehavior
+from simfantasy.enum import Attribute, RefreshBehavior
 from simfantasy.simulator import Simulation
 
 if TYPE_CHECKING:
@@ -20,6 +20,11 @@ class Aura(ABC):
     Attributes:
         application_event (simfantasy.event.ApplyAuraEvent): Pointer to the scheduled event that
             will apply the aura to the target.
+        buff_bit (int): The aura's bit in the source's :attr:`~simfantasy.actor.Actor.buff_mask`,
+            or 0 if it doesn't modify the source's damage.
+        damage_multiplier (float): Multiplier applied to damage dealt by the source while the aura
+            is active. Must be listed in the source's :attr:`~simfantasy.actor.Actor.damage_buffs`.
+            Default: None.
         duration (datetime.timedelta): Initial duration of the aura.
         expiration_event (simfantasy.event.ExpireAuraEvent): Pointer to the scheduled event that
             will remove the aura from the target.
@@ -29,14 +34,19 @@ class Aura(ABC):
         refresh_extension (datetime.timedelta): For :class:`simfantasy.enums.RefreshBehavior.EXTEND_TO_MAX`,
             this defines the amount of time that should be added to the aura's current remaining
             time.
+        stat_multipliers (Dict[~simfantasy.enum.Attribute, float]): Multipliers applied to the
+            target's attributes while the aura is active. Must be listed in the target's
+            :attr:`~simfantasy.actor.Actor.stat_buffs`. Default: None.
         stacks (int): The current number of stacks that the aura has accumulated. Should be less
             than or equal to `max_stacks`.
     """
 
+    damage_multiplier: float = None
     duration: timedelta = None
     max_stacks: int = 1
     refresh_behavior: RefreshBehavior = None
     refresh_extension: timedelta = None
+    stat_multipliers: Dict[Attribute, float] = None
 
     def __init__(self, sim: Simulation, source: Actor) -> None:
         self.sim: Simulation = sim
@@ -44,6 +54,7 @@ class Aura(ABC):
         self.application_event: ApplyAuraEvent = None
         self.expiration_event: ExpireAuraEvent = None
         self.stacks: int = 0
+        self.buff_bit: int = 0 if self.damage_multiplier is None else source.buff_bit(self)
 
     @property
     def name(self) -> str:
@@ -98,6 +109,9 @@ class Aura(ABC):
         self.stacks = 1
         target.auras.append(self)
 
+        if self.buff_bit:
+            self.source.buff_mask |= self.buff_bit
+
     def expire(self, target) -> None:
         """Remove the aura from the target.
 
@@ -108,6 +122,9 @@ class Aura(ABC):
         Arguments:
             target (simfantasy.actor.Actor): The target that the aura will be removed from.
         """
+        if self.buff_bit:
+            self.source.buff_mask &= ~self.buff_bit
+
         try:
             self.stacks = 0
             target.auras.remove(self)
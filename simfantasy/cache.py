@@ -0,0 +1,447 @@
+# -*- coding: utf-8 -*-
+"""On-disk cache of simulation results, addressed by the content of the simulation.
+
+Two simulations with the same actors, gear, parameters and seed, run by the same version of
+:mod:`simfantasy`, produce the same results. :class:`ResultCache` stores the results of such runs
+under a hash of all of those inputs, so repeating a run only costs a file read.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import pickle
+from datetime import timedelta
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+import humanfriendly
+import numpy
+import pandas as pd
+
+from simfantasy.equipment import Item, Weapon
+from simfantasy.simulator import Simulation, SimulationResults
+from simfantasy.sketch import DEVIATIONS
+
+LOGGER = logging.getLogger(__name__)
+
+CACHE_FORMAT = 1
+"""Version of the cache entry layout. Entries written with another version are ignored."""
+
+
+@lru_cache(maxsize=None)
+def code_fingerprint() -> str:
+    """Hash the source code of :mod:`simfantasy`, so results are never reused across versions.
+
+    The installed version of :mod:`numpy` is included as well, since it provides the random number
+    generator.
+
+    Returns:
+        str: Hexadecimal digest of every module in the package.
+    """
+    digest = hashlib.sha256(numpy.__version__.encode())
+    package = Path(__file__).parent
+
+    for path in sorted(package.rglob('*.py')):
+        digest.update(path.relative_to(package).as_posix().encode())
+        digest.update(path.read_bytes())
+
+    return digest.hexdigest()
+
+
+def describe_item(item: Item) -> Dict[str, Any]:
+    """Describe everything about an item that can affect a simulation.
+
+    Names and item levels are left out, since they are only for convenience.
+
+    Arguments:
+        item (simfantasy.equipment.Item): The item to describe.
+
+    Returns:
+        Dict[str, Any]: JSON-serializable description of the item.
+
+    Examples:
+        >>> from simfantasy.enum import Attribute, Slot
+        >>> from simfantasy.equipment import Materia
+        >>> describe_item(Item(350, Slot.RING, {Attribute.DEXTERITY: 149},
+        ...                    melds=[Materia(Attribute.DIRECT_HIT, 40)], name='Ring'))
+        {'slot': 'RING', 'stats': [['DEXTERITY', 149]], 'melds': [['DIRECT_HIT', 40]]}
+    """
+    description: Dict[str, Any] = {
+        'slot': item.slot.name,
+        'stats': sorted([attribute.name, bonus] for attribute, bonus in item.stats.items()),
+        'melds': [[materia.attribute.name, materia.bonus] for materia in item.melds],
+    }
+
+    if isinstance(item, Weapon):
+        description.update({
+            'magic_damage': item.magic_damage,
+            'physical_damage': item.physical_damage,
+            'delay': item.delay,
+            'auto_attack': item.auto_attack,
+        })
+
+    return description
+
+
+def describe_simulation(sim: Simulation) -> Dict[str, Any]:
+    """Describe everything about a simulation that can affect its results.
+
+    Actors are described by their class, clan, level, target and gear, but not by name, so that
+    actors with randomly generated names can still share results.
+
+    Arguments:
+        sim (simfantasy.simulator.Simulation): The simulation to describe.
+
+    Returns:
+        Dict[str, Any]: JSON-serializable description of the simulation.
+    """
+
+    def microseconds(delta: timedelta) -> int:
+        return delta // timedelta(microseconds=1)
+
+    def describe_entry(entry) -> Dict[str, Any]:
+        description: Dict[str, Any] = {'class': entry.__class__.__name__}
+
+        for name, value in sorted(vars(entry).items()):
+            if isinstance(value, timedelta):
+                value = microseconds(value)
+            elif any(value is actor for actor in sim.actors):
+                value = sim.actors.index(value)
+
+            description[name] = value
+
+        return description
+
+    return {
+        'combat_length': microseconds(sim.combat_length),
+        'execute_time': microseconds(sim.execute_time),
+        'execute_health': sim.execute_health,
+        'iterations': sim.iterations,
+        'seed': sim.seed,
+        'target_error': sim.target_error,
+        'confidence': sim.confidence,
+        'min_iterations': sim.min_iterations,
+        'common_random_numbers': sim.common_random_numbers,
+        'sampler': sim.sampler,
+        'encounter': None if sim.encounter is None else [
+            describe_entry(entry) for entry in sim.encounter.entries
+        ],
+        'actors': [
+            {
+                'class': '{0.__module__}.{0.__qualname__}'.format(actor.__class__),
+                'race': None if actor.race is None else actor.race.name,
+                'level': actor.level,
+                'health': actor.health,
+                'target': None if actor.target is None else sim.actors.index(actor.target),
+                'gear': sorted([slot.name, describe_item(item)]
+                               for slot, item in actor.gear.items()),
+            }
+            for actor in sim.actors
+        ],
+    }
+
+
+def simulation_key(sim: Simulation) -> str:
+    """Compute the stable cache key of a simulation.
+
+    Arguments:
+        sim (simfantasy.simulator.Simulation): The simulation.
+
+    Returns:
+        str: Hexadecimal digest of :func:`describe_simulation` and :func:`code_fingerprint`.
+
+    Examples:
+        .. testsetup::
+            >>> from simfantasy.actor import Actor
+            >>> from simfantasy.enum import Race
+
+        Actor names don't matter, but everything else does:
+
+        >>> first, second = Simulation(seed=1), Simulation(seed=1)
+        >>> _ = Actor(first, Race.ENEMY, name='Striking Dummy'), Actor(second, Race.ENEMY)
+        >>> simulation_key(first) == simulation_key(second)
+        True
+        >>> second.iterations += 1
+        >>> simulation_key(first) == simulation_key(second)
+        False
+    """
+    description = json.dumps([CACHE_FORMAT, code_fingerprint(), describe_simulation(sim)],
+                             sort_keys=True)
+
+    return hashlib.sha256(description.encode()).hexdigest()
+
+
+def summarize_damage(damage: pd.DataFrame) -> pd.DataFrame:
+    """Aggregate damage events into per-iteration totals of each source, target and action.
+
+    The summary has the same ``source``, ``target``, ``action``, ``dot`` and ``damage`` columns
+    as the events, so :meth:`SimulationResults.dps <simfantasy.simulator.SimulationResults.dps>`
+    works on either. ``hits``, ``critical`` and ``direct`` count the hits of each group, and the
+    control variate columns in :data:`~simfantasy.sketch.DEVIATIONS` are summed, if present.
+
+    Arguments:
+        damage (pandas.DataFrame): Damage events, indexed by iteration.
+
+    Returns:
+        pandas.DataFrame: Damage totals, indexed by iteration.
+    """
+    if damage.empty:
+        return damage
+
+    grouped = damage.groupby([damage.index, 'source', 'target', 'action', 'dot'], observed=True)
+
+    summary = grouped.agg(damage=('damage', 'sum'), hits=('damage', 'size'),
+                          critical=('critical', 'sum'), direct=('direct', 'sum'),
+                          **{column: (column, 'sum') for column in DEVIATIONS if column in damage})
+
+    return summary.reset_index(level=['source', 'target', 'action', 'dot'])
+
+
+def rename_actors(frame: pd.DataFrame, names: Dict[str, str]) -> pd.DataFrame:
+    """Replace actor names in the ``source`` and ``target`` columns of stored events.
+
+    Actors are described without their names, see :func:`describe_simulation`, so events stored
+    by one simulation name actors that another, equivalent simulation calls differently.
+
+    Arguments:
+        frame (pandas.DataFrame): Stored events.
+        names (Dict[str, str]): Mapping of stored names to current names.
+
+    Returns:
+        pandas.DataFrame: A copy of the events, with current names.
+
+    Examples:
+        >>> damage = pd.DataFrame({'source': ['a1b2'], 'target': ['c3d4'], 'damage': [1200]})
+        >>> rename_actors(damage, {'a1b2': 'Bard', 'c3d4': 'Enemy'})[['source', 'target']]
+          source target
+        0   Bard  Enemy
+    """
+    frame = frame.copy()
+
+    for column in ('source', 'target'):
+        if column in frame:
+            frame[column] = frame[column].astype(str).replace(names).astype('category')
+
+    return frame
+
+
+class ResultCache:
+    """Size-bounded, least-recently-used cache of simulation results on disk.
+
+    Only seeded simulations are cached, since unseeded runs are not meant to be repeatable.
+
+    Arguments:
+        directory (Optional[Union[str, os.PathLike]]): Where entries are stored. Default:
+            ``simfantasy`` in ``$XDG_CACHE_HOME``, or in ``~/.cache``.
+        max_size (Optional[Union[int, str]]): Total size of all entries, in bytes or as a
+            human-readable size, e.g., ``'500 MB'``. Default: 1 GB.
+        events (Optional[bool]): True to also store every aura, damage and resource event, rather
+            than just damage totals per iteration. Default: False.
+
+    Attributes:
+        directory (pathlib.Path): Where entries are stored.
+        events (bool): True to also store every aura, damage and resource event.
+        max_size (int): Total size of all entries, in bytes.
+
+    Examples:
+        .. testsetup::
+            >>> import tempfile
+            >>> from simfantasy.actor import Actor
+            >>> from simfantasy.enum import Attribute, Race, Slot
+            >>> from simfantasy.jobs.bard import Bard
+            >>> directory = tempfile.TemporaryDirectory()
+            >>> sim = Simulation(combat_length=timedelta(seconds=15), iterations=2, seed=7)
+            >>> enemy = Actor(sim, Race.ENEMY)
+            >>> bard = Bard(sim, Race.HIGHLANDER, target=enemy,
+            ...             gear={Slot.WEAPON: Weapon(370, 70, 104, 3.04, 105.38,
+            ...                                       {Attribute.DEXTERITY: 347})})
+
+        >>> cache = ResultCache(directory.name)
+        >>> cache.get(sim) is None
+        True
+        >>> results = cache.run(sim, report=False)
+        >>> cached = cache.get(sim)
+        >>> cached.dps(bard.name).tolist() == results.dps(bard.name).tolist()
+        True
+
+        .. testcleanup::
+            >>> directory.cleanup()
+    """
+
+    def __init__(self, directory: Union[str, os.PathLike] = None,
+                 max_size: Union[int, str] = None, events: bool = None) -> None:
+        if directory is None:
+            directory = Path(os.environ.get('XDG_CACHE_HOME', Path.home() / '.cache'),
+                             'simfantasy')
+
+        self.directory: Path = Path(directory)
+
+        if max_size is None:
+            max_size = '1 GB'
+
+        if isinstance(max_size, str):
+            max_size = humanfriendly.parse_size(max_size)
+
+        self.max_size: int = max_size
+
+        if events is None:
+            events = False
+
+        self.events: bool = events
+
+    def path(self, key: str) -> Path:
+        """Return the file that holds an entry.
+
+        Arguments:
+            key (str): The entry's :func:`simulation_key`.
+
+        Returns:
+            pathlib.Path: Location of the entry.
+        """
+        return self.directory / '{0}.pickle'.format(key)
+
+    def get(self, sim: Simulation) -> Optional[SimulationResults]:
+        """Load the cached results of a simulation.
+
+        Arguments:
+            sim (simfantasy.simulator.Simulation): The simulation.
+
+        Returns:
+            Optional[simfantasy.simulator.SimulationResults]: The cached results, with actor names
+            replaced by those of the simulation's actors, or None if there are none.
+        """
+        if sim.seed is None:
+            return None
+
+        path = self.path(simulation_key(sim))
+
+        try:
+            with path.open('rb') as file:
+                entry = pickle.load(file)
+        except FileNotFoundError:
+            return None
+        except (EOFError, pickle.UnpicklingError):
+            LOGGER.warning('Discarding unreadable cache entry %s.', path)
+            path.unlink()
+
+            return None
+
+        if entry.get('format') != CACHE_FORMAT:
+            return None
+
+        # Mark the entry as recently used.
+        os.utime(path)
+
+        names = dict(zip(entry['actors'], (actor.name for actor in sim.actors)))
+
+        frames = [rename_actors(entry[name], names) for name in ('auras', 'damage', 'resources')]
+        sketches = entry.get('sketches')
+
+        if sketches is not None:
+            sketches = sketches.rename(names)
+
+        return SimulationResults(sim, *frames, sketches=sketches,
+                                 durations=entry.get('durations'))
+
+    def put(self, sim: Simulation, results: SimulationResults) -> None:
+        """Store the results of a simulation, then evict entries to stay within :attr:`max_size`.
+
+        Arguments:
+            sim (simfantasy.simulator.Simulation): The simulation.
+            results (simfantasy.simulator.SimulationResults): Its results.
+        """
+        if sim.seed is None:
+            return
+
+        if self.events:
+            auras, damage, resources = results.auras, results.damage, results.resources
+        else:
+            auras, damage, resources = pd.DataFrame(), summarize_damage(results.damage), \
+                pd.DataFrame()
+
+        entry = {
+            'format': CACHE_FORMAT,
+            'actors': [actor.name for actor in sim.actors],
+            'auras': auras,
+            'damage': damage,
+            'resources': resources,
+            'sketches': results.sketches,
+            'durations': results.durations,
+        }
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        path = self.path(simulation_key(sim))
+        partial = path.with_suffix('.partial')
+
+        with partial.open('wb') as file:
+            pickle.dump(entry, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+        os.replace(partial, path)
+
+        self.evict()
+
+    def run(self, sim: Simulation, report: bool = None) -> SimulationResults:
+        """Return the cached results of a simulation, running and caching it if there are none.
+
+        Arguments:
+            sim (simfantasy.simulator.Simulation): The simulation.
+            report (Optional[bool]): True to show the terminal report. Default: True.
+
+        Returns:
+            simfantasy.simulator.SimulationResults: Results of the simulation.
+        """
+        if report is None:
+            report = True
+
+        results = self.get(sim)
+
+        if results is None:
+            results = sim.run(report=report)
+            self.put(sim, results)
+        else:
+            LOGGER.info('Loaded %s iterations from the cache.', results.dps().size)
+
+            if report is True:
+                self._report(sim, results)
+
+        return results
+
+    def entries(self) -> List[Path]:
+        """List stored entries, least recently used first.
+
+        Returns:
+            List[pathlib.Path]: Locations of the entries.
+        """
+        if not self.directory.exists():
+            return []
+
+        return sorted(self.directory.glob('*.pickle'), key=lambda path: path.stat().st_mtime)
+
+    def evict(self) -> None:
+        """Delete least recently used entries until the rest fit within :attr:`max_size`."""
+        entries = self.entries()
+        sizes = [path.stat().st_size for path in entries]
+        total = sum(sizes)
+
+        for path, size in zip(entries, sizes):
+            if total <= self.max_size:
+                break
+
+            LOGGER.debug('Evicting cache entry %s.', path)
+            path.unlink()
+            total -= size
+
+    def clear(self) -> None:
+        """Delete every entry."""
+        for path in self.entries():
+            path.unlink()
+
+    @staticmethod
+    def _report(sim: Simulation, results: SimulationResults) -> None:
+        from simfantasy.reporting import TerminalReporter
+
+        TerminalReporter(sim, auras=results.auras, damage=results.damage,
+                         resources=results.resources, sketches=results.sketches).report()
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""Periodic checkpoints of completed iterations, so long runs can resume after an interruption."""
+
+import logging
+import os
+import pickle
+from pathlib import Path
+from typing import Any, List, Optional, TYPE_CHECKING, Tuple, Union
+
+import pandas as pd
+
+from simfantasy.error import CheckpointMismatchError
+
+if TYPE_CHECKING:
+    from simfantasy.simulator import Simulation
+
+LOGGER = logging.getLogger(__name__)
+
+Frames = Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]
+
+
+def _dump(path: Path, obj: Any) -> None:
+    partial = path.with_suffix('.partial')
+
+    with partial.open('wb') as file:
+        pickle.dump(obj, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    os.replace(partial, path)
+
+
+class Checkpoint:
+    """Completed iterations of a simulation, saved to a directory in chunks.
+
+    Every :meth:`save` writes the aura, damage and resource events of the iterations completed
+    since the previous save as a new chunk, then records how many iterations are complete along
+    with the state of the random number generator at that point. Both writes are atomic, so a
+    crash at any moment leaves the last complete checkpoint intact.
+
+    Resuming a seeded simulation from a checkpoint produces the same results as an uninterrupted
+    run, since every iteration draws from the generator in the same order.
+
+    Arguments:
+        sim (simfantasy.simulator.Simulation): The simulation being checkpointed.
+        directory (Union[str, os.PathLike]): Where checkpoints are stored.
+
+    Attributes:
+        completed (int): Number of iterations saved so far.
+        directory (pathlib.Path): Where checkpoints are stored.
+        key (str): :func:`~simfantasy.cache.simulation_key` of the simulation, which a checkpoint
+            must match to be resumed.
+        names (List[str]): Names of the simulation's actors. Saved events are renamed to these,
+            by position, when they are loaded, since actor names don't take part in the key.
+        rng_state (Optional[Tuple]): State of :mod:`numpy.random` after the last saved iteration.
+
+    Examples:
+        .. testsetup::
+            >>> import tempfile
+            >>> import numpy
+            >>> from simfantasy.simulator import Simulation
+            >>> directory = tempfile.TemporaryDirectory()
+            >>> sim = Simulation(iterations=1000, seed=42)
+
+        >>> damage = pd.DataFrame({'iteration': [0, 1], 'damage': [1200, 1500]})
+        >>> Checkpoint(sim, directory.name).save(2, numpy.random.get_state(),
+        ...                                      (pd.DataFrame(), damage, pd.DataFrame()))
+        >>> resumed = Checkpoint(sim, directory.name)
+        >>> auras, damage, resources = resumed.load()
+        >>> resumed.completed, damage['damage'].tolist()
+        (2, [1200, 1500])
+
+        A checkpoint can't be resumed by a different simulation:
+
+        >>> sim.iterations = 2000
+        >>> Checkpoint(sim, directory.name).load()
+        Traceback (most recent call last):
+            ...
+        simfantasy.error.CheckpointMismatchError: Checkpoint in ... belongs to a different simulation
+
+        .. testcleanup::
+            >>> directory.cleanup()
+    """
+
+    def __init__(self, sim: 'Simulation', directory: Union[str, os.PathLike]) -> None:
+        from simfantasy.cache import simulation_key
+
+        self.directory: Path = Path(directory)
+        self.key: str = simulation_key(sim)
+        self.names: List[str] = [actor.name for actor in sim.actors]
+        self.completed: int = 0
+        self.rng_state: Optional[Tuple] = None
+        self._chunks: List[str] = []
+
+    @property
+    def state_path(self) -> Path:
+        return self.directory / 'state.pickle'
+
+    def load(self) -> Optional[Frames]:
+        """Read the last checkpoint, if there is one.
+
+        Returns:
+            Optional[Tuple[pandas.DataFrame, pandas.DataFrame, pandas.DataFrame]]: Aura, damage
+            and resource events of every saved iteration, or None if nothing was saved yet.
+
+        Raises:
+            simfantasy.error.CheckpointMismatchError: The checkpoint belongs to a different
+                simulation, or to a different version of :mod:`simfantasy`.
+        """
+        from simfantasy.cache import rename_actors
+
+        try:
+            with self.state_path.open('rb') as file:
+                state = pickle.load(file)
+        except FileNotFoundError:
+            return None
+
+        if state['key'] != self.key:
+            raise CheckpointMismatchError(self.directory)
+
+        self.completed = state['completed']
+        self.rng_state = state['rng_state']
+        self._chunks = state['chunks']
+
+        chunks = []
+
+        for name in self._chunks:
+            with (self.directory / name).open('rb') as file:
+                chunks.append(pickle.load(file))
+
+        LOGGER.info('Resuming after %s iterations from %s.', self.completed, self.directory)
+
+        # Actors with randomly generated names are called differently every run.
+        names = dict(zip(state['actors'], self.names))
+
+        return tuple(rename_actors(pd.concat([chunk[index] for chunk in chunks]), names)
+                     for index in range(3))  # type: ignore
+
+    def clear(self) -> None:
+        """Delete every saved chunk and start over."""
+        for path in self.directory.glob('chunk-*.pickle'):
+            path.unlink()
+
+        if self.state_path.exists():
+            self.state_path.unlink()
+
+        self.completed = 0
+        self.rng_state = None
+        self._chunks = []
+
+    def save(self, completed: int, rng_state: Tuple, frames: Frames) -> None:
+        """Save newly completed iterations.
+
+        Arguments:
+            completed (int): Number of iterations completed so far, including earlier saves.
+            rng_state (Tuple): State of :mod:`numpy.random` after the last completed iteration.
+            frames (Tuple[pandas.DataFrame, pandas.DataFrame, pandas.DataFrame]): Aura, damage
+                and resource events of the iterations completed since the last save.
+        """
+        if completed <= self.completed:
+            return
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        name = 'chunk-{0:09d}.pickle'.format(completed)
+        _dump(self.directory / name, frames)
+
+        self._chunks.append(name)
+        self.completed = completed
+        self.rng_state = rng_state
+
+        _dump(self.state_path, {
+            'key': self.key,
+            'actors': self.names,
+            'completed': completed,
+            'rng_state': rng_state,
+            'chunks': self._chunks,
+        })
+
+        LOGGER.debug('Checkpointed %s iterations to %s.', completed, self.directory)
@@ -0,0 +1,357 @@
+# -*- coding: utf-8 -*-
+"""Columnar export of simulation events, partitioned by iteration range.
+
+Every table, i.e., ``auras``, ``damage`` and ``resources``, is split into partitions of
+consecutive iterations. Each partition stores one ``.npy`` file per column, and columns of strings
+or other objects are dictionary-encoded: the file holds integer codes, and the dictionary is kept
+in ``manifest.json``, along with how long each iteration lasted when combat ended early.
+Reloading memory-maps the files, so opening an export costs the same no matter how large it is,
+and only the columns and partitions that are actually used are read.
+"""
+
+import json
+import os
+from datetime import timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Sequence, Union
+
+import numpy
+import pandas as pd
+
+EXPORT_FORMAT = 1
+"""Version of the export layout."""
+
+TABLES = ('auras', 'damage', 'resources')
+"""Names of the exported tables, in the order :meth:`Simulation.run
+<simfantasy.simulator.Simulation.run>` collects them."""
+
+
+def _encode(values: pd.Series) -> Dict[str, Any]:
+    if isinstance(values.dtype, pd.CategoricalDtype) or values.dtype == object:
+        categorical = values.astype(str).astype('category')
+
+        return {
+            'array': categorical.cat.codes.to_numpy(),
+            'categories': list(categorical.cat.categories),
+        }
+
+    return {'array': values.to_numpy(), 'categories': None}
+
+
+class ColumnarWriter:
+    """Append partitions of simulation events to an export directory.
+
+    Arguments:
+        directory (Union[str, os.PathLike]): Where the export is written.
+        combat_length (datetime.timedelta): Length of each simulated encounter, kept so that the
+            export can be analyzed on its own.
+        resume (Optional[bool]): True to keep partitions that were already written, e.g., when
+            resuming from a :class:`~simfantasy.checkpoint.Checkpoint`. Default: False.
+
+    Attributes:
+        directory (pathlib.Path): Where the export is written.
+        manifest (Dict[str, Any]): Description of every written partition.
+    """
+
+    def __init__(self, directory: Union[str, os.PathLike], combat_length: timedelta,
+                 resume: bool = None) -> None:
+        if resume is None:
+            resume = False
+
+        self.directory: Path = Path(directory)
+        self.manifest: Dict[str, Any] = {
+            'format': EXPORT_FORMAT,
+            'combat_length': combat_length.total_seconds(),
+            'durations': {},
+            'tables': {table: [] for table in TABLES},
+        }
+
+        manifest_path = self.directory / 'manifest.json'
+
+        if resume and manifest_path.exists():
+            with manifest_path.open() as file:
+                self.manifest = json.load(file)
+
+            self.manifest.setdefault('durations', {})
+
+    def truncate(self, iterations: int) -> None:
+        """Forget partitions of iterations past a point, e.g., the last checkpoint.
+
+        Arguments:
+            iterations (int): Number of iterations to keep.
+        """
+        for table, partitions in self.manifest['tables'].items():
+            self.manifest['tables'][table] = [
+                partition for partition in partitions if partition['stop'] <= iterations
+            ]
+
+        self.manifest['durations'] = {
+            iteration: seconds for iteration, seconds in self.manifest['durations'].items()
+            if int(iteration) < iterations
+        }
+
+        self._write_manifest()
+
+    def write(self, start: int, stop: int, frames: Mapping[str, pd.DataFrame],
+              durations: pd.Series = None) -> None:
+        """Write one partition of every table.
+
+        Arguments:
+            start (int): First iteration of the partition.
+            stop (int): Iteration after the last one of the partition.
+            frames (Mapping[str, pandas.DataFrame]): Events of each table, with an ``iteration``
+                column or index.
+            durations (Optional[pandas.Series]): Seconds each iteration of the partition lasted,
+                indexed by iteration, see :func:`~simfantasy.health.combat_lengths`. Default:
+                None, for iterations that lasted ``combat_length``.
+        """
+        if durations is not None:
+            self.manifest['durations'].update(
+                (str(iteration), float(seconds)) for iteration, seconds in durations.items())
+
+        for table, frame in frames.items():
+            if 'iteration' not in frame:
+                frame = frame.reset_index()
+
+            name = '{0}/{1:09d}-{2:09d}'.format(table, start, stop)
+            path = self.directory / name
+            path.mkdir(parents=True, exist_ok=True)
+
+            columns = {}
+
+            for column in frame.columns:
+                encoded = _encode(frame[column])
+                numpy.save(path / '{0}.npy'.format(column), encoded['array'], allow_pickle=False)
+                columns[column] = encoded['categories']
+
+            self.manifest['tables'][table].append({
+                'start': start,
+                'stop': stop,
+                'rows': len(frame),
+                'path': name,
+                'columns': columns,
+            })
+
+        self._write_manifest()
+
+    def _write_manifest(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        path = self.directory / 'manifest.json'
+        partial = path.with_suffix('.partial')
+
+        with partial.open('w') as file:
+            json.dump(self.manifest, file)
+
+        os.replace(partial, path)
+
+
+class ColumnarTable:
+    """One memory-mapped table of an export.
+
+    Arguments:
+        directory (pathlib.Path): The export directory.
+        partitions (List[Dict[str, Any]]): The table's partitions, from the manifest.
+
+    Attributes:
+        columns (List[str]): Column names.
+        partitions (List[Dict[str, Any]]): Iteration ranges, row counts and dictionaries of each
+            partition.
+    """
+
+    def __init__(self, directory: Path, partitions: List[Dict[str, Any]]) -> None:
+        self._directory: Path = directory
+        self.partitions: List[Dict[str, Any]] = [
+            partition for partition in partitions if partition['rows'] > 0
+        ]
+        self.columns: List[str] = list(self.partitions[0]['columns']) if self.partitions else []
+
+    def __len__(self) -> int:
+        return sum(partition['rows'] for partition in self.partitions)
+
+    def chunks(self, column: str) -> Iterator[numpy.ndarray]:
+        """Memory-map a column one partition at a time.
+
+        Dictionary-encoded columns yield their integer codes; see :meth:`categories`.
+
+        Arguments:
+            column (str): The column.
+
+        Yields:
+            numpy.ndarray: Read-only values of each partition.
+        """
+        for partition in self.partitions:
+            yield numpy.load(self._directory / partition['path'] / '{0}.npy'.format(column),
+                             mmap_mode='r')
+
+    def categories(self, column: str) -> List[List[str]]:
+        """Return the dictionary of each partition of a dictionary-encoded column.
+
+        Arguments:
+            column (str): The column.
+
+        Returns:
+            List[List[str]]: Dictionary of each partition, or empty if the column is not encoded.
+        """
+        return [partition['columns'][column] for partition in self.partitions
+                if partition['columns'][column] is not None]
+
+    def column(self, column: str) -> Union[numpy.ndarray, pd.Categorical]:
+        """Load a whole column.
+
+        Arguments:
+            column (str): The column.
+
+        Returns:
+            Union[numpy.ndarray, pandas.Categorical]: The values of every partition.
+        """
+        chunks = list(self.chunks(column))
+
+        if self.partitions[0]['columns'][column] is None:
+            return chunks[0] if len(chunks) == 1 else numpy.concatenate(chunks)
+
+        return pd.api.types.union_categoricals([
+            pd.Categorical.from_codes(codes, categories)
+            for codes, categories in zip(chunks, self.categories(column))
+        ])
+
+    def frames(self, columns: Sequence[str] = None) -> Iterator[pd.DataFrame]:
+        """Load the table one partition at a time, indexed by iteration.
+
+        Arguments:
+            columns (Optional[Sequence[str]]): Columns to load. Default: all of them.
+
+        Yields:
+            pandas.DataFrame: Events of each partition.
+        """
+        if columns is None:
+            columns = [column for column in self.columns if column != 'iteration']
+
+        for partition in self.partitions:
+            def load(column: str) -> Union[numpy.ndarray, pd.Categorical]:
+                values = numpy.load(
+                    self._directory / partition['path'] / '{0}.npy'.format(column), mmap_mode='r')
+                categories = partition['columns'][column]
+
+                if categories is None:
+                    return values
+
+                return pd.Categorical.from_codes(values, categories)
+
+            yield pd.DataFrame({column: load(column) for column in columns},
+                               index=pd.Index(load('iteration'), name='iteration'))
+
+    def to_frame(self, columns: Sequence[str] = None) -> pd.DataFrame:
+        """Load the table, or some of its columns, indexed by iteration.
+
+        Arguments:
+            columns (Optional[Sequence[str]]): Columns to load. Default: all of them.
+
+        Returns:
+            pandas.DataFrame: The table.
+        """
+        if not self.partitions:
+            return pd.DataFrame()
+
+        if columns is None:
+            columns = [column for column in self.columns if column != 'iteration']
+
+        frame = pd.DataFrame({column: self.column(column) for column in columns},
+                             index=pd.Index(self.column('iteration'), name='iteration'))
+
+        return frame
+
+
+class ColumnarExport:
+    """A memory-mapped export written by :meth:`Simulation.run
+    <simfantasy.simulator.Simulation.run>`.
+
+    Arguments:
+        directory (Union[str, os.PathLike]): The export directory.
+
+    Attributes:
+        combat_length (datetime.timedelta): Length of each simulated encounter.
+        durations (Optional[pandas.Series]): Seconds each iteration lasted, if not all of
+            ``combat_length``.
+        tables (Dict[str, simfantasy.columnar.ColumnarTable]): Tables, by name.
+
+    Examples:
+        .. testsetup::
+            >>> import tempfile
+            >>> directory = tempfile.TemporaryDirectory()
+
+        >>> damage = pd.DataFrame({'iteration': [0, 0, 1], 'action': ['Shot', 'Shot', 'Barrage'],
+        ...                        'damage': [100.0, 120.0, 300.0]})
+        >>> writer = ColumnarWriter(directory.name, timedelta(seconds=10))
+        >>> writer.write(0, 1, {'damage': damage[damage['iteration'] < 1]})
+        >>> writer.write(1, 2, {'damage': damage[damage['iteration'] >= 1]})
+        >>> export = ColumnarExport(directory.name)
+        >>> len(export.tables['damage'])
+        3
+        >>> frame = export.tables['damage'].to_frame()
+        >>> frame.index.tolist(), frame['action'].tolist()
+        ([0, 0, 1], ['Shot', 'Shot', 'Barrage'])
+        >>> export.dps().tolist()
+        [22.0, 30.0]
+
+        Iterations that ended early, e.g., with a kill, keep their own length:
+
+        >>> writer.truncate(1)
+        >>> writer.write(1, 2, {'damage': damage[damage['iteration'] >= 1]},
+        ...              pd.Series([6.0], index=[1]))
+        >>> ColumnarExport(directory.name).dps().tolist()
+        [22.0, 50.0]
+
+        .. testcleanup::
+            >>> directory.cleanup()
+    """
+
+    def __init__(self, directory: Union[str, os.PathLike]) -> None:
+        directory = Path(directory)
+
+        with (directory / 'manifest.json').open() as file:
+            manifest = json.load(file)
+
+        self.combat_length: timedelta = timedelta(seconds=manifest['combat_length'])
+        self.durations: Optional[pd.Series] = None
+
+        if manifest.get('durations'):
+            durations = manifest['durations']
+            self.durations = pd.Series(list(durations.values()), dtype=float,
+                                       index=pd.Index([int(key) for key in durations],
+                                                      name='iteration')).sort_index()
+        self.tables: Dict[str, ColumnarTable] = {
+            table: ColumnarTable(directory, partitions)
+            for table, partitions in manifest['tables'].items()
+        }
+
+    def dps(self) -> pd.Series:
+        """Calculate the damage per second dealt in each iteration, reading only two columns.
+
+        Returns:
+            pandas.Series: DPS, indexed by iteration.
+        """
+        table = self.tables['damage']
+        totals: Dict[int, float] = {}
+
+        for iterations, damage in zip(table.chunks('iteration'), table.chunks('damage')):
+            sums = pd.Series(damage).groupby(iterations).sum()
+
+            for iteration, total in sums.items():
+                totals[iteration] = totals.get(iteration, 0) + total
+
+        damage = pd.Series(totals, name='damage').rename_axis('iteration').sort_index()
+        seconds = self.combat_length.total_seconds()
+
+        if self.durations is not None:
+            return damage / self.durations.reindex(damage.index).fillna(seconds)
+
+        return damage / seconds
+
+    def to_frames(self) -> List[pd.DataFrame]:
+        """Load every table, in the order of :data:`TABLES`.
+
+        Returns:
+            List[pandas.DataFrame]: Aura, damage and resource events, indexed by iteration.
+        """
+        return [self.tables[table].to_frame() for table in TABLES]
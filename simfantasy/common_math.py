@@ -1,498 +1,289 @@
-from typing import Dict, List
+from types import MappingProxyType
+from typing import Dict, Iterable, Mapping, Optional, Tuple
+
+import numpy
 
 from simfantasy.enum import Attribute, Job, Race, Resource
 
-main_stat_per_level: List[int] = [
-    None, 20, 21, 22, 24, 26, 27, 29, 31, 33, 35, 36, 38, 41, 44, 46, 49, 52, 54, 57, 60, 63, 67,
+
+def _frozen(values: Iterable[int]) -> numpy.ndarray:
+    """
+    Create an immutable integer array.
+
+    :param values: Values of the array.
+    :return: A read-only :class:`numpy.ndarray`.
+    """
+    array = numpy.array(list(values), dtype=numpy.int64)
+    array.setflags(write=False)
+
+    return array
+
+
+main_stat_per_level: numpy.ndarray = _frozen([
+    0, 20, 21, 22, 24, 26, 27, 29, 31, 33, 35, 36, 38, 41, 44, 46, 49, 52, 54, 57, 60, 63, 67,
     71, 74, 78, 81, 85, 89, 92, 97, 101, 106, 110, 115, 119, 124, 128, 134, 139, 144, 150, 155, 161,
     166, 171, 177, 183, 189, 196, 202, 204, 205, 207, 209, 210, 212, 214, 215, 217, 218, 224, 228,
     236, 244, 252, 260, 268, 276, 284, 292
-]
+])
 """Base amount for primary stats per level."""
 
-sub_stat_per_level: List[int] = [
-    None, 56, 57, 60, 62, 65, 68, 70, 73, 76, 78, 82, 85, 89, 93, 96, 100, 104, 109, 113, 116, 122,
+sub_stat_per_level: numpy.ndarray = _frozen([
+    0, 56, 57, 60, 62, 65, 68, 70, 73, 76, 78, 82, 85, 89, 93, 96, 100, 104, 109, 113, 116, 122,
     127, 133, 138, 144, 150, 155, 162, 168, 173, 181, 188, 194, 202, 209, 215, 223, 229, 236, 244,
     253, 263, 272, 283, 292, 302, 311, 322, 331, 341, 342, 344, 345, 346, 347, 349, 350, 351, 352,
     354, 355, 356, 357, 358, 359, 360, 361, 362, 363, 364,
-]
+])
 """Base amount for secondary stats per level."""
 
-divisor_per_level: List[int] = [
-    None, 56, 57, 60, 62, 65, 68, 70, 73, 76, 78, 82, 85, 89, 93, 96, 100, 104, 109, 113, 116, 122,
+divisor_per_level: numpy.ndarray = _frozen([
+    0, 56, 57, 60, 62, 65, 68, 70, 73, 76, 78, 82, 85, 89, 93, 96, 100, 104, 109, 113, 116, 122,
     127, 133, 138, 144, 150, 155, 162, 168, 173, 181, 188, 194, 202, 209, 215, 223, 229, 236, 244,
     253, 263, 272, 283, 292, 302, 311, 322, 331, 341, 393, 444, 496, 548, 600, 651, 703, 755, 806,
     858, 941, 1032, 1133, 1243, 1364, 1497, 1643, 1802, 1978, 2170,
-]
+])
 """Divisor for multiple calculations per level."""
 
-piety_per_level: List[int] = [
-    None, 50, 55, 60, 65, 70, 75, 80, 85, 90, 95, 100, 105, 110, 115, 120, 125, 130, 135, 140, 145,
+piety_per_level: numpy.ndarray = _frozen([
+    0, 50, 55, 60, 65, 70, 75, 80, 85, 90, 95, 100, 105, 110, 115, 120, 125, 130, 135, 140, 145,
     150, 155, 160, 165, 170, 175, 180, 185, 190, 195, 200, 205, 210, 215, 220, 225, 230, 235, 240,
     245, 250, 255, 260, 265, 270, 275, 280, 285, 290, 300, 315, 330, 360, 390, 420, 450, 480, 510,
     540, 620, 650, 680, 710, 740, 770, 800, 830, 860, 890, 890
-]
+])
 
-mp_per_level: List[int] = [
-    None, 104, 114, 123, 133, 142, 152, 161, 171, 180, 190, 209, 228, 247, 266, 285, 304, 323, 342,
+mp_per_level: numpy.ndarray = _frozen([
+    0, 104, 114, 123, 133, 142, 152, 161, 171, 180, 190, 209, 228, 247, 266, 285, 304, 323, 342,
     361, 380, 418, 456, 494, 532, 570, 608, 646, 684, 722, 760, 826, 893, 959, 1026, 1092, 1159,
     1225, 1292, 1358, 1425, 1548, 1672, 1795, 1919, 2042, 2166, 2289, 2413, 2536, 2660, 3000, 3380,
     3810, 4300, 4850, 5470, 6170, 6950, 7840, 8840, 8980, 9150, 9350, 9590, 9870, 10190, 10560,
     10980, 11450, 12000
-]
+])
+
+main_attributes: Tuple[Attribute, ...] = (
+    Attribute.STRENGTH,
+    Attribute.DEXTERITY,
+    Attribute.VITALITY,
+    Attribute.INTELLIGENCE,
+    Attribute.MIND,
+)
+"""Primary attributes, in the column order used by the job and clan tables below."""
+
+_race_rows: Dict[Race, int] = {
+    race: row for row, race in enumerate(Race.__members__.values(), start=1)
+}
+
+
+def job_index(job: Optional[Job]) -> int:
+    """
+    Get the row of a job in the job-indexed tables.
+
+    Row zero is reserved for actors without a job, e.g., enemies built from the base
+    :class:`~simfantasy.actor.Actor`, and is always filled with zeros.
+
+    :param job: Job.
+    :return: Row index.
+
+    >>> job_index(Job.BARD) == Job.BARD.value
+    True
+    >>> job_index(None)
+    0
+    """
+    return 0 if job is None else job.value
+
+
+def race_index(race: Optional[Race]) -> int:
+    """
+    Get the row of a race or clan in the race-indexed tables.
+
+    Row zero is reserved for actors without a race, and is always filled with zeros.
+
+    :param race: Race or clan.
+    :return: Row index.
+
+    >>> race_index(None)
+    0
+    >>> race_index(Race.WILDWOOD)
+    1
+    """
+    return 0 if race is None else _race_rows[race]
+
+
+def _build_table(rows: Dict, indexer, row_count: int, columns: Tuple,
+                 column_count: int) -> numpy.ndarray:
+    table = numpy.zeros((row_count, column_count), dtype=numpy.int64)
+
+    for key, values in rows.items():
+        for column, value in zip(columns, values):
+            table[indexer(key), column.value] = value
+
+    table.setflags(write=False)
+
+    return table
+
+
+racial_attribute_bonuses: numpy.ndarray = _build_table({
+    # @formatter:off
+    #                         STR  DEX  VIT  INT  MND
+    Race.WILDWOOD:           (0,   3,   -1,  2,   -1),
+    Race.DUSKWIGHT:          (0,   0,   -1,  3,   1),
+    Race.MIDLANDER:          (2,   -1,  0,   3,   -1),
+    Race.HIGHLANDER:         (3,   0,   2,   -2,  0),
+    Race.PLAINSFOLK:         (-1,  3,   -1,  2,   0),
+    Race.DUNESFOLK:          (-1,  1,   -2,  2,   3),
+    Race.SEEKER_OF_THE_SUN:  (2,   3,   0,   -1,  -1),
+    Race.KEEPER_OF_THE_MOON: (-1,  2,   -2,  1,   3),
+    Race.SEA_WOLF:           (2,   -1,  3,   -2,  1),
+    Race.HELLSGUARD:         (0,   -3,  3,   0,   2),
+    Race.RAEN:               (-1,  -2,  -1,  0,   3),
+    Race.XAELA:              (3,   0,   2,   0,   -2),
+    # @formatter:on
+}, race_index, len(_race_rows) + 1, main_attributes, len(Attribute) + 1)
+"""Main stat bonuses by clan, indexed by :func:`race_index` and :attr:`Attribute.value`."""
 
+base_stats_by_job: numpy.ndarray = _build_table({
+    # @formatter:off
+    #                   STR  DEX  VIT  INT  MND
+    Job.PALADIN:       (100, 95,  110, 60,  100),
+    Job.GLADIATOR:     (95,  90,  100, 50,  95),
+    Job.WARRIOR:       (105, 95,  110, 40,  55),
+    Job.MARAUDER:      (100, 90,  100, 30,  50),
+    Job.MONK:          (110, 105, 100, 50,  90),
+    Job.PUGILIST:      (100, 100, 95,  45,  85),
+    Job.DRAGOON:       (115, 100, 105, 45,  65),
+    Job.LANCER:        (105, 95,  100, 40,  60),
+    Job.BARD:          (90,  115, 100, 85,  80),
+    Job.ARCHER:        (85,  105, 95,  80,  75),
+    Job.WHITE_MAGE:    (55,  105, 100, 105, 115),
+    Job.CONJURER:      (50,  100, 95,  100, 105),
+    Job.BLACK_MAGE:    (45,  100, 100, 115, 75),
+    Job.THAUMATURGE:   (40,  95,  95,  105, 70),
+    Job.SUMMONER:      (90,  100, 100, 115, 80),
+    Job.SCHOLAR:       (90,  100, 100, 105, 115),
+    Job.ARCANIST:      (85,  95,  95,  105, 75),
+    Job.NINJA:         (85,  110, 100, 65,  75),
+    Job.ROGUE:         (80,  100, 95,  60,  70),
+    Job.DARK_KNIGHT:   (105, 95,  110, 60,  40),
+    Job.ASTROLOGIAN:   (50,  100, 100, 105, 115),
+    Job.MACHINIST:     (85,  115, 100, 80,  85),
+    Job.SAMURAI:       (112, 108, 100, 60,  50),
+    Job.RED_MAGE:      (55,  105, 100, 115, 110),
+    # @formatter:on
+}, job_index, len(Job) + 1, main_attributes, len(Attribute) + 1)
+"""Base main stat modifiers by job, indexed by :func:`job_index` and :attr:`Attribute.value`."""
 
-def get_racial_attribute_bonuses(race: Race) -> Dict[Attribute, int]:
+base_resources_by_job: numpy.ndarray = _build_table({
+    # @formatter:off
+    #                   HP   MP
+    Job.PALADIN:       (120, 59),
+    Job.GLADIATOR:     (110, 49),
+    Job.WARRIOR:       (125, 38),
+    Job.MARAUDER:      (115, 28),
+    Job.MONK:          (110, 43),
+    Job.PUGILIST:      (105, 34),
+    Job.DRAGOON:       (115, 49),
+    Job.LANCER:        (110, 39),
+    Job.BARD:          (105, 79),
+    Job.ARCHER:        (100, 69),
+    Job.WHITE_MAGE:    (105, 124),
+    Job.CONJURER:      (100, 117),
+    Job.BLACK_MAGE:    (105, 129),
+    Job.THAUMATURGE:   (100, 123),
+    Job.SUMMONER:      (105, 111),
+    Job.SCHOLAR:       (105, 119),
+    Job.ARCANIST:      (100, 110),
+    Job.NINJA:         (108, 48),
+    Job.ROGUE:         (103, 38),
+    Job.DARK_KNIGHT:   (120, 79),
+    Job.ASTROLOGIAN:   (105, 124),
+    Job.MACHINIST:     (105, 79),
+    Job.SAMURAI:       (109, 40),
+    Job.RED_MAGE:      (105, 120),
+    # @formatter:on
+}, job_index, len(Job) + 1, (Resource.HP, Resource.MP), len(Resource) + 1)
+"""Base resource modifiers by job, indexed by :func:`job_index` and :attr:`Resource.value`."""
+
+
+def racial_attribute_bonus(race: Optional[Race], attribute: Attribute) -> int:
+    """
+    Get a single main stat bonus for a clan.
+
+    :param race: Clan.
+    :param attribute: Attribute.
+    :return: Integer bonus value.
+
+    >>> racial_attribute_bonus(Race.HIGHLANDER, Attribute.STRENGTH)
+    3
+    """
+    return int(racial_attribute_bonuses[race_index(race), attribute.value])
+
+
+def base_stat_by_job(job: Optional[Job], attribute: Attribute) -> int:
+    """
+    Get a single base main stat modifier for a job.
+
+    :param job: Job.
+    :param attribute: Attribute.
+    :return: Integer modifier value.
+
+    >>> base_stat_by_job(Job.BARD, Attribute.DEXTERITY)
+    115
+    """
+    return int(base_stats_by_job[job_index(job), attribute.value])
+
+
+def base_resource_by_job(job: Optional[Job], resource: Resource) -> int:
+    """
+    Get a single base resource modifier for a job.
+
+    :param job: Job.
+    :param resource: Resource.
+    :return: Integer modifier value.
+
+    >>> base_resource_by_job(Job.BARD, Resource.MP)
+    79
+    """
+    return int(base_resources_by_job[job_index(job), resource.value])
+
+
+def _mappings(table: numpy.ndarray, keys: Iterable, indexer, columns: Tuple) -> Dict:
+    return {
+        key: MappingProxyType({column: int(table[indexer(key), column.value]) for column in columns})
+        for key in keys
+    }
+
+
+_racial_attribute_bonus_mappings = _mappings(racial_attribute_bonuses,
+                                             [None, *Race.__members__.values()], race_index,
+                                             main_attributes)
+_base_stat_mappings = _mappings(base_stats_by_job, [None, *Job], job_index, main_attributes)
+_base_resource_mappings = _mappings(base_resources_by_job, [None, *Job], job_index,
+                                    (Resource.HP, Resource.MP))
+
+
+def get_racial_attribute_bonuses(race: Race) -> Mapping[Attribute, int]:
     """
     Get main stat bonuses by clan.
 
     :param race: Clan.
-    :return: Dictionary mapping :class:`~simfantasy.enums.Attribute` to integer bonus values.
+    :return: Read-only mapping of :class:`~simfantasy.enums.Attribute` to integer bonus values.
     """
-    if race is Race.WILDWOOD:
-        return {
-            Attribute.STRENGTH: 0,
-            Attribute.DEXTERITY: 3,
-            Attribute.VITALITY: -1,
-            Attribute.INTELLIGENCE: 2,
-            Attribute.MIND: -1
-        }
-    elif race is Race.DUSKWIGHT:
-        return {
-            Attribute.STRENGTH: 0,
-            Attribute.DEXTERITY: 0,
-            Attribute.VITALITY: -1,
-            Attribute.INTELLIGENCE: 3,
-            Attribute.MIND: 1
-        }
-    elif race is Race.MIDLANDER:
-        return {
-            Attribute.STRENGTH: 2,
-            Attribute.DEXTERITY: -1,
-            Attribute.VITALITY: 0,
-            Attribute.INTELLIGENCE: 3,
-            Attribute.MIND: -1
-        }
-    elif race is Race.HIGHLANDER:
-        return {
-            Attribute.STRENGTH: 3,
-            Attribute.DEXTERITY: 0,
-            Attribute.VITALITY: 2,
-            Attribute.INTELLIGENCE: -2,
-            Attribute.MIND: 0
-        }
-    elif race is Race.PLAINSFOLK:
-        return {
-            Attribute.STRENGTH: -1,
-            Attribute.DEXTERITY: 3,
-            Attribute.VITALITY: -1,
-            Attribute.INTELLIGENCE: 2,
-            Attribute.MIND: 0
-        }
-    elif race is Race.DUNESFOLK:
-        return {
-            Attribute.STRENGTH: -1,
-            Attribute.DEXTERITY: 1,
-            Attribute.VITALITY: -2,
-            Attribute.INTELLIGENCE: 2,
-            Attribute.MIND: 3
-        }
-    elif race is Race.SEEKER_OF_THE_SUN:
-        return {
-            Attribute.STRENGTH: 2,
-            Attribute.DEXTERITY: 3,
-            Attribute.VITALITY: 0,
-            Attribute.INTELLIGENCE: -1,
-            Attribute.MIND: -1
-        }
-    elif race is Race.KEEPER_OF_THE_MOON:
-        return {
-            Attribute.STRENGTH: -1,
-            Attribute.DEXTERITY: 2,
-            Attribute.VITALITY: -2,
-            Attribute.INTELLIGENCE: 1,
-            Attribute.MIND: 3
-        }
-    elif race is Race.SEA_WOLF:
-        return {
-            Attribute.STRENGTH: 2,
-            Attribute.DEXTERITY: -1,
-            Attribute.VITALITY: 3,
-            Attribute.INTELLIGENCE: -2,
-            Attribute.MIND: 1
-        }
-    elif race is Race.HELLSGUARD:
-        return {
-            Attribute.STRENGTH: 0,
-            Attribute.DEXTERITY: -3,
-            Attribute.VITALITY: 3,
-            Attribute.INTELLIGENCE: 0,
-            Attribute.MIND: 2
-        }
-    elif race is Race.RAEN:
-        return {
-            Attribute.STRENGTH: -1,
-            Attribute.DEXTERITY: -2,
-            Attribute.VITALITY: -1,
-            Attribute.INTELLIGENCE: 0,
-            Attribute.MIND: 3
-        }
-    elif race is Race.XAELA:
-        return {
-            Attribute.STRENGTH: 3,
-            Attribute.DEXTERITY: 0,
-            Attribute.VITALITY: 2,
-            Attribute.INTELLIGENCE: 0,
-            Attribute.MIND: -2
-        }
-    else:
-        return {
-            Attribute.STRENGTH: 0,
-            Attribute.DEXTERITY: 0,
-            Attribute.VITALITY: 0,
-            Attribute.INTELLIGENCE: 0,
-            Attribute.MIND: 0
-        }
-
-
-def get_base_stats_by_job(job: Job) -> Dict[Attribute, int]:
+    return _racial_attribute_bonus_mappings[race]
+
+
+def get_base_stats_by_job(job: Job) -> Mapping[Attribute, int]:
     """
     Get base main stats by job.
 
     :param job: Job.
-    :return: Dictionary mapping :class:`~simfantasy.enums.Attribute` to integer bonus values.
+    :return: Read-only mapping of :class:`~simfantasy.enums.Attribute` to integer bonus values.
     """
-    if job is Job.GLADIATOR:
-        return {
-            Attribute.STRENGTH: 95,
-            Attribute.DEXTERITY: 90,
-            Attribute.VITALITY: 100,
-            Attribute.INTELLIGENCE: 50,
-            Attribute.MIND: 95
-        }
-    elif job is Job.PUGILIST:
-        return {
-            Attribute.STRENGTH: 100,
-            Attribute.DEXTERITY: 100,
-            Attribute.VITALITY: 95,
-            Attribute.INTELLIGENCE: 45,
-            Attribute.MIND: 85
-        }
-    elif job is Job.MARAUDER:
-        return {
-            Attribute.STRENGTH: 100,
-            Attribute.DEXTERITY: 90,
-            Attribute.VITALITY: 100,
-            Attribute.INTELLIGENCE: 30,
-            Attribute.MIND: 50
-        }
-    elif job is Job.LANCER:
-        return {
-            Attribute.STRENGTH: 105,
-            Attribute.DEXTERITY: 95,
-            Attribute.VITALITY: 100,
-            Attribute.INTELLIGENCE: 40,
-            Attribute.MIND: 60
-        }
-    elif job is Job.ARCHER:
-        return {
-            Attribute.STRENGTH: 85,
-            Attribute.DEXTERITY: 105,
-            Attribute.VITALITY: 95,
-            Attribute.INTELLIGENCE: 80,
-            Attribute.MIND: 75
-        }
-    elif job is Job.CONJURER:
-        return {
-            Attribute.STRENGTH: 50,
-            Attribute.DEXTERITY: 100,
-            Attribute.VITALITY: 95,
-            Attribute.INTELLIGENCE: 100,
-            Attribute.MIND: 105
-        }
-    elif job is Job.THAUMATURGE:
-        return {
-            Attribute.STRENGTH: 40,
-            Attribute.DEXTERITY: 95,
-            Attribute.VITALITY: 95,
-            Attribute.INTELLIGENCE: 105,
-            Attribute.MIND: 70
-        }
-    elif job is Job.PALADIN:
-        return {
-            Attribute.STRENGTH: 100,
-            Attribute.DEXTERITY: 95,
-            Attribute.VITALITY: 110,
-            Attribute.INTELLIGENCE: 60,
-            Attribute.MIND: 100
-        }
-    elif job is Job.MONK:
-        return {
-            Attribute.STRENGTH: 110,
-            Attribute.DEXTERITY: 105,
-            Attribute.VITALITY: 100,
-            Attribute.INTELLIGENCE: 50,
-            Attribute.MIND: 90
-        }
-    elif job is Job.WARRIOR:
-        return {
-            Attribute.STRENGTH: 105,
-            Attribute.DEXTERITY: 95,
-            Attribute.VITALITY: 110,
-            Attribute.INTELLIGENCE: 40,
-            Attribute.MIND: 55
-        }
-    elif job is Job.DRAGOON:
-        return {
-            Attribute.STRENGTH: 115,
-            Attribute.DEXTERITY: 100,
-            Attribute.VITALITY: 105,
-            Attribute.INTELLIGENCE: 45,
-            Attribute.MIND: 65
-        }
-    elif job is Job.BARD:
-        return {
-            Attribute.STRENGTH: 90,
-            Attribute.DEXTERITY: 115,
-            Attribute.VITALITY: 100,
-            Attribute.INTELLIGENCE: 85,
-            Attribute.MIND: 80
-        }
-    elif job is Job.WHITE_MAGE:
-        return {
-            Attribute.STRENGTH: 55,
-            Attribute.DEXTERITY: 105,
-            Attribute.VITALITY: 100,
-            Attribute.INTELLIGENCE: 105,
-            Attribute.MIND: 115
-        }
-    elif job is Job.BLACK_MAGE:
-        return {
-            Attribute.STRENGTH: 45,
-            Attribute.DEXTERITY: 100,
-            Attribute.VITALITY: 100,
-            Attribute.INTELLIGENCE: 115,
-            Attribute.MIND: 75
-        }
-    elif job is Job.ARCANIST:
-        return {
-            Attribute.STRENGTH: 85,
-            Attribute.DEXTERITY: 95,
-            Attribute.VITALITY: 95,
-            Attribute.INTELLIGENCE: 105,
-            Attribute.MIND: 75
-        }
-    elif job is Job.SUMMONER:
-        return {
-            Attribute.STRENGTH: 90,
-            Attribute.DEXTERITY: 100,
-            Attribute.VITALITY: 100,
-            Attribute.INTELLIGENCE: 115,
-            Attribute.MIND: 80
-        }
-    elif job is Job.SCHOLAR:
-        return {
-            Attribute.STRENGTH: 90,
-            Attribute.DEXTERITY: 100,
-            Attribute.VITALITY: 100,
-            Attribute.INTELLIGENCE: 105,
-            Attribute.MIND: 115
-        }
-    elif job is Job.ROGUE:
-        return {
-            Attribute.STRENGTH: 80,
-            Attribute.DEXTERITY: 100,
-            Attribute.VITALITY: 95,
-            Attribute.INTELLIGENCE: 60,
-            Attribute.MIND: 70
-        }
-    elif job is Job.NINJA:
-        return {
-            Attribute.STRENGTH: 85,
-            Attribute.DEXTERITY: 110,
-            Attribute.VITALITY: 100,
-            Attribute.INTELLIGENCE: 65,
-            Attribute.MIND: 75
-        }
-    elif job is Job.MACHINIST:
-        return {
-            Attribute.STRENGTH: 85,
-            Attribute.DEXTERITY: 115,
-            Attribute.VITALITY: 100,
-            Attribute.INTELLIGENCE: 80,
-            Attribute.MIND: 85
-        }
-    elif job is Job.DARK_KNIGHT:
-        return {
-            Attribute.STRENGTH: 105,
-            Attribute.DEXTERITY: 95,
-            Attribute.VITALITY: 110,
-            Attribute.INTELLIGENCE: 60,
-            Attribute.MIND: 40
-        }
-    elif job is Job.ASTROLOGIAN:
-        return {
-            Attribute.STRENGTH: 50,
-            Attribute.DEXTERITY: 100,
-            Attribute.VITALITY: 100,
-            Attribute.INTELLIGENCE: 105,
-            Attribute.MIND: 115
-        }
-    elif job is Job.SAMURAI:
-        return {
-            Attribute.STRENGTH: 112,
-            Attribute.DEXTERITY: 108,
-            Attribute.VITALITY: 100,
-            Attribute.INTELLIGENCE: 60,
-            Attribute.MIND: 50
-        }
-    elif job is Job.RED_MAGE:
-        return {
-            Attribute.STRENGTH: 55,
-            Attribute.DEXTERITY: 105,
-            Attribute.VITALITY: 100,
-            Attribute.INTELLIGENCE: 115,
-            Attribute.MIND: 110
-        }
-    else:
-        return {
-            Attribute.STRENGTH: 0,
-            Attribute.DEXTERITY: 0,
-            Attribute.VITALITY: 0,
-            Attribute.INTELLIGENCE: 0,
-            Attribute.MIND: 0
-        }
-
-
-def get_base_resources_by_job(job: Job) -> Dict[Resource, int]:
+    return _base_stat_mappings[job]
+
+
+def get_base_resources_by_job(job: Job) -> Mapping[Resource, int]:
     """
-    Get base main stats by job.
+    Get base resources by job.
 
     :param job: Job.
-    :return: Dictionary mapping :class:`~simfantasy.enums.Attribute` to integer bonus values.
+    :return: Read-only mapping of :class:`~simfantasy.enums.Resource` to integer bonus values.
     """
-    if job is Job.GLADIATOR:
-        return {
-            Resource.HP: 110,
-            Resource.MP: 49,
-        }
-    elif job is Job.PUGILIST:
-        return {
-            Resource.HP: 105,
-            Resource.MP: 34,
-        }
-    elif job is Job.MARAUDER:
-        return {
-            Resource.HP: 115,
-            Resource.MP: 28,
-        }
-    elif job is Job.LANCER:
-        return {
-            Resource.HP: 110,
-            Resource.MP: 39,
-        }
-    elif job is Job.ARCHER:
-        return {
-            Resource.HP: 100,
-            Resource.MP: 69,
-        }
-    elif job is Job.CONJURER:
-        return {
-            Resource.HP: 100,
-            Resource.MP: 117,
-        }
-    elif job is Job.THAUMATURGE:
-        return {
-            Resource.HP: 100,
-            Resource.MP: 123,
-        }
-    elif job is Job.PALADIN:
-        return {
-            Resource.HP: 120,
-            Resource.MP: 59,
-        }
-    elif job is Job.MONK:
-        return {
-            Resource.HP: 110,
-            Resource.MP: 43,
-        }
-    elif job is Job.WARRIOR:
-        return {
-            Resource.HP: 125,
-            Resource.MP: 38,
-        }
-    elif job is Job.DRAGOON:
-        return {
-            Resource.HP: 115,
-            Resource.MP: 49,
-        }
-    elif job is Job.BARD:
-        return {
-            Resource.HP: 105,
-            Resource.MP: 79,
-        }
-    elif job is Job.WHITE_MAGE:
-        return {
-            Resource.HP: 105,
-            Resource.MP: 124,
-        }
-    elif job is Job.BLACK_MAGE:
-        return {
-            Resource.HP: 105,
-            Resource.MP: 129,
-        }
-    elif job is Job.ARCANIST:
-        return {
-            Resource.HP: 100,
-            Resource.MP: 110,
-        }
-    elif job is Job.SUMMONER:
-        return {
-            Resource.HP: 105,
-            Resource.MP: 111,
-        }
-    elif job is Job.SCHOLAR:
-        return {
-            Resource.HP: 105,
-            Resource.MP: 119,
-        }
-    elif job is Job.ROGUE:
-        return {
-            Resource.HP: 103,
-            Resource.MP: 38,
-        }
-    elif job is Job.NINJA:
-        return {
-            Resource.HP: 108,
-            Resource.MP: 48,
-        }
-    elif job is Job.MACHINIST:
-        return {
-            Resource.HP: 105,
-            Resource.MP: 79,
-        }
-    elif job is Job.DARK_KNIGHT:
-        return {
-            Resource.HP: 120,
-            Resource.MP: 79,
-        }
-    elif job is Job.ASTROLOGIAN:
-        return {
-            Resource.HP: 105,
-            Resource.MP: 124,
-        }
-    elif job is Job.SAMURAI:
-        return {
-            Resource.HP: 109,
-            Resource.MP: 40,
-        }
-    elif job is Job.RED_MAGE:
-        return {
-            Resource.HP: 105,
-            Resource.MP: 120,
-        }
-    else:
-        return {
-            Resource.HP: 0,
-            Resource.MP: 0,
-        }
+    return _base_resource_mappings[job]
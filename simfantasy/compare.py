@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""Paired comparisons of gear profiles, using common random numbers.
+
+Simulating two profiles independently adds the noise of both runs to their difference, which can
+easily swamp a fraction of a percent. :func:`compare` runs both profiles with the same random
+streams instead, see :class:`~simfantasy.rng.RandomStreams`, so that iteration ``i`` of each
+profile sees the same critical hits, direct hits, damage rolls and procs as far as possible. Most
+of the noise then cancels out of the per-iteration difference.
+"""
+
+import logging
+from contextlib import contextmanager
+from statistics import NormalDist
+from typing import Iterator, Mapping, Union
+
+import numpy
+import pandas as pd
+
+from simfantasy.enum import Slot
+from simfantasy.equipment import Item, Weapon
+from simfantasy.simulator import Simulation
+
+LOGGER = logging.getLogger(__name__)
+
+
+class PairedComparison:
+    """Per-iteration DPS of two profiles that were simulated with common random numbers.
+
+    Arguments:
+        first (pandas.Series): DPS of the first profile, indexed by iteration.
+        second (pandas.Series): DPS of the second profile, indexed by iteration.
+        confidence (Optional[float]): Confidence level of the intervals. Default: 0.95.
+
+    Attributes:
+        confidence (float): Confidence level of the intervals.
+        difference (pandas.Series): DPS of the second profile minus DPS of the first, in each
+            iteration.
+        first (pandas.Series): DPS of the first profile, indexed by iteration.
+        second (pandas.Series): DPS of the second profile, indexed by iteration.
+
+    Examples:
+        >>> comparison = PairedComparison(pd.Series([100.0, 110.0, 90.0, 105.0]),
+        ...                               pd.Series([101.0, 111.5, 90.5, 106.0]))
+        >>> comparison.mean
+        1.0
+        >>> round(comparison.margin, 3), round(comparison.independent_margin, 3)
+        (0.4, 12.108)
+        >>> comparison.variance_reduction > 100
+        True
+    """
+
+    def __init__(self, first: pd.Series, second: pd.Series, confidence: float = None) -> None:
+        if confidence is None:
+            confidence = 0.95
+
+        self.confidence: float = confidence
+        self.first: pd.Series = first
+        self.second: pd.Series = second
+        self.difference: pd.Series = second - first
+
+    @property
+    def _z(self) -> float:
+        return NormalDist().inv_cdf((1 + self.confidence) / 2)
+
+    @property
+    def mean(self) -> float:
+        """Mean DPS gained by switching from the first profile to the second."""
+        return self.difference.mean()
+
+    @property
+    def margin(self) -> float:
+        """Half-width of the confidence interval of :attr:`mean`."""
+        return self._z * self.difference.std() / numpy.sqrt(len(self.difference))
+
+    @property
+    def relative(self) -> float:
+        """:attr:`mean`, relative to the mean DPS of the first profile."""
+        return self.mean / self.first.mean()
+
+    @property
+    def independent_margin(self) -> float:
+        """Half-width of the confidence interval had the profiles been simulated independently."""
+        return self._z * numpy.sqrt((self.first.var() + self.second.var()) / len(self.difference))
+
+    @property
+    def variance_reduction(self) -> float:
+        """How many times fewer iterations the paired comparison needs than independent runs, to
+        reach the same precision."""
+        return (self.independent_margin / self.margin) ** 2
+
+    @property
+    def significant(self) -> bool:
+        """True if the confidence interval of :attr:`mean` excludes zero."""
+        return abs(self.mean) > self.margin
+
+    def report(self) -> None:
+        """Log the difference, its confidence interval, and the variance reduction."""
+        LOGGER.info('DPS difference over %s iterations: %+.1f ± %.1f (%+.3f%% ± %.3f%%) at %s '
+                    'confidence, %s. Pairing reduced variance %.1f times.', len(self.difference),
+                    self.mean, self.margin, self.relative * 100,
+                    self.margin / self.first.mean() * 100, format(self.confidence, '.0%'),
+                    'significant' if self.significant else 'not significant',
+                    self.variance_reduction)
+
+
+@contextmanager
+def equipped(actor, gear: Mapping[Slot, Union[Item, Weapon]]) -> Iterator[None]:
+    """Temporarily equip gear over an actor's own.
+
+    Arguments:
+        actor (simfantasy.actor.Actor): The actor.
+        gear (Mapping[~simfantasy.enum.Slot, ~simfantasy.equipment.Item]): The gear.
+    """
+    own = dict(actor.gear)
+
+    try:
+        actor.unequip_gear(set(actor.gear) - set(own) - set(gear))
+        actor.equip_gear({**own, **gear})
+
+        yield
+    finally:
+        actor.unequip_gear(set(actor.gear) - set(own))
+        actor.equip_gear(own)
+
+
+@contextmanager
+def common_random_numbers(sim: Simulation, seed: int = None) -> Iterator[None]:
+    """Temporarily make every run of a simulation draw the same random numbers.
+
+    The simulation uses the given seed, or keeps its own, or gets a fresh one if it has none, and
+    :attr:`~simfantasy.simulator.Simulation.common_random_numbers` is enabled. ``target_error``
+    is ignored, so every run has exactly :attr:`~simfantasy.simulator.Simulation.iterations`
+    iterations and runs can be paired up.
+
+    Arguments:
+        sim (simfantasy.simulator.Simulation): The simulation.
+        seed (Optional[int]): Seed of every run. Default: the simulation's seed.
+    """
+    settings = sim.seed, sim.common_random_numbers, sim.target_error
+
+    if seed is not None:
+        sim.seed = seed
+    elif sim.seed is None:
+        sim.seed = int(numpy.random.SeedSequence().generate_state(1)[0])
+
+    sim.common_random_numbers = True
+    sim.target_error = None
+
+    try:
+        yield
+    finally:
+        sim.seed, sim.common_random_numbers, sim.target_error = settings
+
+
+def compare(sim: Simulation, actor,
+            first: Mapping[Slot, Union[Item, Weapon]], second: Mapping[Slot, Union[Item, Weapon]],
+            report: bool = None) -> PairedComparison:
+    """Simulate an actor with two gear profiles, using common random numbers.
+
+    Both runs draw the same random numbers, see :func:`common_random_numbers`, with the
+    simulation's :attr:`~simfantasy.simulator.Simulation.sampler`, if any. The actor's gear and
+    the simulation's settings are restored afterwards.
+
+    Arguments:
+        sim (simfantasy.simulator.Simulation): The simulation.
+        actor (simfantasy.actor.Actor): The actor to equip with each profile.
+        first (Mapping[~simfantasy.enum.Slot, ~simfantasy.equipment.Item]): Gear to equip over the
+            actor's own for the first run.
+        second (Mapping[~simfantasy.enum.Slot, ~simfantasy.equipment.Item]): Gear to equip over
+            the actor's own for the second run.
+        report (Optional[bool]): True to log the comparison. Default: True.
+
+    Returns:
+        simfantasy.compare.PairedComparison: DPS of the actor in each iteration of both runs.
+
+    Examples:
+        .. testsetup::
+            >>> from datetime import timedelta
+            >>> from simfantasy.actor import Actor
+            >>> from simfantasy.enum import Attribute, Race
+            >>> from simfantasy.jobs.bard import Bard
+            >>> sim = Simulation(combat_length=timedelta(seconds=30), iterations=20, seed=11)
+            >>> enemy = Actor(sim, Race.ENEMY)
+            >>> bard = Bard(sim, Race.HIGHLANDER, target=enemy)
+
+        >>> bow = Weapon(370, 70, 104, 3.04, 105.38, {Attribute.DEXTERITY: 347})
+        >>> better_bow = Weapon(370, 70, 105, 3.04, 105.38, {Attribute.DEXTERITY: 347})
+        >>> comparison = compare(sim, bard, {Slot.WEAPON: bow}, {Slot.WEAPON: better_bow},
+        ...                      report=False)
+        >>> comparison.mean > 0, comparison.significant
+        (True, True)
+        >>> comparison.variance_reduction > 10
+        True
+    """
+    if report is None:
+        report = True
+
+    dps = []
+
+    with common_random_numbers(sim):
+        for gear in (first, second):
+            with equipped(actor, gear):
+                dps.append(sim.run(report=False).dps(actor.name))
+
+    comparison = PairedComparison(*dps, confidence=sim.confidence)
+
+    if report is True:
+        comparison.report()
+
+    return comparison
@@ -0,0 +1,358 @@
+# -*- coding: utf-8 -*-
+"""Scripted encounters: downtime, adds, forced movement and phases.
+
+An :class:`Encounter` declares what a fight does to the actors over time, e.g., an enemy that
+jumps away and can't be targeted, adds that everyone turns to, mechanics that keep everyone
+moving, and the fight's phases. It is compiled once, into a sorted stream of transitions, along
+with the state of the fight after each of them.
+
+Nothing of it is put on the event queue. Each iteration only keeps its position in the stream,
+and :meth:`Simulation._process_events <simfantasy.simulator.Simulation._process_events>` handles
+the next transition whenever it is due before the next event, at the cost of a comparison per
+event, so a long script costs nothing to set up for each iteration. Decision engines can look up
+the downtime ahead in constant time, see :meth:`Encounter.downtime_in`.
+"""
+
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from simfantasy.simulator import Simulation
+
+LOGGER = logging.getLogger(__name__)
+
+_END, _START = range(2)
+"""Order of transitions at the same time: windows close before others open."""
+
+
+class Window:
+    """Something that lasts a while during an encounter.
+
+    Arguments:
+        start (datetime.timedelta): When it starts, from the start of combat.
+        end (datetime.timedelta): When it ends, from the start of combat.
+
+    Attributes:
+        end (datetime.timedelta): When it ends, from the start of combat.
+        start (datetime.timedelta): When it starts, from the start of combat.
+    """
+
+    def __init__(self, start: timedelta, end: timedelta) -> None:
+        if end <= start:
+            raise ValueError('{0} must end after it starts, at {1}.'.format(
+                self.__class__.__name__, start))
+
+        self.start: timedelta = start
+        self.end: timedelta = end
+
+    def __str__(self) -> str:
+        return '<{cls} start={start} end={end}>'.format(
+            cls=self.__class__.__name__, start=self.start, end=self.end)
+
+
+class Downtime(Window):
+    """The enemies can't be targeted, so no actions that deal damage can be used.
+
+    Damage over time keeps ticking. Overlapping downtime is merged.
+    """
+
+
+class Movement(Window):
+    """Mechanics keep everyone moving, so no actions with a cast time can be used.
+
+    Overlapping movement is merged.
+    """
+
+
+class Adds(Window):
+    """Adds spawn, and every actor targeting an enemy turns to them until they are gone.
+
+    Adds can have a health pool, see :mod:`simfantasy.health`. They are gone once it runs out,
+    but killing them doesn't end combat, nor does their health start the execute phase.
+
+    Arguments:
+        start (datetime.timedelta): When the adds spawn, from the start of combat.
+        end (datetime.timedelta): When the adds are gone, from the start of combat.
+        add (simfantasy.actor.Actor): The adds.
+        enemy (simfantasy.actor.Actor): The enemy that actors turn away from, and back to.
+
+    Attributes:
+        add (simfantasy.actor.Actor): The adds.
+        enemy (simfantasy.actor.Actor): The enemy that actors turn away from, and back to.
+
+    Examples:
+        .. testsetup::
+            >>> from simfantasy.actor import Actor
+            >>> from simfantasy.enum import Race
+            >>> sim = Simulation(combat_length=timedelta(seconds=30))
+            >>> enemy, add = Actor(sim, Race.ENEMY), Actor(sim, Race.ENEMY)
+            >>> bard = Actor(sim, Race.HIGHLANDER, target=enemy)
+
+        Actors still facing the adds when combat ends face the enemy again in the next iteration:
+
+        >>> sim.encounter = Encounter([Adds(timedelta(seconds=20), timedelta(seconds=40), add,
+        ...                                 enemy)])
+        >>> sim._reset_random()
+        >>> sim._start_iteration(0)
+        >>> sim._process_events()
+        >>> bard.target is add
+        True
+        >>> sim._start_iteration(1)
+        >>> bard.target is enemy
+        True
+
+        Killing adds with a health pool doesn't end combat:
+
+        .. testsetup::
+            >>> from simfantasy.enum import Attribute, Slot
+            >>> from simfantasy.equipment import Weapon
+            >>> from simfantasy.jobs.bard import Bard
+            >>> sim = Simulation(combat_length=timedelta(seconds=30), execute_health=0.2)
+            >>> enemy = Actor(sim, Race.ENEMY, name='Boss')
+            >>> add = Actor(sim, Race.ENEMY, name='Add', health=5000)
+            >>> bard = Bard(sim, Race.HIGHLANDER, target=enemy, gear={
+            ...     Slot.WEAPON: Weapon(370, 70, 104, 3.04, 105.38, {Attribute.DEXTERITY: 347})})
+
+        >>> sim.encounter = Encounter([Adds(timedelta(seconds=5), timedelta(seconds=25), add,
+        ...                                 enemy)])
+        >>> sim._reset_random()
+        >>> sim._start_iteration(0)
+        >>> sim._process_events()
+        >>> add.remaining_health, bard.target is enemy, sim.executing
+        (0, True, False)
+        >>> late = [record['target'] for record in bard.statistics['damage']
+        ...         if 20 <= record['elapsed'] < 25 and not record['dot']]
+        >>> sim.current_time - sim.start_time, sorted(set(late))
+        (datetime.timedelta(seconds=30), ['Boss'])
+    """
+
+    def __init__(self, start: timedelta, end: timedelta, add, enemy) -> None:
+        super().__init__(start, end)
+
+        self.add = add
+        self.enemy = enemy
+
+
+class Phase:
+    """A phase of the encounter begins.
+
+    Arguments:
+        start (datetime.timedelta): When the phase begins, from the start of combat.
+        name (str): Name of the phase.
+
+    Attributes:
+        name (str): Name of the phase.
+        start (datetime.timedelta): When the phase begins, from the start of combat.
+    """
+
+    def __init__(self, start: timedelta, name: str) -> None:
+        self.start: timedelta = start
+        self.name: str = name
+
+
+def _merge(windows: List[Window]) -> List[Tuple[timedelta, timedelta]]:
+    """Merge overlapping windows into the times they cover."""
+    merged: List[Tuple[timedelta, timedelta]] = []
+
+    for window in sorted(windows, key=lambda window: window.start):
+        if merged and window.start <= merged[-1][1]:
+            merged[-1] = merged[-1][0], max(merged[-1][1], window.end)
+        else:
+            merged.append((window.start, window.end))
+
+    return merged
+
+
+class Encounter:
+    """A compiled encounter script.
+
+    Arguments:
+        entries (Sequence[Union[simfantasy.encounter.Window, simfantasy.encounter.Phase]]): What
+            happens, in any order.
+
+    Attributes:
+        adds (Dict[simfantasy.actor.Actor, simfantasy.actor.Actor]): The enemy that actors turn
+            back to from each of the adds.
+        entries (List[Union[simfantasy.encounter.Window, simfantasy.encounter.Phase]]): What
+            happens.
+        offsets (List[datetime.timedelta]): When each transition happens, from the start of
+            combat, in order.
+        moving (List[bool]): Whether everyone is moving after each number of transitions.
+        phases (List[Optional[str]]): Name of the phase after each number of transitions.
+        untargetable (List[bool]): Whether the enemies are untargetable after each number of
+            transitions.
+
+    Examples:
+        .. testsetup::
+            >>> from simfantasy.actor import Actor
+            >>> from simfantasy.enum import Attribute, Race, Slot
+            >>> from simfantasy.equipment import Weapon
+            >>> from simfantasy.jobs.bard import Bard
+            >>> sim = Simulation(combat_length=timedelta(seconds=60))
+            >>> enemy = Actor(sim, Race.ENEMY)
+            >>> bard = Bard(sim, Race.HIGHLANDER, target=enemy, gear={
+            ...     Slot.WEAPON: Weapon(370, 70, 104, 3.04, 105.38, {Attribute.DEXTERITY: 347})})
+
+        >>> sim.encounter = Encounter([
+        ...     Phase(timedelta(), 'Phase 1'),
+        ...     Downtime(timedelta(seconds=20), timedelta(seconds=35)),
+        ...     Phase(timedelta(seconds=35), 'Phase 2'),
+        ... ])
+        >>> sim._reset_random()
+        >>> sim._start_iteration(0)
+        >>> sim._process_events(until=sim.start_time + timedelta(seconds=10))
+        >>> elapsed = sim.current_time - sim.start_time
+        >>> sim.phase, elapsed + sim.encounter.downtime_in(sim)
+        ('Phase 1', datetime.timedelta(seconds=20))
+
+        Nothing that deals damage lands while the enemy is away:
+
+        >>> sim._process_events()
+        >>> sim.phase
+        'Phase 2'
+        >>> [record['action'] for record in bard.statistics['damage']
+        ...  if 21 <= record['elapsed'] < 35 and not record['dot']]
+        []
+    """
+
+    def __init__(self, entries: Sequence[Any]) -> None:
+        self.entries: List[Any] = list(entries)
+        self.adds: Dict[Any, Any] = {entry.add: entry.enemy for entry in self.entries
+                                     if isinstance(entry, Adds)}
+
+        transitions: List[Tuple[timedelta, int, str, Any]] = []
+
+        for kind in (Downtime, Movement):
+            windows = [entry for entry in self.entries if isinstance(entry, kind)]
+
+            for start, end in _merge(windows):
+                transitions.append((start, _START, kind.__name__, True))
+                transitions.append((end, _END, kind.__name__, False))
+
+        for entry in self.entries:
+            if isinstance(entry, Adds):
+                transitions.append((entry.start, _START, 'Adds', (entry.enemy, entry.add)))
+                transitions.append((entry.end, _END, 'Adds', (entry.add, entry.enemy)))
+            elif isinstance(entry, Phase):
+                transitions.append((entry.start, _START, 'Phase', entry.name))
+
+        transitions.sort(key=lambda transition: transition[:2])
+
+        self.offsets: List[timedelta] = [offset for offset, _, _, _ in transitions]
+        self._transitions: List[Tuple[str, Any]] = [(kind, value)
+                                                    for _, _, kind, value in transitions]
+
+        # The state of the fight after each number of transitions, for lookups by position.
+        self.untargetable: List[bool] = [False]
+        self.moving: List[bool] = [False]
+        self.phases: List[Optional[str]] = [None]
+
+        for kind, value in self._transitions:
+            self.untargetable.append(value if kind == 'Downtime' else self.untargetable[-1])
+            self.moving.append(value if kind == 'Movement' else self.moving[-1])
+            self.phases.append(value if kind == 'Phase' else self.phases[-1])
+
+        # When the next downtime starts and ends, after each number of transitions.
+        self._downtime: List[Tuple[Optional[timedelta], Optional[timedelta]]] = \
+            [(None, None)] * (len(transitions) + 1)
+        start: Optional[timedelta] = None
+        end: Optional[timedelta] = None
+
+        for position in reversed(range(len(transitions))):
+            offset, _, kind, value = transitions[position]
+
+            if kind == 'Downtime':
+                if value:
+                    start = offset
+                else:
+                    end = offset
+
+            self._downtime[position] = start, end
+
+    def reset(self, sim: Simulation) -> None:
+        """Start the script over, for a new iteration.
+
+        Arguments:
+            sim (simfantasy.simulator.Simulation): The simulation.
+        """
+        sim.timeline_position = 0
+        sim.timeline_due = sim.start_time + self.offsets[0] if self.offsets else datetime.max
+        sim.untargetable = sim.moving = False
+        sim.phase = None
+
+        # Combat can end while adds are up, before they turn actors back to their targets.
+        for actor, target in reversed(sim.turned):
+            actor.target = target
+
+        sim.turned = ()
+
+    def advance(self, sim: Simulation) -> None:
+        """Make the next transition happen.
+
+        Arguments:
+            sim (simfantasy.simulator.Simulation): The simulation.
+        """
+        position = sim.timeline_position
+        kind, value = self._transitions[position]
+
+        sim.current_time = sim.timeline_due
+        sim.timeline_position = position + 1
+        sim.timeline_due = sim.start_time + self.offsets[position + 1] \
+            if position + 1 < len(self.offsets) else datetime.max
+
+        sim.untargetable = self.untargetable[position + 1]
+        sim.moving = self.moving[position + 1]
+        sim.phase = self.phases[position + 1]
+
+        LOGGER.debug('[%s] %s %s %s', sim.current_iteration, sim.relative_timestamp, kind,
+                     value)
+
+        if kind == 'Adds':
+            turn_from, turn_to = value
+
+            turned = tuple((actor, actor.target) for actor in sim.actors
+                           if actor.target is turn_from)
+
+            for actor, _ in turned:
+                actor.target = turn_to
+
+            sim.turned = sim.turned + turned
+        elif kind in ('Downtime', 'Movement') and not value:
+            from simfantasy.event import ActorReadyEvent
+
+            # Actors that had nothing to do might not be waiting for anything.
+            for actor in sim.actors:
+                sim.schedule(ActorReadyEvent(sim, actor))
+
+    def downtime_in(self, sim: Simulation) -> Optional[timedelta]:
+        """Look up how soon the enemies become untargetable.
+
+        Arguments:
+            sim (simfantasy.simulator.Simulation): The simulation.
+
+        Returns:
+            Optional[datetime.timedelta]: Time until the next downtime, zero during downtime, or
+            None if there is no more downtime.
+        """
+        if sim.untargetable:
+            return timedelta()
+
+        start, _ = self._downtime[sim.timeline_position]
+
+        return None if start is None else start - (sim.current_time - sim.start_time)
+
+    def downtime_left(self, sim: Simulation) -> timedelta:
+        """Look up how long the enemies stay untargetable.
+
+        Arguments:
+            sim (simfantasy.simulator.Simulation): The simulation.
+
+        Returns:
+            datetime.timedelta: Time until the current downtime ends, zero outside of downtime.
+        """
+        if not sim.untargetable:
+            return timedelta()
+
+        _, end = self._downtime[sim.timeline_position]
+
+        return end - (sim.current_time - sim.start_time)
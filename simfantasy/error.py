@@ -25,3 +25,9 @@ class ActorGCDLockedError(FailedActionAttemptError):
                          source, action, (source.gcd_unlock_at - sim.current_time).total_seconds()),
                          *args,
                          **kwargs)
+
+
+class CheckpointMismatchError(Exception):
+    def __init__(self, directory, *args: object, **kwargs: object) -> None:
+        super().__init__('Checkpoint in %s belongs to a different simulation' % directory, *args,
+                         **kwargs)
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""Estimators of mean DPS that use more than the sample mean.
+
+Every hit records how much damage its critical and direct hit rolls added beyond what they add on
+average, see :attr:`DamageEvent.deviations <simfantasy.event.DamageEvent.deviations>`. Summed over
+an iteration, those deviations explain most of the difference between that iteration's DPS and the
+true mean, and their own mean is known to be zero. Regressing DPS on them and subtracting the
+fitted luck, i.e., using them as control variates, leaves a much less noisy estimate of the mean.
+"""
+
+from statistics import NormalDist
+from typing import Sequence, Union
+
+import numpy
+
+
+class ControlVariateEstimator:
+    """Online, mergeable control variate estimate of a mean.
+
+    Only sums of the values, the controls, and their products are kept, so the estimator can be
+    updated one iteration at a time and merged across workers.
+
+    Arguments:
+        controls (int): Number of control variates, each of which must have a mean of zero.
+
+    Attributes:
+        count (int): Number of values added.
+
+    Examples:
+        >>> estimator = ControlVariateEstimator(1)
+        >>> luck = numpy.array([50.0, -30.0, 20.0, -40.0, 10.0, -10.0])
+        >>> estimator.add(1000 + luck + [1, -1, 1, -1, 1, -1], luck[:, None])
+        >>> round(estimator.mean, 3), round(estimator.adjusted, 3)
+        (1000.0, 1000.0)
+        >>> round(estimator.margin(), 1), round(estimator.adjusted_margin(), 1)
+        (27.5, 0.5)
+        >>> estimator.variance_reduction > 500
+        True
+    """
+
+    def __init__(self, controls: int) -> None:
+        self.count: int = 0
+
+        self._sum_y: float = 0.0
+        self._sum_yy: float = 0.0
+        self._sum_x: numpy.ndarray = numpy.zeros(controls)
+        self._sum_xx: numpy.ndarray = numpy.zeros((controls, controls))
+        self._sum_xy: numpy.ndarray = numpy.zeros(controls)
+
+    def add(self, values: Union[Sequence[float], numpy.ndarray],
+            controls: Union[Sequence[Sequence[float]], numpy.ndarray]) -> None:
+        """Add values, e.g., the DPS of some iterations, with their controls.
+
+        Arguments:
+            values (Union[Sequence[float], numpy.ndarray]): The values.
+            controls (Union[Sequence[Sequence[float]], numpy.ndarray]): One row of controls per
+                value.
+        """
+        values = numpy.asarray(values, dtype=float)
+        controls = numpy.asarray(controls, dtype=float).reshape(len(values), -1)
+
+        self.count += len(values)
+        self._sum_y += values.sum()
+        self._sum_yy += values @ values
+        self._sum_x += controls.sum(axis=0)
+        self._sum_xx += controls.T @ controls
+        self._sum_xy += controls.T @ values
+
+    def merge(self, other: 'ControlVariateEstimator') -> 'ControlVariateEstimator':
+        """Combine with the estimator of other values.
+
+        Arguments:
+            other (simfantasy.estimate.ControlVariateEstimator): The other estimator.
+
+        Returns:
+            simfantasy.estimate.ControlVariateEstimator: A new estimator of both.
+        """
+        merged = ControlVariateEstimator(len(self._sum_x))
+
+        for name in ('count', '_sum_y', '_sum_yy', '_sum_x', '_sum_xx', '_sum_xy'):
+            setattr(merged, name, getattr(self, name) + getattr(other, name))
+
+        return merged
+
+    def _centered(self):
+        mean_y = self._sum_y / self.count
+        mean_x = self._sum_x / self.count
+
+        syy = self._sum_yy - self.count * mean_y ** 2
+        sxx = self._sum_xx - self.count * numpy.outer(mean_x, mean_x)
+        sxy = self._sum_xy - self.count * mean_x * mean_y
+
+        return syy, sxx, sxy
+
+    @property
+    def coefficients(self) -> numpy.ndarray:
+        """Least-squares coefficients of the values on the controls."""
+        _, sxx, sxy = self._centered()
+
+        return numpy.linalg.lstsq(sxx, sxy, rcond=None)[0]
+
+    @property
+    def mean(self) -> float:
+        """Plain mean of the values."""
+        return self._sum_y / self.count
+
+    @property
+    def adjusted(self) -> float:
+        """Mean of the values, minus the part explained by the controls."""
+        return self.mean - self._sum_x / self.count @ self.coefficients
+
+    @property
+    def variance(self) -> float:
+        """Sample variance of the values."""
+        syy, _, _ = self._centered()
+
+        return syy / (self.count - 1)
+
+    @property
+    def residual_variance(self) -> float:
+        """Sample variance of the values, after removing the part explained by the controls."""
+        syy, sxx, sxy = self._centered()
+        beta = self.coefficients
+
+        residuals = max(syy - 2 * beta @ sxy + beta @ sxx @ beta, 0.0)
+
+        return residuals / (self.count - 1 - len(beta))
+
+    @property
+    def variance_reduction(self) -> float:
+        """How many times fewer values the adjusted estimate needs for the same precision."""
+        return self.variance / self.residual_variance
+
+    def margin(self, confidence: float = None) -> float:
+        """Half-width of the confidence interval of :attr:`mean`.
+
+        Arguments:
+            confidence (Optional[float]): Confidence level. Default: 0.95.
+
+        Returns:
+            float: The half-width.
+        """
+        return self._z(confidence) * numpy.sqrt(self.variance / self.count)
+
+    def adjusted_margin(self, confidence: float = None) -> float:
+        """Half-width of the confidence interval of :attr:`adjusted`.
+
+        Arguments:
+            confidence (Optional[float]): Confidence level. Default: 0.95.
+
+        Returns:
+            float: The half-width.
+        """
+        return self._z(confidence) * numpy.sqrt(self.residual_variance / self.count)
+
+    @staticmethod
+    def _z(confidence: float = None) -> float:
+        if confidence is None:
+            confidence = 0.95
+
+        return NormalDist().inv_cdf((1 + confidence) / 2)
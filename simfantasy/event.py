@@ -3,13 +3,11 @@ import queue
 from abc import ABCMeta, abstractmethod
 from datetime import datetime, timedelta
 from math import floor
-from typing import List
-
-import numpy
+from typing import Tuple
 
 from simfantasy.aura import Aura, TickingAura
-from simfantasy.common_math import divisor_per_level, get_base_stats_by_job, \
-    main_stat_per_level, sub_stat_per_level
+from simfantasy.common_math import base_stat_by_job, divisor_per_level, main_stat_per_level, \
+    sub_stat_per_level
 from simfantasy.enum import Attribute, Job, RefreshBehavior, Resource, Slot
 from simfantasy.simulator import Simulation
 
@@ -151,48 +149,14 @@ class ActorReadyEvent(Event):
         self.actor = actor
 
     def execute(self) -> None:
-        decision_engine = self.actor.decide()
-
-        for decision in decision_engine:
-            if decision is not None:
-                try:
-                    decision_action, decision_options = decision
-                except TypeError:
-                    decision_action, decision_options = decision, None
-
-                if decision_action.ready and (
-                        decision_options is None or decision_options() is True):
-                    decision_action.perform()
-                    return
-                elif self.sim.log_action_attempts is True:
-                    if decision_action.can_recast_at is not None and decision_action.can_recast_at > self.sim.current_time:
-                        logger.debug('[%s] ## %s %s attempted %s but on cooldown (recast=%s)',
-                                     self.sim.current_iteration,
-                                     self.sim.relative_timestamp,
-                                     self.actor,
-                                     decision_action,
-                                     decision_action.can_recast_at - self.sim.start_time)
-                    elif self.actor.animation_unlock_at > self.sim.current_time:
-                        logger.debug('[%s] ## %s %s attempted %s but animation locked (unlock=%s)',
-                                     self.sim.current_iteration,
-                                     self.sim.relative_timestamp,
-                                     self.actor,
-                                     decision_action,
-                                     self.actor.animation_unlock_at - self.sim.start_time)
-                    elif not decision_action.is_off_gcd and self.actor.gcd_unlock_at > self.sim.current_time:
-                        logger.debug('[%s] ## %s %s attempted %s but gcd locked (unlock=%s)',
-                                     self.sim.current_iteration,
-                                     self.sim.relative_timestamp,
-                                     self.actor,
-                                     decision_action,
-                                     self.actor.gcd_unlock_at - self.sim.start_time)
-                    elif decision_options is not None and decision_options() is False:
-                        logger.debug('[%s] ## %s %s attempted %s but failed conditions',
-                                     self.sim.current_iteration,
-                                     self.sim.relative_timestamp,
-                                     self.actor,
-                                     decision_action)
-            else:
+        for decision in self.actor.decide():
+            if decision is None:
+                return
+
+            action = self.attempt(decision)
+
+            if action is not None:
+                action.perform()
                 return
 
         # Got nothing from the actor, so try again in 100ms.
@@ -206,6 +170,70 @@ class ActorReadyEvent(Event):
                          self.actor.animation_unlock_at - self.sim.start_time,
                          self.actor.gcd_unlock_at - self.sim.start_time)
 
+    def choose(self):
+        """
+        Find the action the actor's decision engine picks right now, without performing it.
+
+        :return: The action, or None if the actor has nothing to do right now.
+        """
+        for decision in self.actor.decide():
+            if decision is None:
+                return None
+
+            action = self.attempt(decision)
+
+            if action is not None:
+                return action
+
+        return None
+
+    def attempt(self, decision):
+        """
+        Check whether a decision of the actor's decision engine can be acted on right now.
+
+        :param decision: An action, or a tuple of an action and a callable that must return True for the action to
+            be performed.
+        :return: The action, if it can be performed, None otherwise.
+        """
+        try:
+            decision_action, decision_options = decision
+        except TypeError:
+            decision_action, decision_options = decision, None
+
+        if decision_action.ready and (decision_options is None or decision_options() is True):
+            return decision_action
+
+        if self.sim.log_action_attempts is True:
+            if decision_action.can_recast_at is not None and decision_action.can_recast_at > self.sim.current_time:
+                logger.debug('[%s] ## %s %s attempted %s but on cooldown (recast=%s)',
+                             self.sim.current_iteration,
+                             self.sim.relative_timestamp,
+                             self.actor,
+                             decision_action,
+                             decision_action.can_recast_at - self.sim.start_time)
+            elif self.actor.animation_unlock_at > self.sim.current_time:
+                logger.debug('[%s] ## %s %s attempted %s but animation locked (unlock=%s)',
+                             self.sim.current_iteration,
+                             self.sim.relative_timestamp,
+                             self.actor,
+                             decision_action,
+                             self.actor.animation_unlock_at - self.sim.start_time)
+            elif not decision_action.is_off_gcd and self.actor.gcd_unlock_at > self.sim.current_time:
+                logger.debug('[%s] ## %s %s attempted %s but gcd locked (unlock=%s)',
+                             self.sim.current_iteration,
+                             self.sim.relative_timestamp,
+                             self.actor,
+                             decision_action,
+                             self.actor.gcd_unlock_at - self.sim.start_time)
+            elif decision_options is not None and decision_options() is False:
+                logger.debug('[%s] ## %s %s attempted %s but failed conditions',
+                             self.sim.current_iteration,
+                             self.sim.relative_timestamp,
+                             self.actor,
+                             decision_action)
+
+        return None
+
     def __str__(self):
         """String representation of the object."""
         return '<{cls} actor={actor}>'.format(
@@ -281,25 +309,27 @@ class ConsumeAuraEvent(AuraEvent):
 
 class DamageEvent(Event):
     def __init__(self, sim: Simulation, source, target, action, potency: int,
-                 trait_multipliers: List[float] = None, buff_multipliers: List[float] = None,
+                 trait_multipliers: Tuple[float, ...] = None, buff_mask: int = None,
                  guarantee_crit: bool = None):
         super().__init__(sim)
 
         if trait_multipliers is None:
-            trait_multipliers = []
+            trait_multipliers = ()
 
-        if buff_multipliers is None:
-            buff_multipliers = []
+        if buff_mask is None:
+            buff_mask = 0
 
         self.source = source
         self.target = target
         self.action = action
         self.potency = potency
         self.trait_multipliers = trait_multipliers
-        self.buff_multipliers = buff_multipliers
+        self.buff_mask = buff_mask
 
         self._damage = None
 
+        self.guarantee_crit = guarantee_crit
+
         self._is_critical_hit = guarantee_crit
         """
         Deferred attribute. Set once unless cached value is invalidated. True if the ability was determined to be a
@@ -312,19 +342,91 @@ class DamageEvent(Event):
         direct hit.
         """
 
+        self._deviations = None
+        """
+        Deferred attribute. Set once, along with the damage. Deviation of the critical and direct hit damage from
+        their expected values.
+        """
+
+    @property
+    def buff_multipliers(self) -> Tuple[float, ...]:
+        """
+        Look up the ordered buff multipliers that were active when the event was created.
+
+        :return: Multipliers from the source's :attr:`~simfantasy.actor.Actor.buff_multiplier_table`.
+        """
+        return self.source.buff_multiplier_table[self.buff_mask]
+
+    def _site(self, roll: str) -> str:
+        """
+        Name the draw site of a random roll, so that every kind of roll of every action has its own stream.
+
+        :param roll: The kind of roll, e.g., ``critical_hit``.
+        :return: Name of the site for :attr:`Simulation.random <simfantasy.simulator.Simulation.random>`.
+        """
+        return '{0}/{1}/{2}'.format(self.__class__.__name__, self.action.name, roll)
+
     def execute(self):
         self.source.statistics['damage'].append({
             'iteration': self.sim.current_iteration,
             'timestamp': self.sim.current_time,
+            'elapsed': (self.sim.current_time - self.sim.start_time).total_seconds(),
             'source': self.source.name,
             'target': self.target.name,
             'action': self.action.name,
             'damage': self.damage,
             'critical': self.is_critical_hit,
             'direct': self.is_direct_hit,
+            'critical_deviation': self.deviations[0],
+            'direct_deviation': self.deviations[1],
             'dot': False,
         })
 
+        # An integer subtraction is all that health costs a hit, until a milestone is reached.
+        self.target.health_to_milestone -= self.damage
+
+        if self.target.health_to_milestone <= 0:
+            self.target.reach_milestone()
+
+    @property
+    def deviations(self) -> Tuple[float, float]:
+        """
+        Measure how much luck the critical and direct hit rolls brought, for use as control variates, see
+        :mod:`simfantasy.estimate`.
+
+        Each deviation is the damage the roll added, minus the damage it adds on average given its chance. Since the
+        roll is independent of everything else about the hit, both deviations have a mean of zero.
+
+        :return: Deviations of critical hit damage and of direct hit damage.
+        """
+        if self._deviations is not None:
+            return self._deviations
+
+        sub_stat = sub_stat_per_level[self.source.level]
+        divisor = divisor_per_level[self.source.level]
+        f_chr = floor(
+            200 * (self.source.stats[Attribute.CRITICAL_HIT] - sub_stat) / divisor + 1400) / 1000
+
+        if self.guarantee_crit is not None:
+            p_chr = float(self.guarantee_crit)
+        else:
+            p_chr = min(max(self.critical_hit_chance, 0), 1)
+
+        p_dhr = min(max(self.direct_hit_chance, 0), 1)
+
+        critical = f_chr if self.is_critical_hit else 1
+        direct = 1.25 if self.is_direct_hit else 1
+
+        # Damage without either bonus, give or take rounding.
+        normal = self.damage / critical / direct
+
+        self._deviations = (
+            (self.is_critical_hit - p_chr) * (f_chr - 1) * normal * direct,
+            (self.is_direct_hit - p_dhr) * 0.25 * normal * critical,
+        )
+
+        return self._deviations
+
     @property
     def critical_hit_chance(self) -> float:
         """
@@ -352,7 +454,8 @@ class DamageEvent(Event):
             elif self.critical_hit_chance <= 0:
                 self._is_critical_hit = False
             else:
-                self._is_critical_hit = numpy.random.uniform() <= self.critical_hit_chance
+                self._is_critical_hit = \
+                    self.sim.random.uniform(self._site('critical_hit')) <= self.critical_hit_chance
 
         return self._is_critical_hit
 
@@ -382,7 +485,8 @@ class DamageEvent(Event):
             elif self.direct_hit_chance <= 0:
                 self._is_direct_hit = False
             else:
-                self._is_direct_hit = numpy.random.uniform() <= self.direct_hit_chance
+                self._is_direct_hit = \
+                    self.sim.random.uniform(self._site('direct_hit')) <= self.direct_hit_chance
 
         return self._is_direct_hit
 
@@ -397,16 +501,14 @@ class DamageEvent(Event):
         if self._damage is not None:
             return self._damage
 
-        base_stats = get_base_stats_by_job(self.source.job)
-
         if self.action.powered_by is Attribute.ATTACK_POWER:
             if self.source.job is Job.BARD \
                     or self.source.job is Job.MACHINIST \
                     or self.source.job is Job.NINJA:
-                job_attribute_modifier = base_stats[Attribute.DEXTERITY]
+                job_attribute_modifier = base_stat_by_job(self.source.job, Attribute.DEXTERITY)
                 attack_rating = self.source.stats[Attribute.DEXTERITY]
             else:
-                job_attribute_modifier = base_stats[Attribute.STRENGTH]
+                job_attribute_modifier = base_stat_by_job(self.source.job, Attribute.STRENGTH)
                 attack_rating = self.source.stats[Attribute.STRENGTH]
 
             weapon_damage = self.source.gear[Slot.WEAPON].physical_damage
@@ -414,15 +516,15 @@ class DamageEvent(Event):
             if self.source.job is Job.ASTROLOGIAN \
                     or self.source.job is Job.SCHOLAR \
                     or self.source.job is Job.WHITE_MAGE:
-                job_attribute_modifier = base_stats[Attribute.MIND]
+                job_attribute_modifier = base_stat_by_job(self.source.job, Attribute.MIND)
                 attack_rating = self.source.stats[Attribute.MIND]
             else:
-                job_attribute_modifier = base_stats[Attribute.INTELLIGENCE]
+                job_attribute_modifier = base_stat_by_job(self.source.job, Attribute.INTELLIGENCE)
                 attack_rating = self.source.stats[Attribute.INTELLIGENCE]
 
             weapon_damage = self.source.gear[Slot.WEAPON].magic_damage
         elif self.action.powered_by is Attribute.HEALING_MAGIC_POTENCY:
-            job_attribute_modifier = base_stats[Attribute.MIND]
+            job_attribute_modifier = base_stat_by_job(self.source.job, Attribute.MIND)
             weapon_damage = self.source.gear[Slot.WEAPON].magic_damage
             attack_rating = self.source.stats[Attribute.MIND]
         else:
@@ -442,7 +544,7 @@ class DamageEvent(Event):
         f_chr = floor(
             200 * (self.source.stats[Attribute.CRITICAL_HIT] - sub_stat) / divisor + 1400) / 1000
 
-        damage_randomization = numpy.random.uniform(0.95, 1.05)
+        damage_randomization = self.sim.random.uniform(self._site('damage'), 0.95, 1.05)
 
         damage = f_ptc * f_wd * f_atk * f_det * f_tnc
 
@@ -478,9 +580,9 @@ class DamageEvent(Event):
 
 class DotTickEvent(DamageEvent):
     def __init__(self, sim: Simulation, source, target, action, potency: int, aura: TickingAura,
-                 ticks_remain: int = None, trait_multipliers: List[float] = None,
-                 buff_multipliers: List[float] = None):
-        super().__init__(sim, source, target, action, potency, trait_multipliers, buff_multipliers)
+                 ticks_remain: int = None, trait_multipliers: Tuple[float, ...] = None,
+                 buff_mask: int = None):
+        super().__init__(sim, source, target, action, potency, trait_multipliers, buff_mask)
 
         self.aura = aura
         self.action = action
@@ -494,12 +596,15 @@ class DotTickEvent(DamageEvent):
         self.source.statistics['damage'].append({
             'iteration': self.sim.current_iteration,
             'timestamp': self.sim.current_time,
+            'elapsed': (self.sim.current_time - self.sim.start_time).total_seconds(),
             'source': self.source.name,
             'target': self.target.name,
             'action': self.action.name,
             'damage': self.damage,
             'critical': self.is_critical_hit,
             'direct': self.is_direct_hit,
+            'critical_deviation': self.deviations[0],
+            'direct_deviation': self.deviations[1],
             'dot': True,
         })
 
@@ -508,21 +613,25 @@ class DotTickEvent(DamageEvent):
         if self.ticks_remain > 0:
             self.sim.schedule(self, timedelta(seconds=3))
 
+        # An integer subtraction is all that health costs a tick, until a milestone is reached.
+        self.target.health_to_milestone -= self.damage
+
+        if self.target.health_to_milestone <= 0:
+            self.target.reach_milestone()
+
     @property
     def damage(self) -> int:
         if self._damage is not None:
             return self._damage
 
-        base_stats = get_base_stats_by_job(self.source.job)
-
         if self.action.powered_by is Attribute.ATTACK_POWER:
             if self.source.job is Job.BARD \
                     or self.source.job is Job.MACHINIST \
                     or self.source.job is Job.NINJA:
-                job_attribute_modifier = base_stats[Attribute.DEXTERITY]
+                job_attribute_modifier = base_stat_by_job(self.source.job, Attribute.DEXTERITY)
                 attack_rating = self.source.stats[Attribute.DEXTERITY]
             else:
-                job_attribute_modifier = base_stats[Attribute.STRENGTH]
+                job_attribute_modifier = base_stat_by_job(self.source.job, Attribute.STRENGTH)
                 attack_rating = self.source.stats[Attribute.STRENGTH]
 
             weapon_damage = self.source.gear[Slot.WEAPON].physical_damage
@@ -530,15 +639,15 @@ class DotTickEvent(DamageEvent):
             if self.source.job is Job.ASTROLOGIAN \
                     or self.source.job is Job.SCHOLAR \
                     or self.source.job is Job.WHITE_MAGE:
-                job_attribute_modifier = base_stats[Attribute.MIND]
+                job_attribute_modifier = base_stat_by_job(self.source.job, Attribute.MIND)
                 attack_rating = self.source.stats[Attribute.MIND]
             else:
-                job_attribute_modifier = base_stats[Attribute.INTELLIGENCE]
+                job_attribute_modifier = base_stat_by_job(self.source.job, Attribute.INTELLIGENCE)
                 attack_rating = self.source.stats[Attribute.INTELLIGENCE]
 
             weapon_damage = self.source.gear[Slot.WEAPON].magic_damage
         elif self.action.powered_by is Attribute.HEALING_MAGIC_POTENCY:
-            job_attribute_modifier = base_stats[Attribute.MIND]
+            job_attribute_modifier = base_stat_by_job(self.source.job, Attribute.MIND)
             weapon_damage = self.source.gear[Slot.WEAPON].magic_damage
             attack_rating = self.source.stats[Attribute.MIND]
         else:
@@ -560,7 +669,7 @@ class DotTickEvent(DamageEvent):
         f_chr = floor(
             200 * (self.source.stats[Attribute.CRITICAL_HIT] - sub_stat) / divisor + 1400) / 1000
 
-        damage_randomization = numpy.random.uniform(0.95, 1.05)
+        damage_randomization = self.sim.random.uniform(self._site('damage'), 0.95, 1.05)
 
         damage = f_ptc * f_wd * f_atk * f_det * f_tnc
 
@@ -656,15 +765,13 @@ class AutoAttackEvent(DamageEvent):
         if self._damage is not None:
             return self._damage
 
-        base_stats = get_base_stats_by_job(self.source.job)
-
         if self.source.job is Job.BARD \
                 or self.source.job is Job.MACHINIST \
                 or self.source.job is Job.NINJA:
-            job_attribute_modifier = base_stats[Attribute.DEXTERITY]
+            job_attribute_modifier = base_stat_by_job(self.source.job, Attribute.DEXTERITY)
             attack_rating = self.source.stats[Attribute.DEXTERITY]
         else:
-            job_attribute_modifier = base_stats[Attribute.STRENGTH]
+            job_attribute_modifier = base_stat_by_job(self.source.job, Attribute.STRENGTH)
             attack_rating = self.source.stats[Attribute.STRENGTH]
 
         weapon_damage = self.source.gear[Slot.WEAPON].physical_damage
@@ -685,7 +792,7 @@ class AutoAttackEvent(DamageEvent):
         f_chr = floor(
             200 * (self.source.stats[Attribute.CRITICAL_HIT] - sub_stat) / divisor + 1400) / 1000
 
-        damage_randomization = numpy.random.uniform(0.95, 1.05)
+        damage_randomization = self.sim.random.uniform(self._site('damage'), 0.95, 1.05)
 
         damage = f_ptc * f_aa * f_atk * f_det * f_tnc
 
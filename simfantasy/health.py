@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""Enemy health, and how long enemies take to die.
+
+An :class:`~simfantasy.actor.Actor` created with a ``health`` pool loses health to every hit and
+tick it takes. Once it falls to :attr:`~simfantasy.simulator.Simulation.execute_health`, the
+encounter is in its execute phase, and once it reaches zero, combat ends. Adds of an
+:class:`~simfantasy.encounter.Encounter` only die, see :attr:`~simfantasy.actor.Actor.required`.
+Damage events only count
+down :attr:`~simfantasy.actor.Actor.health_to_milestone`, the health left before the next of those
+milestones, so tracking health costs a hit no more than a subtraction and a comparison.
+
+The damage dealt up to a moment doesn't depend on the enemy's health, save for the execute phase,
+so how long enemies of any health take to die can be read off the damage records of a run, rather
+than simulated again. :func:`time_to_kill` does so for every iteration and every health pool at
+once, with a single search of the cumulative damage. It is also how
+:meth:`Simulation.run <simfantasy.simulator.Simulation.run>` learns the length of encounters that
+ended in a kill, see :func:`combat_lengths`.
+"""
+
+import logging
+from math import ceil
+from typing import Optional, Sequence, Union
+
+import numpy
+import pandas as pd
+
+from simfantasy.sketch import QUANTILES
+
+LOGGER = logging.getLogger(__name__)
+
+
+def _damage_to(health: int, remaining: float) -> int:
+    """Damage that brings a health pool down to a fraction of itself, as the actor counts it."""
+    return health - ceil(health * remaining)
+
+
+class TimeToKill:
+    """How long enemies of several health pools take to die.
+
+    Arguments:
+        times (pandas.DataFrame): Seconds until each health pool, one column each, is depleted
+            in each iteration, indexed by iteration. NaN where the enemy survives.
+
+    Attributes:
+        times (pandas.DataFrame): Seconds until each health pool is depleted in each iteration.
+    """
+
+    def __init__(self, times: pd.DataFrame) -> None:
+        self.times: pd.DataFrame = times
+
+    @property
+    def killed(self) -> pd.Series:
+        """Fraction of iterations in which the enemy dies, by health pool."""
+        return self.times.notna().mean().rename('killed')
+
+    def table(self, q: Sequence[float] = None) -> pd.DataFrame:
+        """Tabulate the distribution of the time to kill.
+
+        Arguments:
+            q (Optional[Sequence[float]]): Quantiles between the minimum and maximum. Default:
+                :data:`~simfantasy.sketch.QUANTILES`.
+
+        Returns:
+            pandas.DataFrame: One row per health pool, with the fraction of iterations that end
+            in a kill, ``killed``, and the ``min``, ``p5``, ``p50``, ``p95`` and ``max`` seconds
+            those kills take by default.
+        """
+        if q is None:
+            q = QUANTILES
+
+        quantiles = self.times.quantile(list(q)).T
+        quantiles.columns = ['p{0:g}'.format(quantile * 100) for quantile in q]
+
+        return pd.concat([
+            self.killed, self.times.min().rename('min'), quantiles, self.times.max().rename('max'),
+        ], axis=1)
+
+    def report(self) -> None:
+        """Log the distribution of the time to kill."""
+        LOGGER.info('Time to kill, in seconds (%s iterations):\n\n%s\n', len(self.times),
+                    self.table())
+
+
+def time_to_kill(damage: pd.DataFrame, health: Union[int, Sequence[int]], target: str = None,
+                 remaining: float = None) -> TimeToKill:
+    """Find when the damage of each iteration depletes each of several health pools.
+
+    Arguments:
+        damage (pandas.DataFrame): Damage events, with ``elapsed`` and ``damage`` columns and an
+            ``iteration`` column or index, e.g., from
+            :attr:`SimulationResults.damage <simfantasy.simulator.SimulationResults.damage>`.
+        health (Union[int, Sequence[int]]): The health pools.
+        target (Optional[str]): Name of the actor to restrict damage to. Default: all damage.
+        remaining (Optional[float]): Fraction of health to time the fall to, e.g., the
+            :attr:`~simfantasy.simulator.Simulation.execute_health`. Default: 0, to time the kill.
+
+    Returns:
+        simfantasy.health.TimeToKill: Time to kill each health pool in each iteration.
+
+    Examples:
+        >>> damage = pd.DataFrame({
+        ...     'iteration': [0, 0, 0, 1, 1], 'elapsed': [1.0, 2.5, 4.0, 1.5, 3.0],
+        ...     'damage': [500, 500, 1000, 1200, 700],
+        ... })
+        >>> ttk = time_to_kill(damage, [1000, 2000])
+        >>> ttk.times.to_numpy().tolist()
+        [[2.5, 4.0], [1.5, nan]]
+        >>> ttk.killed.tolist()
+        [1.0, 0.5]
+
+        The start of an execute phase below 20% health:
+
+        >>> time_to_kill(damage, 2000, remaining=0.2).times[2000].tolist()
+        [4.0, 3.0]
+    """
+    if remaining is None:
+        remaining = 0.0
+
+    healths = [health] if numpy.ndim(health) == 0 else list(health)
+
+    if target is not None:
+        damage = damage[damage['target'] == target]
+
+    if 'iteration' in damage:
+        iterations = damage['iteration'].to_numpy()
+    else:
+        iterations = damage.index.get_level_values('iteration').to_numpy()
+
+    elapsed = damage['elapsed'].to_numpy(dtype=float)
+    amounts = damage['damage'].to_numpy(dtype=float)
+
+    # Iterations in turn, and hits in the order they landed, which the sort keeps for ties.
+    order = numpy.lexsort((elapsed, iterations))
+    iterations, elapsed = iterations[order], elapsed[order]
+    cumulative = numpy.cumsum(amounts[order])
+
+    labels, starts = numpy.unique(iterations, return_index=True)
+    ends = numpy.append(starts[1:], len(iterations))
+    before = numpy.where(starts > 0, cumulative[starts - 1], 0.0)
+
+    # Damage never heals, so the running total across every iteration is sorted, and the hit that
+    # depletes each health pool in each iteration is found with one search.
+    needed = numpy.array([_damage_to(pool, remaining) for pool in healths], dtype=float)
+    rows = numpy.searchsorted(cumulative, before[:, None] + needed[None, :], side='left')
+    times = numpy.full(rows.shape, numpy.nan)
+    killed = rows < ends[:, None]
+    times[killed] = elapsed[rows[killed]]
+
+    return TimeToKill(pd.DataFrame(times, index=pd.Index(labels, name='iteration'),
+                                   columns=healths))
+
+
+def combat_lengths(sim, damage: pd.DataFrame) -> Optional[pd.Series]:
+    """Find how long each iteration's encounter lasted.
+
+    Combat ends when any actor with a ``health`` pool dies, save for adds, see
+    :attr:`~simfantasy.actor.Actor.required`, or after
+    :attr:`~simfantasy.simulator.Simulation.combat_length`.
+
+    Arguments:
+        sim (simfantasy.simulator.Simulation): The simulation.
+        damage (pandas.DataFrame): Damage events of its iterations.
+
+    Returns:
+        Optional[pandas.Series]: Seconds each iteration lasted, indexed by iteration, or None if
+        no actor that combat ends with has a health pool, and every iteration lasted
+        ``combat_length``.
+
+    Examples:
+        .. testsetup::
+            >>> from datetime import timedelta
+            >>> from simfantasy.actor import Actor
+            >>> from simfantasy.enum import Attribute, Race, Slot
+            >>> from simfantasy.equipment import Weapon
+            >>> from simfantasy.jobs.bard import Bard
+            >>> from simfantasy.simulator import Simulation
+            >>> sim = Simulation(combat_length=timedelta(seconds=60), iterations=3, seed=2,
+            ...                  execute_health=0.2)
+            >>> bard = Bard(sim, Race.HIGHLANDER, gear={
+            ...     Slot.WEAPON: Weapon(370, 70, 104, 3.04, 105.38, {Attribute.DEXTERITY: 347})})
+
+        An enemy that dies well before the enrage:
+
+        >>> bard.target = enemy = Actor(sim, Race.ENEMY, health=20000)
+        >>> results = sim.run(report=False)
+        >>> lengths = combat_lengths(sim, results.damage)
+        >>> bool((lengths < 60).all()), lengths.equals(results.durations)
+        (True, True)
+        >>> killed = results.damage.groupby(level='iteration')['damage'].sum()
+        >>> bool((killed >= 20000).all())
+        True
+    """
+    enemies = [actor for actor in sim.actors if actor.health is not None and actor.required]
+
+    if not enemies:
+        return None
+
+    if 'iteration' in damage:
+        iterations = damage['iteration'].unique()
+    else:
+        iterations = damage.index.get_level_values('iteration').unique()
+
+    lengths = pd.Series(sim.combat_length.total_seconds(), dtype=float,
+                        index=pd.Index(sorted(iterations), name='iteration'))
+
+    for enemy in enemies:
+        times = time_to_kill(damage, enemy.health, target=enemy.name).times[enemy.health]
+        lengths = numpy.fmin(lengths, times.reindex(lengths.index))
+
+    return lengths
@@ -1,7 +1,6 @@
 from datetime import timedelta
-from typing import Dict, List, Optional, Tuple
-
-import numpy
+from functools import lru_cache
+from typing import Dict, Optional, Tuple, Type
 
 from simfantasy.action import Action, ShotAction
 from simfantasy.actor import Actor, TargetData as BaseTargetData
@@ -16,6 +15,14 @@ class Bard(Actor):
     job = Job.BARD
     role = Role.DPS
 
+    @property
+    def damage_buffs(self) -> Tuple[Type[Aura], ...]:
+        return FoeRequiemDebuff, RagingStrikesBuff
+
+    @property
+    def stat_buffs(self) -> Tuple[Type[Aura], ...]:
+        return StraightShotBuff,
+
     def create_actions(self):
         super().create_actions()
 
@@ -166,7 +173,7 @@ class BardAction(Action):
         self.sim.unschedule(dot.tick_event)
         dot.tick_event = BardDotTickEvent(self.sim, self.source, self.source.target, self,
                                           dot.potency, dot, None,
-                                          self._trait_multipliers, self._buff_multipliers)
+                                          self._trait_multipliers, self._buff_mask)
         self.sim.schedule(dot.tick_event, timedelta(seconds=3))
 
     @property
@@ -178,28 +185,33 @@ class BardAction(Action):
         return 0
 
     @property
-    def _trait_multipliers(self) -> List[float]:
-        _trait_multipliers = super()._trait_multipliers
+    def _trait_multipliers(self) -> Tuple[float, ...]:
+        return bard_trait_multipliers(self.source.level)
 
-        if self.source.level >= 20:
-            _trait_multipliers += [1.1]
 
-        if self.source.level >= 40:
-            _trait_multipliers += [1.2]
+@lru_cache(maxsize=None)
+def bard_trait_multipliers(level: int) -> Tuple[float, ...]:
+    """Resolve the passive damage traits that a Bard has learned by a given level.
 
-        return _trait_multipliers
+    Arguments:
+        level (int): Level of the Bard.
 
-    @property
-    def _buff_multipliers(self) -> List[float]:
-        _buff_multipliers = super()._buff_multipliers
+    Returns:
+        Tuple[float, ...]: Damage multipliers, in the order they are applied.
+
+    Examples:
+        >>> bard_trait_multipliers(10), bard_trait_multipliers(30), bard_trait_multipliers(70)
+        ((), (1.1,), (1.1, 1.2))
+    """
+    trait_multipliers = ()
 
-        if self.source.target_data.foe_requiem.up:
-            _buff_multipliers += [1.1]
+    if level >= 20:
+        trait_multipliers += (1.1,)
 
-        if self.source.buffs.raging_strikes.up:
-            _buff_multipliers += [1.1]
+    if level >= 40:
+        trait_multipliers += (1.2,)
 
-        return _buff_multipliers
+    return trait_multipliers
 
 
 class RepertoireEvent(Event):
@@ -256,23 +268,26 @@ class HeavyShotAction(BardAction):
     def perform(self):
         super().perform()
 
-        if numpy.random.uniform() < 0.2:
+        if self.sim.random.uniform('Heavy Shot/Straighter Shot') < 0.2:
             self.schedule_aura_events(self.source, self.source.buffs.straighter_shot)
 
 
 class StraightShotBuff(Aura):
     duration = timedelta(seconds=30)
     name = 'Straight Shot'
+    stat_multipliers = {Attribute.CRITICAL_HIT: 1.1}
 
     def apply(self, target):
         super().apply(target)
 
-        target.stats[Attribute.CRITICAL_HIT] *= 1.1
+        for attribute, multiplier in self.stat_multipliers.items():
+            target.stats[attribute] *= multiplier
 
     def expire(self, target):
         super().expire(target)
 
-        target.stats[Attribute.CRITICAL_HIT] /= 1.1
+        for attribute, multiplier in self.stat_multipliers.items():
+            target.stats[attribute] /= multiplier
 
 
 class StraightShotAction(BardAction):
@@ -296,6 +311,7 @@ class StraightShotAction(BardAction):
 
 
 class RagingStrikesBuff(Aura):
+    damage_multiplier = 1.1
     duration = timedelta(seconds=20)
     name = 'Raging Strikes'
 
@@ -544,6 +560,7 @@ class FoeTickEvent(ResourceEvent):
 
 
 class FoeRequiemDebuff(Aura):
+    damage_multiplier = 1.1
     name = "Foe's Requiem"
 
 
@@ -0,0 +1,557 @@
+"""Lockstep model of :class:`~simfantasy.jobs.bard.Bard`, for :mod:`simfantasy.lockstep`."""
+
+from datetime import timedelta
+from typing import Dict, Mapping, Sequence, Tuple, Union
+
+import numpy
+
+from simfantasy.action import action_speed
+from simfantasy.enum import Resource, Slot
+from simfantasy.equipment import Item, Weapon
+from simfantasy.jobs.bard import Bard, FoeRequiemDebuff, RagingStrikesBuff, VenomousBiteDebuff, \
+    WindbiteDebuff, bard_trait_multipliers
+from simfantasy.lockstep import DamageKernel, LockstepModel, LockstepSimulation, SECOND, \
+    microseconds
+
+_actions: Tuple[str, ...] = (
+    'shot', 'foe_requiem', 'windbite', 'venomous_bite', 'iron_jaws', 'raging_strikes', 'barrage',
+    'straight_shot', 'pitch_perfect', 'wanderers_minuet', 'mages_ballad', 'armys_paeon',
+    'refulgent_arrow', 'empyreal_arrow', 'bloodletter', 'miserys_end', 'sidewinder', 'heavy_shot',
+)
+
+_auras: Tuple[str, ...] = (
+    'raging_strikes', 'barrage', 'straight_shot', 'straighter_shot', 'wanderers_minuet',
+    'mages_ballad', 'armys_paeon', 'foe_requiem', 'foe_requiem_debuff', 'windbite',
+    'venomous_bite',
+)
+
+_dots: Tuple[str, ...] = ('windbite', 'venomous_bite')
+
+_song_repertoire: Dict[str, int] = {
+    'wanderers_minuet': 3,
+    'mages_ballad': 0,
+    'armys_paeon': 4,
+}
+
+A = {name: index for index, name in enumerate(_actions)}
+B = {name: index for index, name in enumerate(_auras)}
+
+_server_tick, _foe_tick, _song_start, _song_end = range(4)
+_dot_rows = 4
+"""Rows of the pending event calendar. Damage-over-time ticks follow, one row per dot."""
+
+
+class BardLockstepModel(LockstepModel):
+    """Struct-of-arrays copy of :meth:`Bard.decide <simfantasy.jobs.bard.Bard.decide>`.
+
+    Every timing rule of the scalar actions is kept, including the extra 0.75s added to recasts,
+    the decision wakes that only follow performed actions and auto-attacks, lazily rolled critical
+    hits, and damage-over-time snapshots of :attr:`~simfantasy.actor.Actor.buff_mask`. Auras are
+    stored as application and expiration timestamps, so checking whether one is up at any point in
+    time is a pair of comparisons.
+
+    Arguments:
+        bard (simfantasy.jobs.bard.Bard): The Bard to model. Its stats and action timings are
+            read once, after :meth:`~simfantasy.actor.Actor.arise`.
+        profiles (Optional[Sequence[Mapping[~simfantasy.enum.Slot, ~simfantasy.equipment.Item]]]):
+            Gear profiles, see :class:`~simfantasy.lockstep.LockstepModel`.
+
+    Examples:
+        .. testsetup::
+            >>> from simfantasy.enum import Attribute, Race, Slot
+            >>> from simfantasy.equipment import Weapon
+            >>> from simfantasy.simulator import Simulation
+            >>> sim = Simulation(combat_length=timedelta(minutes=2), iterations=1000)
+            >>> bard = Bard(sim, Race.HIGHLANDER)
+            >>> bard.equip_gear({Slot.WEAPON: Weapon(370, 70, 104, 3.04, 105.38,
+            ...                                      {Attribute.DEXTERITY: 347})})
+
+        Every iteration takes its own path through the rotation, but all of them advance
+        together:
+
+        >>> results = LockstepSimulation(sim, seed=0).run(BardLockstepModel(bard))
+        >>> results.dps.shape
+        (1000,)
+        >>> results.steps < 1000
+        True
+    """
+
+    def __init__(self, bard: Bard,
+                 profiles: Sequence[Mapping[Slot, Union[Item, Weapon]]] = None) -> None:
+        super().__init__(bard, profiles)
+
+        hasted_times, kernels, max_mp, shot_recast_times = None, [], [], []
+
+        for profile in self.each_profile():
+            if profile == 0:
+                # Nothing else depends on gear, so it is read from the first profile.
+                actions, delays = self._read_actions(bard)
+                hasted_times = {a: [] for a in delays}
+
+            for a, delay in delays.items():
+                speed = bard.stats[actions[a].hastened_by]
+                hasted_times[a].append([
+                    microseconds(action_speed(delay, speed, bard.level, 4 * r)) for r in range(5)
+                ])
+
+            kernels.append(DamageKernel(bard, actions[0].powered_by, actions[0].hastened_by,
+                                        bard_trait_multipliers(bard.level)))
+            max_mp.append(bard.resources[Resource.MP][1])
+            shot_recast_times.append(microseconds(bard.actions.shot.recast_time))
+
+        self.hasted_times = {a: numpy.array(times) for a, times in hasted_times.items()}
+        self.kernel = DamageKernel.stack(kernels)
+        self.max_mp = numpy.array(max_mp)
+        self.mp_tick = numpy.floor(0.02 * self.max_mp)
+        self.shot_recast_times = numpy.array(shot_recast_times)
+
+    def _read_actions(self, bard: Bard) -> Tuple[list, Dict[int, timedelta]]:
+        actions = [getattr(bard.actions, name) for name in _actions]
+
+        self.action_names = [action.name for action in actions]
+
+        self.execute_times = numpy.array(
+            [microseconds(action.animation_execute_time) for action in actions])
+        self.recast_times = numpy.array([microseconds(action.recast_time) for action in actions])
+        self.animations = numpy.array([microseconds(action.animation) for action in actions])
+        self.gcds = numpy.array([microseconds(action.gcd) for action in actions])
+        self.off_gcd = numpy.array([action.is_off_gcd for action in actions])
+        self.affected_by_barrage = numpy.array([action.affected_by_barrage for action in actions])
+        self.cast_time = microseconds(bard.actions.foe_requiem.cast_time)
+
+        # Speed is memoized per action and only forgotten when Army's Paeon comes or goes, so the
+        # haste of each action is locked in by the repertoire when it is first used.
+        delays = {}
+
+        for a, action in enumerate(actions):
+            if action.hastened_by is None:
+                continue
+
+            if _actions[a] == 'empyreal_arrow':
+                delays[a] = action.base_recast_time
+            elif action.base_recast_time == timedelta(seconds=2.5):
+                delays[a] = timedelta(seconds=2.5)
+
+        self.potencies = {name: action.potency for name, action in zip(_actions, actions)
+                          if name not in ('foe_requiem', 'sidewinder')}
+        self.sidewinder_potencies = (100, 175, 260) if bard.level >= 64 else (100, 100, 100)
+
+        self.durations = numpy.array([
+            microseconds(getattr(bard.buffs, name).duration)
+            for name in ('raging_strikes', 'barrage', 'straight_shot', 'straighter_shot',
+                         'wanderers_minuet', 'mages_ballad', 'armys_paeon')
+        ] + [numpy.inf, numpy.inf] + [
+            microseconds(dot.duration) for dot in self._dots(bard)
+        ])
+
+        self.dot_potencies = [dot.potency for dot in self._dots(bard)]
+        self.dot_ticks = [dot.ticks for dot in self._dots(bard)]
+
+        bits = {aura: 1 << bit for bit, aura in enumerate(bard.damage_buffs)}
+        self.buff_bits = [(name, bits[aura]) for name, aura in (
+            ('foe_requiem_debuff', FoeRequiemDebuff), ('raging_strikes', RagingStrikesBuff),
+        ) if aura in bits]
+
+        return actions, delays
+
+    @staticmethod
+    def _dots(bard: Bard):
+        return WindbiteDebuff(bard.sim, bard), VenomousBiteDebuff(bard.sim, bard)
+
+    def reset(self, engine: LockstepSimulation) -> None:
+        super().reset(engine)
+
+        n = self.lanes
+
+        self.recast = numpy.full((len(_actions), n), -numpy.inf)
+        self.animation_unlock = numpy.full(n, -numpy.inf)
+        self.gcd_unlock = numpy.full(n, -numpy.inf)
+        self.shot_at = numpy.zeros(n)
+        self.wakes = numpy.full((2, n), numpy.inf)
+        self.wakes[0] = 0
+
+        self.applied = numpy.full((len(_auras), n), numpy.inf)
+        self.expires = numpy.full((len(_auras), n), -numpy.inf)
+
+        self.full_mp = self.max_mp[self.profile]
+        self.mp = self.full_mp.copy()
+        self.repertoire = numpy.zeros(n, dtype=int)
+        self.max_repertoire = numpy.zeros(n, dtype=int)
+
+        self.calendar = numpy.full((_dot_rows + len(_dots), n), numpy.inf)
+        self.song_repertoire = numpy.zeros(n, dtype=int)
+        self.speed_cache = numpy.full((len(_actions), n), numpy.nan)
+        self.server_tick_end = self.combat_length // SECOND * SECOND
+        if self.server_tick_end > 3 * SECOND:
+            self.calendar[_server_tick] = 3 * SECOND
+
+        self.dot_ticks_remain = numpy.zeros((len(_dots), n), dtype=int)
+        self.dot_mask = numpy.zeros((len(_dots), n), dtype=int)
+        self.dot_action = numpy.zeros((len(_dots), n), dtype=int)
+        self.dot_damage = numpy.full((len(_dots), n), numpy.nan)
+        self.dot_critical = numpy.zeros((len(_dots), n), dtype=bool)
+
+    @property
+    def next_wake(self) -> numpy.ndarray:
+        return numpy.minimum(self.wakes.min(axis=0), self.shot_at)
+
+    # Aura helpers.
+
+    def up(self, aura: str, now) -> numpy.ndarray:
+        b = B[aura]
+
+        return (self.applied[b] <= now) & (self.expires[b] > now)
+
+    def remains(self, aura: str, now) -> numpy.ndarray:
+        return numpy.where(self.up(aura, now), self.expires[B[aura]] - now, 0)
+
+    def schedule_aura(self, aura: str, mask: numpy.ndarray, now, delay: float) -> None:
+        b = B[aura]
+
+        new = mask & ~(self.expires[b] > now)
+
+        self.applied[b] = numpy.where(new, now + delay, self.applied[b])
+        self.expires[b] = numpy.where(mask, now + delay + self.durations[b], self.expires[b])
+
+    def consume(self, aura: str, mask: numpy.ndarray, now) -> None:
+        b = B[aura]
+
+        self.expires[b] = numpy.where(mask, now, self.expires[b])
+
+    def in_effect(self, aura: str, at, indices=slice(None)) -> numpy.ndarray:
+        """Like :meth:`up`, but false at the exact moment of application.
+
+        Auras report themselves as up as soon as their application timestamp is reached, but the
+        application event itself is queued behind the events already scheduled for that moment,
+        so whatever it changes on the actor only takes effect afterwards.
+        """
+        b = B[aura]
+
+        return (self.applied[b][indices] < at) & (self.expires[b][indices] > at)
+
+    def buff_mask(self, now) -> numpy.ndarray:
+        mask = numpy.zeros(self.lanes, dtype=int)
+
+        for aura, bit in self.buff_bits:
+            mask |= numpy.where(self.in_effect(aura, now), bit, 0)
+
+        return mask
+
+    def song(self, now) -> Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+        mages_ballad = self.up('mages_ballad', now)
+        armys_paeon = ~mages_ballad & self.up('armys_paeon', now)
+        wanderers_minuet = ~mages_ballad & ~armys_paeon & self.up('wanderers_minuet', now)
+
+        return mages_ballad, armys_paeon, wanderers_minuet
+
+    def add_repertoire(self, mask: numpy.ndarray, amount: int) -> None:
+        self.repertoire = numpy.where(
+            mask, numpy.clip(self.repertoire + amount, 0, self.max_repertoire), self.repertoire)
+
+    # Damage.
+
+    def hit(self, action: int, mask: numpy.ndarray, now: numpy.ndarray, potency,
+            is_critical_hit: numpy.ndarray = None) -> None:
+        indices = numpy.flatnonzero(mask)
+
+        if len(indices) == 0:
+            return
+
+        lands_at = now[indices] + self.execute_times[action]
+        potency = numpy.broadcast_to(potency, mask.shape)[indices]
+
+        damage, _, _ = self.kernel.roll(
+            self.rng, potency, self.buff_mask(now)[indices], self._critical_hit(lands_at, indices),
+            None if is_critical_hit is None else is_critical_hit[indices],
+            profile=self.profile[indices])
+
+        self.record(action, indices, lands_at, damage)
+
+    def _critical_hit(self, at: numpy.ndarray, indices: numpy.ndarray) -> numpy.ndarray:
+        straight_shot = self.in_effect('straight_shot', at, indices)
+        critical_hit = self.kernel.critical_hit[self.profile[indices]]
+
+        return numpy.where(straight_shot, critical_hit * 1.1, critical_hit)
+
+    def schedule_dot(self, dot: int, mask: numpy.ndarray, now, action: int) -> None:
+        self.schedule_aura(_dots[dot], mask, now, self.execute_times[action])
+
+        row = _dot_rows + dot
+
+        self.calendar[row] = numpy.where(mask, now + 3 * SECOND, self.calendar[row])
+        self.dot_ticks_remain[dot] = numpy.where(mask, self.dot_ticks[dot],
+                                                 self.dot_ticks_remain[dot])
+        self.dot_mask[dot] = numpy.where(mask, self.buff_mask(now), self.dot_mask[dot])
+        self.dot_action[dot] = numpy.where(mask, action, self.dot_action[dot])
+        self.dot_damage[dot] = numpy.where(mask, numpy.nan, self.dot_damage[dot])
+
+    def hasted_time(self, action: int, mask: numpy.ndarray, now) -> numpy.ndarray:
+        """Return the recast of a hastened action, memoizing it where it is first needed."""
+        cached = self.speed_cache[action]
+        stale = mask & numpy.isnan(cached)
+
+        if stale.any():
+            repertoire = numpy.where(self.up('armys_paeon', now), self.repertoire, 0)
+            cached[stale] = self.hasted_times[action][self.profile[stale], repertoire[stale]]
+
+        return cached
+
+    # Pending events.
+
+    def catch_up(self, now: numpy.ndarray, active: numpy.ndarray) -> None:
+        """Process calendar events due at or before each iteration's timestamp, in order.
+
+        Song effects begin after any decision made at the moment of application. See
+        :meth:`in_effect`.
+        """
+        while True:
+            pending = numpy.where(self.calendar < now, self.calendar, numpy.inf)
+            pending[:_song_start] = numpy.where(self.calendar[:_song_start] == now, now,
+                                                pending[:_song_start])
+            pending[_song_end:] = numpy.where(self.calendar[_song_end:] == now, now,
+                                              pending[_song_end:])
+
+            at = pending.min(axis=0)
+            due = active & (at < self.combat_length)
+
+            if not due.any():
+                return
+
+            kind = pending.argmin(axis=0)
+
+            for row in numpy.unique(kind[due]):
+                self._process(row, due & (kind == row), at)
+
+    def _process(self, row: int, mask: numpy.ndarray, at: numpy.ndarray) -> None:
+        if row == _server_tick:
+            regenerated = numpy.minimum(self.mp + self.mp_tick[self.profile], self.full_mp)
+            self.mp = numpy.where(mask, regenerated, self.mp)
+            following = at + 3 * SECOND
+            self.calendar[row] = numpy.where(
+                mask, numpy.where(following < self.server_tick_end, following, numpy.inf),
+                self.calendar[row])
+        elif row == _foe_tick:
+            self.mp = numpy.where(mask, numpy.maximum(self.mp - 1680, 0), self.mp)
+            drained = mask & (self.mp <= 0)
+            self.calendar[row] = numpy.where(mask, numpy.where(drained, numpy.inf, at + 3 * SECOND),
+                                             self.calendar[row])
+            b, d = B['foe_requiem'], B['foe_requiem_debuff']
+            self.expires[b] = numpy.where(drained, at, self.expires[b])
+            self.expires[d] = numpy.where(drained, at + 6 * SECOND, self.expires[d])
+        elif row == _song_start:
+            self.speed_cache[:, mask] = numpy.nan
+            self.repertoire = numpy.where(mask, 0, self.repertoire)
+            self.max_repertoire = numpy.where(mask, self.song_repertoire, self.max_repertoire)
+            self.calendar[row] = numpy.where(mask, numpy.inf, self.calendar[row])
+        elif row == _song_end:
+            self.speed_cache[:, mask] = numpy.nan
+            self.repertoire = numpy.where(mask, 0, self.repertoire)
+            self.max_repertoire = numpy.where(mask, 0, self.max_repertoire)
+            self.calendar[row] = numpy.where(mask, numpy.inf, self.calendar[row])
+        else:
+            self._tick(row - _dot_rows, mask, at)
+
+    def _tick(self, dot: int, mask: numpy.ndarray, at: numpy.ndarray) -> None:
+        indices = numpy.flatnonzero(mask)
+        tick_at = at[indices]
+
+        # The scalar tick event reschedules itself, so every tick repeats the first tick's rolls.
+        first = indices[numpy.isnan(self.dot_damage[dot][indices])]
+
+        if len(first):
+            damage, is_critical_hit, _ = self.kernel.roll(
+                self.rng, numpy.full(len(first), self.dot_potencies[dot]),
+                self.dot_mask[dot][first], self._critical_hit(at[first], first), periodic=True,
+                profile=self.profile[first])
+
+            self.dot_damage[dot][first] = damage
+            self.dot_critical[dot][first] = is_critical_hit
+
+        self.record(self.dot_action[dot][indices], indices, tick_at, self.dot_damage[dot][indices])
+
+        critical = mask & self.dot_critical[dot]
+
+        mages_ballad, armys_paeon, wanderers_minuet = self.song(at)
+
+        bloodletter = critical & mages_ballad
+        self.recast[A['bloodletter']] = numpy.where(
+            bloodletter, at + self.animations[A['bloodletter']], self.recast[A['bloodletter']])
+        self.add_repertoire(critical & (armys_paeon | wanderers_minuet), 1)
+
+        row = _dot_rows + dot
+
+        self.dot_ticks_remain[dot] -= mask
+        self.calendar[row] = numpy.where(
+            mask, numpy.where(self.dot_ticks_remain[dot] > 0, at + 3 * SECOND, numpy.inf),
+            self.calendar[row])
+
+    # Decisions.
+
+    def step(self, now: numpy.ndarray, active: numpy.ndarray) -> None:
+        self.catch_up(now, active)
+
+        self.wakes[active & (self.wakes <= now)] = numpy.inf
+
+        shot = active & (self.shot_at <= now)
+        if shot.any():
+            self.perform(A['shot'], shot, now)
+            self.shot_at = numpy.where(shot, now + self.shot_recast_times[self.profile],
+                                       self.shot_at)
+
+        for action, mask in self.decide(now, active):
+            self.perform(action, mask, now)
+
+    def finish(self) -> None:
+        end = numpy.full(self.lanes, self.combat_length)
+
+        self.catch_up(end, numpy.ones(self.lanes, dtype=bool))
+
+    def decide(self, now: numpy.ndarray, active: numpy.ndarray):
+        animation_up = self.animation_unlock <= now
+        gcd_up = self.gcd_unlock <= now
+
+        def ready(name: str) -> numpy.ndarray:
+            a = A[name]
+            r = (self.recast[a] <= now) & animation_up
+
+            return r if self.off_gcd[a] else r & gcd_up
+
+        up = {name: self.up(name, now) for name in _auras}
+        mages_ballad, armys_paeon, wanderers_minuet = self.song(now)
+        song = mages_ballad | armys_paeon | wanderers_minuet
+        dots_up = up['windbite'] & up['venomous_bite']
+        windbite_remains = self.remains('windbite', now)
+        venomous_bite_remains = self.remains('venomous_bite', now)
+        raging_strikes_cooldown = numpy.maximum(self.recast[A['raging_strikes']] - now, 0)
+
+        priorities = (
+            ('foe_requiem', lambda m: ~up['foe_requiem'] & (self.mp == self.full_mp)),
+            ('windbite', lambda m: ~up['windbite']),
+            ('venomous_bite', lambda m: ~up['venomous_bite']),
+            ('iron_jaws', lambda m: (raging_strikes_cooldown <= 5 * SECOND) & dots_up &
+                                  (windbite_remains <= venomous_bite_remains) &
+                                  (venomous_bite_remains <= self.durations[B['raging_strikes']])),
+            ('raging_strikes', lambda m: ~up['raging_strikes']),
+            ('barrage', lambda m: up['raging_strikes'] & (
+                    up['straighter_shot'] | (self.remains('raging_strikes', now) < 3 * SECOND))),
+            ('straight_shot', lambda m: self.remains('straight_shot', now) < 3 * SECOND),
+            ('pitch_perfect', lambda m: wanderers_minuet & (
+                    (self.repertoire == self.max_repertoire) |
+                    (self.remains('wanderers_minuet', now) < 3 * SECOND))),
+            ('wanderers_minuet', lambda m: ~song),
+            ('mages_ballad', lambda m: ~song),
+            ('armys_paeon', lambda m: ~song),
+            ('iron_jaws', lambda m: dots_up & ((windbite_remains <= 3 * SECOND) |
+                                               (venomous_bite_remains <= 3 * SECOND))),
+            ('barrage', lambda m: up['straighter_shot'] & up['raging_strikes']),
+            ('refulgent_arrow', lambda m: up['straighter_shot']),
+            ('empyreal_arrow', lambda m: ~wanderers_minuet | (
+                    self.repertoire < self.max_repertoire) | up['barrage']),
+            ('empyreal_arrow',
+             lambda m: raging_strikes_cooldown > self.hasted_time(A['empyreal_arrow'], m, now)),
+            ('bloodletter', None),
+            ('miserys_end', lambda m: now + self.execute_time >= self.combat_length),
+            ('sidewinder', lambda m: dots_up),
+            ('heavy_shot', None),
+        )
+
+        undecided = active.copy()
+        choices: Dict[int, numpy.ndarray] = {}
+
+        for name, condition in priorities:
+            if not undecided.any():
+                break
+
+            take = undecided & ready(name)
+
+            if condition is not None and take.any():
+                take &= condition(take)
+
+            if take.any():
+                a = A[name]
+                choices[a] = choices[a] | take if a in choices else take
+                undecided &= ~take
+
+        return sorted(choices.items())
+
+    def perform(self, action: int, mask: numpy.ndarray, now: numpy.ndarray) -> None:
+        name = _actions[action]
+        execute_time = self.execute_times[action]
+
+        if action in self.hasted_times:
+            recast_time = gcd = self.hasted_time(action, mask, now)
+        else:
+            recast_time, gcd = self.recast_times[action], self.gcds[action]
+
+        self.recast[action] = numpy.where(mask, now + execute_time + recast_time,
+                                          self.recast[action])
+
+        if self.animations[action] > 0:
+            self.animation_unlock = numpy.where(mask, now + self.animations[action],
+                                                self.animation_unlock)
+            slot = numpy.where(self.wakes[0] == numpy.inf, 0, 1)
+            wake = now + execute_time
+            self.wakes[0] = numpy.where(mask & (slot == 0), wake, self.wakes[0])
+            self.wakes[1] = numpy.where(mask & (slot == 1), wake, self.wakes[1])
+
+        if not self.off_gcd[action]:
+            self.gcd_unlock = numpy.where(mask, now + gcd, self.gcd_unlock)
+
+        is_critical_hit = None
+
+        if name == 'straight_shot':
+            is_critical_hit = self.up('straighter_shot', now)
+
+        if name == 'sidewinder':
+            windbite, venomous_bite = self.up('windbite', now), self.up('venomous_bite', now)
+            dots = (windbite & venomous_bite).astype(int) + (windbite | venomous_bite)
+            potency = numpy.choose(dots, self.sidewinder_potencies)
+        else:
+            potency = self.potencies.get(name)
+
+        if potency is not None:
+            self.hit(action, mask, now, potency, is_critical_hit)
+
+        if self.affected_by_barrage[action]:
+            barrage = mask & self.up('barrage', now)
+
+            if barrage.any():
+                self.hit(action, barrage, now, potency, is_critical_hit)
+                self.hit(action, barrage, now, potency, is_critical_hit)
+                self.consume('barrage', barrage, now)
+
+        if name == 'foe_requiem':
+            b, d = B['foe_requiem'], B['foe_requiem_debuff']
+            self.applied[b] = numpy.where(mask, now + self.cast_time, self.applied[b])
+            self.expires[b] = numpy.where(mask, numpy.inf, self.expires[b])
+            self.applied[d] = numpy.where(mask, now + self.cast_time + 3 * SECOND, self.applied[d])
+            self.expires[d] = numpy.where(mask, numpy.inf, self.expires[d])
+            self.calendar[_foe_tick] = numpy.where(mask, now + self.cast_time + 3 * SECOND,
+                                                   self.calendar[_foe_tick])
+        elif name in ('windbite', 'venomous_bite'):
+            self.schedule_dot(_dots.index(name), mask, now, action)
+        elif name == 'iron_jaws':
+            for dot, aura in enumerate(_dots):
+                self.schedule_dot(dot, mask & self.up(aura, now), now, action)
+        elif name in ('raging_strikes', 'barrage'):
+            self.schedule_aura(name, mask, now, execute_time)
+        elif name == 'straight_shot':
+            self.consume('straighter_shot', mask & is_critical_hit, now)
+            self.schedule_aura('straight_shot', mask, now, execute_time)
+        elif name == 'refulgent_arrow':
+            self.consume('straighter_shot', mask & self.up('straighter_shot', now), now)
+        elif name == 'pitch_perfect':
+            self.add_repertoire(mask, -3)
+        elif name in _song_repertoire:
+            self.schedule_aura(name, mask, now, execute_time)
+            self.song_repertoire = numpy.where(mask, _song_repertoire[name], self.song_repertoire)
+            self.calendar[_song_start] = numpy.where(mask, now + execute_time,
+                                                     self.calendar[_song_start])
+            self.calendar[_song_end] = numpy.where(
+                mask, now + execute_time + self.durations[B[name]], self.calendar[_song_end])
+        elif name == 'empyreal_arrow':
+            mages_ballad, armys_paeon, wanderers_minuet = self.song(now)
+            self.add_repertoire(mask & (mages_ballad | armys_paeon | wanderers_minuet), 1)
+        elif name == 'heavy_shot':
+            proc = mask & (self.rng.uniform(size=self.lanes) < 0.2)
+            self.schedule_aura('straighter_shot', proc, now, execute_time)
@@ -0,0 +1,572 @@
+# -*- coding: utf-8 -*-
+"""Experimental engine that advances many iterations of an encounter in lockstep.
+
+The scalar :class:`~simfantasy.simulator.Simulation` processes one event at a time, one iteration
+at a time. Most iterations follow the same rotation and only differ in random outcomes and proc
+timings, so this engine instead keeps the state of every iteration in struct-of-arrays form and
+advances all of them with masked vector operations. Each iteration still moves along its own game
+clock: a single step takes every unfinished iteration to its next decision point.
+
+Job behavior is provided by a :class:`LockstepModel`, e.g.,
+:class:`simfantasy.jobs.bard_lockstep.BardLockstepModel`, which mirrors the job's scalar
+decision engine. A model can also carry several gear profiles of the same actor, in which case
+every profile's iterations share the same steps, see :meth:`LockstepSimulation.run_profiles`.
+"""
+
+import copy
+import logging
+from abc import ABCMeta, abstractmethod
+from datetime import timedelta
+from math import floor
+from typing import Dict, Hashable, Iterator, List, Mapping, Optional, Sequence, Tuple, \
+    Type, Union
+
+import numpy
+
+from simfantasy.common_math import base_stat_by_job, divisor_per_level, main_stat_per_level, \
+    sub_stat_per_level
+from simfantasy.enum import Attribute, Job, Slot
+from simfantasy.equipment import Item, Weapon
+from simfantasy.simulator import Simulation
+
+LOGGER = logging.getLogger(__name__)
+
+SECOND = 1000000
+"""Lockstep timestamps are whole microseconds, stored as floats.
+
+The scalar simulation adds :class:`~datetime.timedelta` objects to :class:`~datetime.datetime`
+objects, which is exact at microsecond resolution. Whole microseconds are just as exact in a float,
+so events that coincide in the scalar simulation, e.g., a GCD unlocking on the same tick as an
+auto-attack, also coincide here.
+"""
+
+
+def microseconds(delta: timedelta) -> int:
+    """Convert a length of time to the lockstep clock.
+
+    Arguments:
+        delta (datetime.timedelta): The length of time.
+
+    Returns:
+        int: The length of time, in microseconds.
+
+    Examples:
+        >>> microseconds(timedelta(seconds=2.42))
+        2420000
+    """
+    return delta // timedelta(microseconds=1)
+
+
+def attack_attribute(job: Optional[Job], powered_by: Attribute) -> Attribute:
+    """Return the main attribute that powers an action for a job.
+
+    Mirrors the selection made in :attr:`simfantasy.event.DamageEvent.damage`.
+
+    Arguments:
+        job (Optional[simfantasy.enum.Job]): The job performing the action.
+        powered_by (simfantasy.enum.Attribute): The attribute that powers the action.
+
+    Returns:
+        simfantasy.enum.Attribute: The main attribute used for attack rating.
+
+    Examples:
+        >>> attack_attribute(Job.BARD, Attribute.ATTACK_POWER)
+        <Attribute.DEXTERITY: 2>
+        >>> attack_attribute(Job.WHITE_MAGE, Attribute.ATTACK_MAGIC_POTENCY)
+        <Attribute.MIND: 5>
+    """
+    if powered_by is Attribute.ATTACK_POWER:
+        if job in (Job.BARD, Job.MACHINIST, Job.NINJA):
+            return Attribute.DEXTERITY
+
+        return Attribute.STRENGTH
+    elif powered_by is Attribute.ATTACK_MAGIC_POTENCY:
+        if job in (Job.ASTROLOGIAN, Job.SCHOLAR, Job.WHITE_MAGE):
+            return Attribute.MIND
+
+        return Attribute.INTELLIGENCE
+    elif powered_by is Attribute.HEALING_MAGIC_POTENCY:
+        return Attribute.MIND
+
+    raise Exception('Action affected by unexpected attribute.')
+
+
+class DamageKernel:
+    """Vectorized form of the :class:`~simfantasy.event.DamageEvent` damage formula.
+
+    Everything that only depends on the actor's stat block is computed once. Rolls for critical
+    hits, direct hits and damage randomization are then drawn for a whole batch of hits at once.
+    Kernels of several gear profiles can be combined with :meth:`stack`.
+
+    Arguments:
+        actor (simfantasy.actor.Actor): The actor dealing damage. Must have arisen, so that its
+            stats are populated.
+        powered_by (simfantasy.enum.Attribute): The attribute that powers the actor's actions.
+        hastened_by (Optional[simfantasy.enum.Attribute]): The attribute that speeds up the actor's
+            damage-over-time effects.
+        trait_multipliers (Tuple[float, ...]): Passive damage multipliers.
+
+    Attributes:
+        buff_multipliers (Tuple[float, ...]): Damage multiplier of each of the actor's
+            :attr:`~simfantasy.actor.Actor.damage_buffs`, in bit order.
+        critical_hit (float): The actor's critical hit rating.
+        direct_hit_chance (float): Probability of a direct hit.
+        f_ss (float): Speed modifier applied to damage-over-time ticks.
+    """
+
+    profile_attributes: Tuple[str, ...] = (
+        'f_wd', 'f_atk', 'f_det', 'f_tnc', 'f_ss', 'critical_hit', 'direct_hit_chance',
+    )
+    """Attributes that depend on gear, and therefore differ between profiles."""
+
+    def __init__(self, actor, powered_by: Attribute, hastened_by: Optional[Attribute],
+                 trait_multipliers: Tuple[float, ...]) -> None:
+        stats = actor.stats
+        level = actor.level
+
+        self.main_stat = main_stat = int(main_stat_per_level[level])
+        self.sub_stat = sub_stat = int(sub_stat_per_level[level])
+        self.divisor = divisor = int(divisor_per_level[level])
+
+        attribute = attack_attribute(actor.job, powered_by)
+        weapon = actor.gear[Slot.WEAPON]
+        weapon_damage = weapon.magic_damage \
+            if powered_by is not Attribute.ATTACK_POWER else weapon.physical_damage
+
+        self.f_wd = floor(
+            (main_stat * base_stat_by_job(actor.job, attribute) / 1000) + weapon_damage)
+        self.f_atk = floor((125 * (stats[attribute] - 292) / 292) + 100) / 100
+        self.f_det = floor(
+            130 * (stats[Attribute.DETERMINATION] - main_stat) / divisor + 1000) / 1000
+        self.f_tnc = floor(100 * (stats[Attribute.TENACITY] - sub_stat) / divisor + 1000) / 1000
+        self.f_ss = 1.0 if hastened_by is None else \
+            floor(130 * (stats[hastened_by] - sub_stat) / divisor + 1000) / 1000
+
+        self.critical_hit = stats[Attribute.CRITICAL_HIT]
+        self.direct_hit_chance = floor(
+            550 * (stats[Attribute.DIRECT_HIT] - sub_stat) / divisor) / 1000
+        self.trait_multipliers = trait_multipliers
+        self.buff_multipliers = tuple(aura.damage_multiplier for aura in actor.damage_buffs)
+
+    @classmethod
+    def stack(cls, kernels: Sequence['DamageKernel']) -> 'DamageKernel':
+        """Combine the kernels of several gear profiles of the same job and level.
+
+        Each of the :attr:`profile_attributes` of the combined kernel is an array indexed by
+        profile, and :meth:`roll` must be given the profile of every hit.
+
+        Arguments:
+            kernels (Sequence[simfantasy.lockstep.DamageKernel]): One kernel per profile.
+
+        Returns:
+            simfantasy.lockstep.DamageKernel: The combined kernel.
+        """
+        kernel = copy.copy(kernels[0])
+
+        for name in cls.profile_attributes:
+            setattr(kernel, name, numpy.array([getattr(k, name) for k in kernels]))
+
+        return kernel
+
+    def roll(self, rng: numpy.random.Generator, potency: numpy.ndarray,
+             buff_mask: numpy.ndarray, critical_hit: numpy.ndarray,
+             is_critical_hit: numpy.ndarray = None, periodic: bool = False,
+             profile: numpy.ndarray = None) -> Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+        """Roll damage for a batch of hits.
+
+        Arguments:
+            rng (numpy.random.Generator): Source of randomness.
+            potency (numpy.ndarray): Potency of each hit.
+            buff_mask (numpy.ndarray): :attr:`~simfantasy.actor.Actor.buff_mask` snapshot of each
+                hit.
+            critical_hit (numpy.ndarray): Critical hit rating at the time of each hit.
+            is_critical_hit (Optional[numpy.ndarray]): Predetermined critical hit outcomes, which
+                replace the roll. As with the ``guarantee_crit`` argument of
+                :class:`~simfantasy.event.DamageEvent`, False forbids a critical hit.
+            periodic (bool): True for damage-over-time ticks.
+            profile (Optional[numpy.ndarray]): Profile of each hit, for kernels combined with
+                :meth:`stack`.
+
+        Returns:
+            Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]: Damage, critical hit flags and
+            direct hit flags for each hit.
+        """
+        count = len(potency)
+
+        f_wd, f_atk, f_det, f_tnc, f_ss, _, direct_hit_chance = (
+            getattr(self, name) if profile is None else getattr(self, name)[profile]
+            for name in self.profile_attributes
+        )
+
+        p_chr = numpy.floor(200 * (critical_hit - self.sub_stat) / self.divisor + 50) / 1000
+        f_chr = numpy.floor(200 * (critical_hit - self.sub_stat) / self.divisor + 1400) / 1000
+
+        if is_critical_hit is None:
+            is_critical_hit = (p_chr > 0) & (rng.uniform(size=count) <= p_chr)
+
+        is_direct_hit = (direct_hit_chance > 0) & (rng.uniform(size=count) <= direct_hit_chance)
+
+        damage_randomization = rng.uniform(0.95, 1.05, size=count)
+
+        damage = potency / 100 * f_wd * f_atk * f_det * f_tnc
+
+        for m in self.trait_multipliers:
+            damage *= m
+
+        damage = numpy.floor(damage)
+
+        if periodic:
+            damage = numpy.floor(damage * f_ss)
+
+        damage = numpy.floor(damage * numpy.where(is_critical_hit, f_chr, 1))
+        damage = numpy.floor(damage * numpy.where(is_direct_hit, 1.25, 1))
+        damage = numpy.floor(damage * damage_randomization)
+
+        for bit, m in enumerate(self.buff_multipliers):
+            damage = numpy.where(buff_mask & (1 << bit), numpy.floor(damage * m), damage)
+
+        return damage, is_critical_hit, is_direct_hit
+
+
+class LockstepResults:
+    """Damage totals collected by :meth:`LockstepSimulation.run`.
+
+    Attributes:
+        action_damage (Dict[str, numpy.ndarray]): Damage dealt in each iteration, by action name.
+        combat_length (datetime.timedelta): Length of each simulated encounter.
+        damage (numpy.ndarray): Total damage dealt in each iteration.
+        steps (int): Number of Python-level steps taken to finish every iteration.
+    """
+
+    def __init__(self, combat_length: timedelta, damage: numpy.ndarray,
+                 action_damage: Dict[str, numpy.ndarray], steps: int) -> None:
+        self.combat_length: timedelta = combat_length
+        self.damage: numpy.ndarray = damage
+        self.action_damage: Dict[str, numpy.ndarray] = action_damage
+        self.steps: int = steps
+
+    @property
+    def dps(self) -> numpy.ndarray:
+        """Damage per second dealt in each iteration."""
+        return self.damage / self.combat_length.total_seconds()
+
+    def split(self, parts: int) -> List['LockstepResults']:
+        """Divide the iterations into equally sized, consecutive groups, e.g., one per profile.
+
+        Arguments:
+            parts (int): Number of groups.
+
+        Returns:
+            List[simfantasy.lockstep.LockstepResults]: Results of each group.
+
+        Examples:
+            >>> damage = numpy.array([100.0, 200.0, 300.0, 400.0])
+            >>> results = LockstepResults(timedelta(seconds=10), damage, {'Shot': damage}, steps=3)
+            >>> [part.dps.tolist() for part in results.split(2)]
+            [[10.0, 20.0], [30.0, 40.0]]
+        """
+        action_damage = {
+            name: numpy.split(damage, parts) for name, damage in self.action_damage.items()
+        }
+
+        return [
+            LockstepResults(self.combat_length, damage, {
+                name: chunks[part] for name, chunks in action_damage.items()
+            }, self.steps)
+            for part, damage in enumerate(numpy.split(self.damage, parts))
+        ]
+
+
+class LockstepModel(metaclass=ABCMeta):
+    """Struct-of-arrays model of a single actor's behavior across many iterations.
+
+    Iterations of every profile are laid out one profile after another, so that lane
+    ``p * iterations + i`` is iteration ``i`` of profile ``p``. State that depends on gear is
+    computed once per profile in :meth:`each_profile`; everything else is shared.
+
+    Arguments:
+        actor (simfantasy.actor.Actor): The actor being modeled.
+        profiles (Optional[Sequence[Mapping[~simfantasy.enum.Slot, ~simfantasy.equipment.Item]]]):
+            Gear to equip over the actor's own for each profile. Default: just the actor's own
+            gear.
+
+    Attributes:
+        actor (simfantasy.actor.Actor): The actor being modeled.
+        action_names (List[str]): Names of the modeled actions, by action index.
+        action_damage (numpy.ndarray): Damage dealt by each action in each lane.
+        combat_length (int): Length of the encounter, in microseconds.
+        damage (numpy.ndarray): Damage dealt in each lane.
+        execute_time (int): Length of the execute phase, in microseconds.
+        iterations (int): Number of iterations being advanced for each profile.
+        lanes (int): Number of iterations being advanced for all profiles together.
+        profile (numpy.ndarray): Profile index of each lane.
+        profiles (List[Mapping[~simfantasy.enum.Slot, ~simfantasy.equipment.Item]]): Gear of each
+            profile.
+        rng (numpy.random.Generator): Source of randomness.
+    """
+
+    def __init__(self, actor,
+                 profiles: Sequence[Mapping[Slot, Union[Item, Weapon]]] = None) -> None:
+        if profiles is None:
+            profiles = [{}]
+
+        self.actor = actor
+        self.profiles: List[Mapping[Slot, Union[Item, Weapon]]] = list(profiles)
+        self.action_names: List[str] = []
+        self.iterations: int = 0
+        self.lanes: int = 0
+        self.profile: numpy.ndarray = None
+        self.combat_length: float = 0
+        self.execute_time: float = 0
+        self.rng: numpy.random.Generator = None
+        self.damage: numpy.ndarray = None
+        self.action_damage: numpy.ndarray = None
+
+    def reset(self, engine: 'LockstepSimulation') -> None:
+        """Allocate fresh state for every iteration.
+
+        Arguments:
+            engine (simfantasy.lockstep.LockstepSimulation): The engine about to run the model.
+        """
+        self.iterations = engine.iterations
+        self.lanes = engine.iterations * len(self.profiles)
+        self.profile = numpy.repeat(numpy.arange(len(self.profiles)), engine.iterations)
+        self.combat_length = microseconds(engine.combat_length)
+        self.execute_time = microseconds(engine.execute_time)
+        self.rng = engine.rng
+        self.damage = numpy.zeros(self.lanes)
+        self.action_damage = numpy.zeros((len(self.action_names), self.lanes))
+
+    def each_profile(self) -> Iterator[int]:
+        """Equip and prepare the actor for each profile in turn.
+
+        The actor's stat block is updated incrementally for each profile, see
+        :meth:`simfantasy.stat_block.StatBlock.with_item`, and its own gear is restored afterwards.
+
+        Yields:
+            int: Index of the profile that was just equipped.
+        """
+        own = dict(self.actor.gear)
+
+        try:
+            for index, gear in enumerate(self.profiles):
+                self.actor.unequip_gear(set(self.actor.gear) - set(own) - set(gear))
+                self.actor.equip_gear({**own, **gear})
+                self.actor.arise()
+
+                yield index
+        finally:
+            self.actor.unequip_gear(set(self.actor.gear) - set(own))
+            self.actor.equip_gear(own)
+            self.actor.arise()
+
+    @property
+    @abstractmethod
+    def next_wake(self) -> numpy.ndarray:
+        """Timestamp of the next decision point of each iteration, in microseconds."""
+
+    @abstractmethod
+    def step(self, now: numpy.ndarray, active: numpy.ndarray) -> None:
+        """Advance every active iteration through its next decision point.
+
+        Arguments:
+            now (numpy.ndarray): Timestamp of the decision point of each iteration.
+            active (numpy.ndarray): True for iterations that have not finished yet.
+        """
+
+    def finish(self) -> None:
+        """Process anything still pending once every iteration has made its last decision."""
+
+    def record(self, action: numpy.ndarray, indices: numpy.ndarray, lands_at: numpy.ndarray,
+               damage: numpy.ndarray) -> None:
+        """Add damage to the totals, ignoring hits that land after combat has ended.
+
+        Arguments:
+            action (numpy.ndarray): Action index of each hit.
+            indices (numpy.ndarray): Lane of each hit. Must not repeat.
+            lands_at (numpy.ndarray): Timestamp when each hit lands.
+            damage (numpy.ndarray): Damage of each hit.
+        """
+        damage = numpy.where(lands_at < self.combat_length, damage, 0)
+
+        self.damage[indices] += damage
+        self.action_damage[action, indices] += damage
+
+    def results(self, steps: int) -> LockstepResults:
+        combat_length = timedelta(microseconds=self.combat_length)
+
+        return LockstepResults(combat_length, self.damage, {
+            name: self.action_damage[index] for index, name in enumerate(self.action_names)
+        }, steps)
+
+
+class LockstepSimulation:
+    """Run many iterations of an encounter in lockstep.
+
+    Arguments:
+        sim (simfantasy.simulator.Simulation): Provides the combat and execute lengths.
+        iterations (Optional[int]): Number of encounters to simulate. Default: the simulation's
+            iteration count.
+        seed (Optional[int]): Seed for the random number generator. Default: None.
+
+    Attributes:
+        combat_length (datetime.timedelta): Length of the encounter.
+        execute_time (datetime.timedelta): Length of time to allow jobs to use "execute" actions.
+        iterations (int): Number of encounters to simulate.
+        rng (numpy.random.Generator): Source of randomness shared by every iteration.
+    """
+
+    def __init__(self, sim: Simulation, iterations: int = None, seed: int = None) -> None:
+        if iterations is None:
+            iterations = sim.iterations
+
+        self.combat_length: timedelta = sim.combat_length
+        self.execute_time: timedelta = sim.execute_time
+        self.iterations: int = iterations
+        self.rng: numpy.random.Generator = numpy.random.default_rng(seed)
+
+    def run_profiles(self, model_class: Type[LockstepModel], actor,
+                     profiles: Mapping[Hashable, Mapping[Slot, Union[Item, Weapon]]]
+                     ) -> Dict[Hashable, LockstepResults]:
+        """Simulate several gear profiles of the same actor in a single run.
+
+        Every profile gets :attr:`iterations` iterations, and all of them are advanced by the same
+        steps. Tables that do not depend on gear are built once, and the ones that do are derived
+        from memoized stat blocks.
+
+        Arguments:
+            model_class (Type[simfantasy.lockstep.LockstepModel]): The actor behavior to simulate.
+            actor (simfantasy.actor.Actor): The actor to equip with each profile.
+            profiles (Mapping[Hashable, Mapping[~simfantasy.enum.Slot, ~simfantasy.equipment.Item]]):
+                Gear to equip over the actor's own, by profile identifier.
+
+        Returns:
+            Dict[Hashable, simfantasy.lockstep.LockstepResults]: Results, by profile identifier.
+
+        Examples:
+            .. testsetup::
+                >>> from simfantasy.enum import Race
+                >>> from simfantasy.jobs.bard import Bard
+                >>> from simfantasy.jobs.bard_lockstep import BardLockstepModel
+                >>> sim = Simulation(combat_length=timedelta(minutes=1), iterations=200)
+                >>> bard = Bard(sim, Race.HIGHLANDER)
+
+            >>> bows = {
+            ...     item_level: {Slot.WEAPON: Weapon(item_level, 70, 104, 3.04, 105.38,
+            ...                                      {Attribute.DEXTERITY: dexterity})}
+            ...     for item_level, dexterity in ((340, 300), (370, 347))
+            ... }
+            >>> results = LockstepSimulation(sim, seed=0).run_profiles(BardLockstepModel, bard,
+            ...                                                         bows)
+            >>> sorted(results)
+            [340, 370]
+            >>> results[340].dps.shape
+            (200,)
+            >>> results[340].dps.mean() < results[370].dps.mean()
+            True
+        """
+        results = self.run(model_class(actor, profiles=list(profiles.values())))
+
+        return dict(zip(profiles, results.split(len(profiles))))
+
+    def run(self, model: LockstepModel) -> LockstepResults:
+        """Advance every iteration until the end of combat.
+
+        Arguments:
+            model (simfantasy.lockstep.LockstepModel): The actor behavior to simulate.
+
+        Returns:
+            simfantasy.lockstep.LockstepResults: Damage dealt in each lane, see
+            :class:`LockstepModel`.
+        """
+        steps = 0
+
+        model.reset(self)
+
+        end = model.combat_length
+
+        while True:
+            now = model.next_wake
+            active = now < end
+
+            if not active.any():
+                break
+
+            model.step(now, active)
+            steps += 1
+
+        model.finish()
+
+        LOGGER.info('Finished %s lockstep iterations of %s profile(s) in %s steps.',
+                    self.iterations, len(model.profiles), steps)
+
+        return model.results(steps)
+
+
+def compare_distributions(expected: numpy.ndarray, observed: numpy.ndarray) -> Dict[str, float]:
+    """Summarize how closely two samples of per-iteration DPS agree.
+
+    Arguments:
+        expected (numpy.ndarray): Reference sample, e.g., from :meth:`Simulation.run`.
+        observed (numpy.ndarray): Sample under test, e.g., from :meth:`LockstepSimulation.run`.
+
+    Returns:
+        Dict[str, float]: Means and standard deviations of both samples, the relative difference
+        of the means, Welch's t statistic, and the two-sample Kolmogorov-Smirnov statistic.
+
+    Examples:
+        >>> rng = numpy.random.default_rng(0)
+        >>> comparison = compare_distributions(rng.normal(size=2000), rng.normal(size=2000))
+        >>> abs(comparison['t']) < 4 and comparison['ks'] < 0.1
+        True
+    """
+    expected = numpy.asarray(expected, dtype=float)
+    observed = numpy.asarray(observed, dtype=float)
+
+    standard_error = numpy.sqrt(expected.var(ddof=1) / len(expected) +
+                                observed.var(ddof=1) / len(observed))
+
+    values = numpy.sort(numpy.concatenate([expected, observed]))
+    cdf_expected = numpy.searchsorted(numpy.sort(expected), values, side='right') / len(expected)
+    cdf_observed = numpy.searchsorted(numpy.sort(observed), values, side='right') / len(observed)
+
+    return {
+        'expected_mean': expected.mean(),
+        'observed_mean': observed.mean(),
+        'expected_std': expected.std(ddof=1),
+        'observed_std': observed.std(ddof=1),
+        'relative_difference': observed.mean() / expected.mean() - 1,
+        't': (observed.mean() - expected.mean()) / standard_error if standard_error > 0 else 0.0,
+        'ks': numpy.abs(cdf_expected - cdf_observed).max(),
+    }
+
+
+def validate_against_scalar(sim: Simulation, model: LockstepModel,
+                            iterations: int = None, seed: int = None) -> Dict[str, float]:
+    """Compare the lockstep engine against the scalar simulation for the same actor.
+
+    The scalar simulation is run first, with its configured iteration count and without
+    reporting, then the model is run for ``iterations`` lockstep iterations.
+
+    Arguments:
+        sim (simfantasy.simulator.Simulation): The scalar simulation, with its actors set up.
+        model (simfantasy.lockstep.LockstepModel): Lockstep model of one of the simulation's
+            actors.
+        iterations (Optional[int]): Number of lockstep iterations. Default: the simulation's
+            iteration count.
+        seed (Optional[int]): Seed for the lockstep engine. Default: None.
+
+    Returns:
+        Dict[str, float]: See :func:`compare_distributions`.
+    """
+    scalar = sim.run(report=False).dps(model.actor.name).values
+    lockstep = LockstepSimulation(sim, iterations, seed).run(model).dps
+
+    comparison = compare_distributions(scalar, lockstep)
+
+    LOGGER.info('Scalar %.1f +/- %.1f DPS, lockstep %.1f +/- %.1f DPS (t=%.2f, ks=%.3f)',
+                comparison['expected_mean'], comparison['expected_std'],
+                comparison['observed_mean'], comparison['observed_std'],
+                comparison['t'], comparison['ks'])
+
+    return comparison
@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+"""Choose the materia to meld onto an actor's gear.
+
+Melds only matter through the attribute totals they add up to, so :class:`MeldSolver` allocates
+them by dynamic programming: item by item, every distinct running total is kept once, however many
+allocations reach it. The totals are then canonicalized to tier vectors, see
+:mod:`simfantasy.tiers`, each distinct one is valued once with a cheap model, e.g.,
+:func:`~simfantasy.optimize.expected_damage` or :func:`stat_weight_model`, and the best few are
+verified with real simulations.
+"""
+
+import logging
+from typing import Callable, List, Mapping, Sequence, Tuple
+
+import numpy
+
+from simfantasy.enum import Attribute, Slot
+from simfantasy.equipment import Materia
+from simfantasy.optimize import Gear, GearOptimizer, _expected_damage, meld, weapon_damage
+from simfantasy.simulator import Simulation
+from simfantasy.stat_block import _item_vector, calculate_stat_block, item_key
+from simfantasy.stat_weights import StatWeights
+from simfantasy.tiers import stat_multipliers, tier_index
+
+LOGGER = logging.getLogger(__name__)
+
+ValueModel = Callable[[numpy.ndarray], float]
+
+
+def _first_distinct(rows: numpy.ndarray) -> numpy.ndarray:
+    """Find the first of each distinct row, in the order of the rows' values.
+
+    Arguments:
+        rows (numpy.ndarray): Two-dimensional array.
+
+    Returns:
+        numpy.ndarray: Index of the first occurrence of each distinct row.
+
+    Examples:
+        >>> _first_distinct(numpy.array([[2, 1], [1, 5], [2, 1], [1, 3]])).tolist()
+        [3, 1, 0]
+    """
+    if rows.shape[1] == 0:
+        return numpy.arange(min(len(rows), 1))
+
+    if rows.shape[1] == 1:
+        return numpy.unique(rows[:, 0], return_index=True)[1]
+
+    # The sort is stable, so the first row of each run is the first occurrence.
+    order = numpy.lexsort(rows.T[::-1])
+    ordered = rows[order]
+    starts = numpy.ones(len(order), dtype=bool)
+    starts[1:] = numpy.any(ordered[1:] != ordered[:-1], axis=1)
+
+    return order[starts]
+
+
+def stat_weight_model(weights: StatWeights) -> ValueModel:
+    """Value attribute totals linearly, by their stat weights.
+
+    Arguments:
+        weights (simfantasy.stat_weights.StatWeights): The weights.
+
+    Returns:
+        Callable[[numpy.ndarray], float]: Estimated DPS of attribute totals indexed by
+        :attr:`Attribute.value`, up to a constant.
+    """
+    coefficients = numpy.zeros(len(Attribute) + 1)
+
+    for attribute, comparison in weights.comparisons.items():
+        coefficients[attribute.value] = comparison.mean / weights.delta
+
+    return lambda values: float(coefficients @ values)
+
+
+class MeldSolver(GearOptimizer):
+    """Find the melds for an actor's gear with the best simulated DPS.
+
+    The actor's items are kept, along with any materia already melded onto them.
+
+    Arguments:
+        sim (simfantasy.simulator.Simulation): The simulation.
+        actor (simfantasy.actor.Actor): The actor whose gear gets melded.
+        materia (Sequence[simfantasy.equipment.Materia]): Available materia, which may be used
+            any number of times.
+        slots (Optional[Mapping[~simfantasy.enum.Slot, int]]): Number of open meld slots of each
+            of the actor's items. Default: 2 on every item.
+        value (Optional[Callable[[numpy.ndarray], float]]): Model of the DPS of attribute totals
+            indexed by :attr:`Attribute.value`, used to rank allocations before any simulation.
+            Default: :func:`~simfantasy.optimize.expected_damage` with the actor's weapon.
+        seed (Optional[int]): See :class:`~simfantasy.optimize.GearOptimizer`.
+
+    Attributes:
+        value (Callable[[numpy.ndarray], float]): Model of the DPS of attribute totals.
+
+    Examples:
+        .. testsetup::
+            >>> from datetime import timedelta
+            >>> from simfantasy.actor import Actor
+            >>> from simfantasy.enum import Race
+            >>> from simfantasy.equipment import Item, Weapon
+            >>> from simfantasy.jobs.bard import Bard
+            >>> sim = Simulation(combat_length=timedelta(seconds=30), iterations=5)
+            >>> enemy = Actor(sim, Race.ENEMY)
+            >>> gear = {slot: Item(370, slot, {Attribute.DEXTERITY: 200,
+            ...                                Attribute.CRITICAL_HIT: 150})
+            ...         for slot in (Slot.HEAD, Slot.BODY, Slot.HANDS, Slot.LEGS, Slot.FEET,
+            ...                      Slot.EARRINGS, Slot.NECKLACE, Slot.BRACELET,
+            ...                      Slot.LEFT_RING, Slot.RIGHT_RING)}
+            >>> gear[Slot.WEAPON] = Weapon(370, 70, 104, 3.04, 105.38, {Attribute.DEXTERITY: 347})
+            >>> bard = Bard(sim, Race.HIGHLANDER, target=enemy, gear=gear)
+
+        >>> solver = MeldSolver(sim, bard, [Materia(Attribute.CRITICAL_HIT, 40),
+        ...                                 Materia(Attribute.DETERMINATION, 40),
+        ...                                 Materia(Attribute.DIRECT_HIT, 40),
+        ...                                 Materia(Attribute.SKILL_SPEED, 40)])
+        >>> result = solver.optimize(frontier=2, report=False)
+        >>> result.total
+        100000000000
+        >>> result.evaluated < 3000
+        True
+        >>> sum(len(item.melds) for item in result.best.values())
+        22
+    """
+
+    def __init__(self, sim: Simulation, actor, materia: Sequence[Materia],
+                 slots: Mapping[Slot, int] = None, value: ValueModel = None,
+                 seed: int = None) -> None:
+        if slots is None:
+            slots = dict.fromkeys(actor.gear, 2)
+
+        if value is None:
+            damage = weapon_damage(actor.job, actor.gear.get(Slot.WEAPON))
+
+            def value(values: numpy.ndarray) -> float:
+                return _expected_damage(values, actor.job, actor.level, damage)
+
+        super().__init__(sim, actor, {}, seed=seed)
+
+        self.value: ValueModel = value
+        self.options = {
+            slot: meld(actor.gear[slot], materia, count)
+            for slot, count in slots.items() if count > 0
+        }
+
+    def frontier(self, size: int) -> Tuple[List[Tuple[float, Gear]], int]:
+        """Find the allocations of materia with the highest :attr:`value`.
+
+        Arguments:
+            size (int): Number of allocations to keep.
+
+        Returns:
+            Tuple[List[Tuple[float, Dict[~simfantasy.enum.Slot, ~simfantasy.equipment.Item]]], int]:
+            The best melded gear with its value, from the highest value to the lowest, and the
+            number of distinct tier vectors that were valued.
+        """
+        actor = self.actor
+        fixed = self._fixed_gear()
+        base = calculate_stat_block(actor.level, actor.job, actor.role, actor.race, fixed)
+        slots = list(self.options)
+
+        if not slots:
+            return [(self.value(base.values), fixed)][:size], 1
+
+        # Each slot adds the least of every attribute among its options, plus what the chosen
+        # option adds beyond that, and only attributes where options differ are tracked.
+        vectors = [numpy.array([_item_vector(item_key(item)) for item in self.options[slot]])
+                   for slot in slots]
+        floors = [slot_vectors.min(axis=0) for slot_vectors in vectors]
+        offset = base.values + sum(floors)
+        columns = numpy.flatnonzero(numpy.any([numpy.ptp(slot_vectors, axis=0)
+                                               for slot_vectors in vectors], axis=0))
+        deltas = [(slot_vectors - slot_floors)[:, columns]
+                  for slot_vectors, slot_floors in zip(vectors, floors)]
+
+        # Totals are compared packed into integers, with a digit per tracked attribute, since what
+        # the options add beyond the least is never negative and bounded. Digits go into as many
+        # 63-bit words as they need, one per column of the packing.
+        radix = sum(slot_deltas.max(axis=0) for slot_deltas in deltas) + 1
+        packing = numpy.zeros((len(columns), 0), dtype=numpy.int64)
+        stride = 2 ** 63
+
+        for column, digit in enumerate(radix):
+            if stride * int(digit) >= 2 ** 63:
+                packing = numpy.column_stack([packing, numpy.zeros(len(columns), numpy.int64)])
+                stride = 1
+
+            packing[column, -1] = stride
+            stride *= int(digit)
+
+        # Allocations that reach the same totals are interchangeable from here on, so only the
+        # first one to reach each total is kept, along with the state and option it came from.
+        totals = numpy.zeros((1, len(columns)), dtype=numpy.int64)
+        steps: List[Tuple[numpy.ndarray, numpy.ndarray]] = []
+
+        for slot_deltas in deltas:
+            reached = (totals[:, None, :] + slot_deltas[None, :, :]).reshape(-1, len(columns))
+            first = _first_distinct(reached @ packing)
+            totals = reached[first]
+            steps.append(numpy.divmod(first, len(slot_deltas)))
+
+        # Totals in the same tiers, including once multiplied by the actor's stat buffs, are
+        # valued, and would be simulated, only once.
+        tiers = tier_index(actor.level)
+        attribute_totals = totals + offset[columns]
+        tier_columns = []
+
+        for column, values in zip(columns, attribute_totals.T):
+            attribute = Attribute(column)
+            formula = tiers.formulas.get(attribute)
+
+            if formula is None:
+                tier_columns.append(values)
+                continue
+
+            multiplier, attribute_offset, divisor = formula
+            tier_columns.append(multiplier * (values - attribute_offset) // divisor)
+
+            for buffed, factor in stat_multipliers(actor.stat_buffs):
+                if buffed is attribute:
+                    tier_columns.append(numpy.floor(
+                        multiplier * (values * factor - attribute_offset) / divisor))
+
+        distinct = _first_distinct(numpy.column_stack(tier_columns) if tier_columns else totals)
+
+        def value(state: int) -> float:
+            values = offset.copy()
+            values[columns] += totals[state]
+
+            return self.value(values)
+
+        valued = sorted(((value(state), state) for state in distinct),
+                        key=lambda entry: -entry[0])
+
+        best = []
+
+        for estimate, state in valued[:size]:
+            gear = dict(fixed)
+
+            for slot, (parents, options) in zip(reversed(slots), reversed(steps)):
+                gear[slot] = self.options[slot][options[state]]
+                state = parents[state]
+
+            best.append((estimate, gear))
+
+        return best, len(distinct)
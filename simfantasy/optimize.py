@@ -0,0 +1,486 @@
+# -*- coding: utf-8 -*-
+"""Search for the gear set with the best simulated DPS.
+
+Every combination of candidate items and melds is far too many to simulate, so
+:class:`GearOptimizer` first ranks them with :func:`expected_damage`, the damage formula of
+:attr:`DamageEvent.damage <simfantasy.event.DamageEvent.damage>` with every roll replaced by its
+expected value. That formula never decreases when any attribute or the weapon damage goes up, so
+the best value any completion of a partial set can reach is bounded by adding the highest of every
+attribute among the remaining candidates, and a branch-and-bound search keeps only the best few
+sets without visiting most of the others. Only that frontier is simulated, with common random
+numbers. Sets whose attributes fall in the same tiers, see :mod:`simfantasy.tiers`, both as
+equipped and as multiplied by the actor's :attr:`~simfantasy.actor.Actor.stat_buffs`, deal the
+same damage, so each distinct tier vector is simulated only once.
+"""
+
+import heapq
+import logging
+from copy import copy
+from datetime import timedelta
+from functools import lru_cache
+from itertools import combinations_with_replacement, count
+from math import floor
+from typing import Dict, List, Mapping, Optional, Sequence, Set, Tuple, Union
+
+import numpy
+import pandas as pd
+
+from simfantasy.action import action_speed
+from simfantasy.common_math import base_stat_by_job, divisor_per_level, main_stat_per_level, \
+    sub_stat_per_level
+from simfantasy.compare import PairedComparison, common_random_numbers, equipped
+from simfantasy.enum import Attribute, Job, Slot
+from simfantasy.equipment import Item, Materia, Weapon
+from simfantasy.simulator import Simulation
+from simfantasy.stat_block import StatBlock, _item_vector, calculate_stat_block, item_key
+from simfantasy.tiers import TierVector, tier_index
+
+LOGGER = logging.getLogger(__name__)
+
+Gear = Dict[Slot, Union[Item, Weapon]]
+WeaponKey = Tuple[int, int, float, float]
+
+_main_attributes = (Attribute.STRENGTH, Attribute.DEXTERITY, Attribute.INTELLIGENCE,
+                    Attribute.MIND)
+
+
+@lru_cache(maxsize=None)
+def main_attribute(job: Optional[Job]) -> Attribute:
+    """Find the attribute that powers a job's damage, i.e., its highest base main stat.
+
+    Arguments:
+        job (Optional[simfantasy.enum.Job]): The job.
+
+    Returns:
+        simfantasy.enum.Attribute: The attribute.
+
+    Examples:
+        >>> main_attribute(Job.BARD)
+        <Attribute.DEXTERITY: 2>
+    """
+    return max(_main_attributes, key=lambda attribute: base_stat_by_job(job, attribute))
+
+
+def weapon_damage(job: Optional[Job], weapon: Optional[Weapon]) -> int:
+    """Get the damage of a weapon that applies to a job.
+
+    Arguments:
+        job (Optional[simfantasy.enum.Job]): The job.
+        weapon (Optional[simfantasy.equipment.Weapon]): The weapon, if any.
+
+    Returns:
+        int: Physical damage for jobs powered by strength or dexterity, magic damage otherwise.
+    """
+    if weapon is None:
+        return 0
+
+    if main_attribute(job) in (Attribute.STRENGTH, Attribute.DEXTERITY):
+        return weapon.physical_damage
+
+    return weapon.magic_damage
+
+
+def weapon_key(weapon: Optional[Weapon]) -> Optional[WeaponKey]:
+    """Summarize everything about a weapon, besides attributes, that can affect damage.
+
+    Arguments:
+        weapon (Optional[simfantasy.equipment.Weapon]): The weapon, if any.
+
+    Returns:
+        Optional[Tuple[int, int, float, float]]: Physical damage, magic damage, delay and auto
+        attack of the weapon.
+    """
+    if weapon is None:
+        return None
+
+    return weapon.physical_damage, weapon.magic_damage, weapon.delay, weapon.auto_attack
+
+
+def _expected_damage(values: numpy.ndarray, job: Optional[Job], level: int,
+                     damage: int) -> float:
+    attribute = main_attribute(job)
+
+    main_stat = main_stat_per_level[level]
+    sub_stat = sub_stat_per_level[level]
+    divisor = divisor_per_level[level]
+
+    f_wd = floor((main_stat * base_stat_by_job(job, attribute) / 1000) + damage)
+    f_atk = floor((125 * (values[attribute.value] - 292) / 292) + 100) / 100
+    f_det = floor(
+        130 * (values[Attribute.DETERMINATION.value] - main_stat) / divisor + 1000) / 1000
+    f_tnc = floor(100 * (values[Attribute.TENACITY.value] - sub_stat) / divisor + 1000) / 1000
+
+    crit = values[Attribute.CRITICAL_HIT.value] - sub_stat
+    p_chr = floor(200 * crit / divisor + 50) / 1000
+    f_chr = floor(200 * crit / divisor + 1400) / 1000
+    p_dhr = floor(550 * (values[Attribute.DIRECT_HIT.value] - sub_stat) / divisor) / 1000
+
+    gcd = action_speed(timedelta(seconds=2.5), int(values[Attribute.SKILL_SPEED.value]), level)
+
+    return f_wd * f_atk * f_det * f_tnc * (1 + p_chr * (f_chr - 1)) * (1 + 0.25 * p_dhr) * \
+        2.5 / gcd.total_seconds()
+
+
+def expected_damage(stat_block: StatBlock, weapon: Optional[Weapon]) -> float:
+    """Estimate the damage of 100 potency per 2.5s GCD, sped up by skill speed.
+
+    Critical and direct hits contribute their expected value, and damage randomization, traits
+    and buffs are left out. The estimate is only meant to rank gear sets.
+
+    Arguments:
+        stat_block (simfantasy.stat_block.StatBlock): Attribute totals of the actor.
+        weapon (Optional[simfantasy.equipment.Weapon]): The actor's weapon.
+
+    Returns:
+        float: The estimate.
+
+    Examples:
+        >>> from simfantasy.enum import Race, Role
+        >>> bow = Weapon(370, 70, 104, 3.04, 105.38, {Attribute.DEXTERITY: 347})
+        >>> block = calculate_stat_block(70, Job.BARD, Role.DPS, Race.HIGHLANDER,
+        ...                              {Slot.WEAPON: bow})
+        >>> crit = block.with_item(Slot.RING, Item(370, Slot.RING, {Attribute.CRITICAL_HIT: 100}))
+        >>> expected_damage(crit, bow) > expected_damage(block, bow)
+        True
+    """
+    return _expected_damage(stat_block.values, stat_block.job, stat_block.level,
+                            weapon_damage(stat_block.job, weapon))
+
+
+def meld(item: Union[Item, Weapon], materia: Sequence[Materia],
+         slots: int) -> List[Union[Item, Weapon]]:
+    """Copy an item with every distinct combination of extra materia.
+
+    Arguments:
+        item (simfantasy.equipment.Item): The item.
+        materia (Sequence[simfantasy.equipment.Materia]): Candidate materia, which may be used
+            more than once.
+        slots (int): Number of materia added to each copy.
+
+    Returns:
+        List[simfantasy.equipment.Item]: One copy per combination that grants distinct
+        attribute totals.
+
+    Examples:
+        >>> ring = Item(370, Slot.RING, {Attribute.DEXTERITY: 149})
+        >>> len(meld(ring, [Materia(Attribute.CRITICAL_HIT, 40),
+        ...                 Materia(Attribute.DIRECT_HIT, 40)], 2))
+        3
+    """
+    melded: Dict[Tuple, Union[Item, Weapon]] = {}
+
+    for combination in combinations_with_replacement(materia, slots):
+        variant = copy(item)
+        variant.melds = [*item.melds, *combination]
+
+        melded.setdefault(item_key(variant), variant)
+
+    return list(melded.values())
+
+
+class GearOptimization:
+    """Simulated DPS of the best gear sets found by :class:`GearOptimizer`.
+
+    Arguments:
+        gear (List[Dict[~simfantasy.enum.Slot, ~simfantasy.equipment.Item]]): The gear sets, from
+            the highest mean DPS to the lowest.
+        estimates (List[float]): :func:`expected_damage` of each set.
+        comparisons (List[simfantasy.compare.PairedComparison]): DPS of the best set against each
+            set.
+        evaluated (int): Number of complete sets that the search estimated.
+        total (int): Number of possible sets.
+
+    Attributes:
+        best (Dict[~simfantasy.enum.Slot, ~simfantasy.equipment.Item]): The set with the highest
+            mean DPS.
+        comparisons (List[simfantasy.compare.PairedComparison]): DPS of the best set against each
+            set.
+        estimates (List[float]): :func:`expected_damage` of each set.
+        evaluated (int): Number of complete sets that the search estimated.
+        gear (List[Dict[~simfantasy.enum.Slot, ~simfantasy.equipment.Item]]): The gear sets, from
+            the highest mean DPS to the lowest.
+        total (int): Number of possible sets.
+    """
+
+    def __init__(self, gear: List[Gear], estimates: List[float],
+                 comparisons: List[PairedComparison], evaluated: int, total: int) -> None:
+        self.gear: List[Gear] = gear
+        self.estimates: List[float] = estimates
+        self.comparisons: List[PairedComparison] = comparisons
+        self.evaluated: int = evaluated
+        self.total: int = total
+
+    @property
+    def best(self) -> Gear:
+        return self.gear[0]
+
+    def table(self) -> pd.DataFrame:
+        """Tabulate the gear sets.
+
+        Returns:
+            pandas.DataFrame: Mean DPS of each set, ``dps``, its difference to the best set,
+            ``difference``, with the half-width of the paired confidence interval, ``margin``,
+            and its :func:`expected_damage`, ``estimate``.
+        """
+        return pd.DataFrame({
+            'dps': [comparison.second.mean() for comparison in self.comparisons],
+            'difference': [comparison.mean for comparison in self.comparisons],
+            'margin': [comparison.margin for comparison in self.comparisons],
+            'estimate': self.estimates,
+        })
+
+    def report(self) -> None:
+        """Log the gear sets and the best one."""
+        LOGGER.info('Simulated %s of %s gear sets (%s estimated):\n\n%s\n', len(self.gear),
+                    self.total, self.evaluated, self.table())
+
+        LOGGER.info('Best gear:\n\n%s\n', '\n'.join(
+            '{0}: {1}'.format(slot.name, item.name or item_key(item))
+            for slot, item in sorted(self.best.items(), key=lambda pair: pair[0].value)
+        ))
+
+
+class GearOptimizer:
+    """Find the gear set of an actor with the best simulated DPS.
+
+    Arguments:
+        sim (simfantasy.simulator.Simulation): The simulation.
+        actor (simfantasy.actor.Actor): The actor to equip.
+        candidates (Mapping[~simfantasy.enum.Slot, Sequence[~simfantasy.equipment.Item]]):
+            Candidate items for each slot. Other slots keep the actor's own gear.
+        materia (Optional[Sequence[~simfantasy.equipment.Materia]]): Candidate materia melded
+            onto every candidate item. Default: none, i.e., items keep their own melds.
+        melds (Optional[int]): Number of materia melded onto each candidate item. Default: 2.
+        seed (Optional[int]): Seed of every simulation, so that all of them share common random
+            numbers. Default: the simulation's seed, or a fresh one.
+
+    Attributes:
+        actor (simfantasy.actor.Actor): The actor to equip.
+        options (Dict[~simfantasy.enum.Slot, List[~simfantasy.equipment.Item]]): Candidate items
+            for each slot, with every combination of melds.
+        seed (int): Seed of every simulation.
+        sim (simfantasy.simulator.Simulation): The simulation.
+        simulated (Dict[Tuple, pandas.Series]): DPS in each iteration, for each distinct tier
+            vector and :func:`weapon_key` that was simulated.
+
+    Examples:
+        .. testsetup::
+            >>> from datetime import timedelta
+            >>> from simfantasy.actor import Actor
+            >>> from simfantasy.enum import Race
+            >>> from simfantasy.jobs.bard import Bard
+            >>> sim = Simulation(combat_length=timedelta(seconds=30), iterations=5)
+            >>> enemy = Actor(sim, Race.ENEMY)
+            >>> bard = Bard(sim, Race.HIGHLANDER, target=enemy)
+
+        >>> bows = [Weapon(370, 70, 104, 3.04, 105.38, {Attribute.DEXTERITY: 347}, name='Old'),
+        ...         Weapon(380, 72, 107, 3.04, 108.42, {Attribute.DEXTERITY: 358}, name='New')]
+        >>> rings = [Item(370, Slot.RING, {Attribute.DEXTERITY: 100}, name='Dex'),
+        ...          Item(370, Slot.RING, {Attribute.VITALITY: 100}, name='Vit')]
+        >>> optimizer = GearOptimizer(sim, bard, {
+        ...     Slot.WEAPON: bows, Slot.LEFT_RING: rings, Slot.RIGHT_RING: rings,
+        ... }, materia=[Materia(Attribute.CRITICAL_HIT, 40), Materia(Attribute.DIRECT_HIT, 40)])
+        >>> result = optimizer.optimize(frontier=3, report=False)
+        >>> result.best[Slot.WEAPON].name, result.best[Slot.LEFT_RING].name
+        ('New', 'Dex')
+        >>> result.evaluated < result.total
+        True
+    """
+
+    def __init__(self, sim: Simulation, actor,
+                 candidates: Mapping[Slot, Sequence[Union[Item, Weapon]]],
+                 materia: Sequence[Materia] = None, melds: int = None, seed: int = None) -> None:
+        if materia is None:
+            materia = []
+
+        if melds is None:
+            melds = 2
+
+        if seed is None:
+            seed = sim.seed
+
+        if seed is None:
+            seed = int(numpy.random.SeedSequence().generate_state(1)[0])
+
+        self.sim: Simulation = sim
+        self.actor = actor
+        self.seed: int = seed
+        self.simulated: Dict[Tuple[TierVector, Optional[WeaponKey]], pd.Series] = {}
+
+        self.options: Dict[Slot, List[Union[Item, Weapon]]] = {}
+
+        for slot, items in candidates.items():
+            self.options[slot] = [
+                variant for item in items
+                for variant in (meld(item, materia, melds) if materia else [item])
+            ]
+
+    def _fixed_gear(self) -> Gear:
+        return {slot: item for slot, item in self.actor.gear.items() if slot not in self.options}
+
+    def frontier(self, size: int) -> Tuple[List[Tuple[float, Gear]], int]:
+        """Find the gear sets with the highest :func:`expected_damage`, by branch and bound.
+
+        Arguments:
+            size (int): Number of sets to keep.
+
+        Returns:
+            Tuple[List[Tuple[float, Dict[~simfantasy.enum.Slot, ~simfantasy.equipment.Item]]], int]:
+            The best sets with their estimates, from the highest estimate to the lowest, and the
+            number of complete sets that were estimated.
+        """
+        actor = self.actor
+        fixed = self._fixed_gear()
+        base = calculate_stat_block(actor.level, actor.job, actor.role, actor.race, fixed)
+
+        def estimate(values: numpy.ndarray, damage: int) -> float:
+            return _expected_damage(values, actor.job, actor.level, damage)
+
+        # Slots with the most options go first, where pruning saves the most, and the options that
+        # look best on their own go first, so good sets are kept early and prune the rest.
+        slots = sorted(self.options, key=lambda slot: -len(self.options[slot]))
+        orders: List[List[int]] = []
+        vectors: List[List[numpy.ndarray]] = []
+        damages: List[List[Optional[int]]] = []
+
+        for slot in slots:
+            options = self.options[slot]
+            slot_vectors = [_item_vector(item_key(item)) for item in options]
+            slot_damages = [weapon_damage(actor.job, item) if slot is Slot.WEAPON else None
+                            for item in options]
+            order = sorted(range(len(options)), key=lambda option: -estimate(
+                base.values + slot_vectors[option],
+                weapon_damage(actor.job, fixed.get(Slot.WEAPON))
+                if slot_damages[option] is None else slot_damages[option]))
+
+            orders.append(order)
+            vectors.append([slot_vectors[option] for option in order])
+            damages.append([slot_damages[option] for option in order])
+
+        # Highest total of every attribute that the remaining slots can still add.
+        ceilings = [numpy.zeros_like(base.values)]
+
+        for slot_vectors in reversed(vectors):
+            ceilings.insert(0, ceilings[0] + numpy.max(slot_vectors, axis=0))
+
+        # Until the weapon is chosen, the best candidate weapon bounds the weapon damage.
+        weapon_depth = slots.index(Slot.WEAPON) if Slot.WEAPON in slots else -1
+        best_damage = max(damages[weapon_depth]) if weapon_depth >= 0 else None
+
+        kept: List[Tuple[float, int, Tuple[int, ...], Tuple]] = []
+        kept_stats: Set[Tuple] = set()
+        tiers = tier_index(actor.level)
+        buffs = actor.stat_buffs
+        tiebreak = count()
+        evaluated = 0
+
+        def search(depth: int, values: numpy.ndarray, damage: int,
+                   choice: Tuple[int, ...]) -> None:
+            nonlocal evaluated
+
+            if depth == len(slots):
+                evaluated += 1
+
+                # Sets in the same tiers would only be simulated once, so only one of them is kept.
+                stats = (tiers.tiers(values, buffs), None if weapon_depth < 0 else weapon_key(
+                    self.options[Slot.WEAPON][orders[weapon_depth][choice[weapon_depth]]]))
+
+                if stats in kept_stats:
+                    return
+
+                entry = (estimate(values, damage), next(tiebreak), choice, stats)
+                kept_stats.add(stats)
+
+                if len(kept) < size:
+                    heapq.heappush(kept, entry)
+                else:
+                    kept_stats.discard(heapq.heappushpop(kept, entry)[3])
+
+                return
+
+            bound = estimate(values + ceilings[depth],
+                             best_damage if depth <= weapon_depth else damage)
+
+            if len(kept) == size and bound <= kept[0][0]:
+                return
+
+            for option, vector in enumerate(vectors[depth]):
+                option_damage = damages[depth][option]
+
+                search(depth + 1, values + vector,
+                       damage if option_damage is None else option_damage, choice + (option,))
+
+        search(0, base.values, weapon_damage(actor.job, fixed.get(Slot.WEAPON)), ())
+
+        best = []
+
+        for value, _, choice, _ in sorted(kept, reverse=True):
+            gear = dict(fixed)
+            gear.update({slot: self.options[slot][order[option]]
+                         for slot, order, option in zip(slots, orders, choice)})
+            best.append((value, gear))
+
+        return best, evaluated
+
+    def simulate(self, gear: Gear) -> pd.Series:
+        """Simulate the actor in a gear set, unless a set in the same tiers was simulated.
+
+        Arguments:
+            gear (Dict[~simfantasy.enum.Slot, ~simfantasy.equipment.Item]): The gear set.
+
+        Returns:
+            pandas.Series: DPS of the actor in each iteration.
+        """
+        actor = self.actor
+        stat_block = calculate_stat_block(actor.level, actor.job, actor.role, actor.race, gear)
+        key = (tier_index(actor.level).tiers(stat_block, actor.stat_buffs),
+               weapon_key(gear.get(Slot.WEAPON)))
+
+        dps = self.simulated.get(key)
+
+        if dps is None:
+            with common_random_numbers(self.sim, self.seed), equipped(actor, gear):
+                dps = self.simulated[key] = self.sim.run(report=False).dps(actor.name)
+
+        return dps
+
+    def optimize(self, frontier: int = None, report: bool = None) -> GearOptimization:
+        """Simulate the gear sets with the highest estimates, and rank them by mean DPS.
+
+        Arguments:
+            frontier (Optional[int]): Number of gear sets to simulate. Default: 10.
+            report (Optional[bool]): True to log the results. Default: True.
+
+        Returns:
+            simfantasy.optimize.GearOptimization: The simulated gear sets.
+        """
+        if frontier is None:
+            frontier = 10
+
+        if report is None:
+            report = True
+
+        candidates, evaluated = self.frontier(frontier)
+
+        if not candidates:
+            raise ValueError('There are no gear sets to simulate.')
+
+        simulated = sorted(
+            ((self.simulate(gear), value, gear) for value, gear in candidates),
+            key=lambda entry: -entry[0].mean(),
+        )
+
+        best = simulated[0][0]
+        total = int(numpy.prod([len(options) for options in self.options.values()]))
+
+        result = GearOptimization(
+            [gear for _, _, gear in simulated],
+            [value for _, value, _ in simulated],
+            [PairedComparison(best, dps, confidence=self.sim.confidence)
+             for dps, _, _ in simulated],
+            evaluated, total)
+
+        if report is True:
+            result.report()
+
+        return result
@@ -1,16 +1,23 @@
 import logging
 from abc import ABC, abstractmethod
+from datetime import timedelta
 from math import pi
+from typing import Optional, TYPE_CHECKING, Tuple, Union
 
 import bokeh.io
 import bokeh.layouts
 import bokeh.models
 import bokeh.palettes
 import bokeh.plotting
-import bokeh.transform
 import numpy as np
 import pandas as pd
 
+from simfantasy.health import combat_lengths
+from simfantasy.sketch import DamageSketches
+
+if TYPE_CHECKING:
+    from simfantasy.columnar import ColumnarExport
+
 LOGGER = logging.getLogger(__name__)
 
 
@@ -29,79 +36,423 @@ class Reporter(ABC):
         pass
 
 
+def aggregate_damage(damage: pd.DataFrame) -> pd.DataFrame:
+    """Total damage and hit counts by source, target, action and periodicity, in one pass.
+
+    Accepts damage events as collected by :meth:`simfantasy.simulator.Simulation.run`, or totals
+    that already have ``hits`` counts, e.g., from :func:`simfantasy.cache.summarize_damage`.
+
+    Arguments:
+        damage (pandas.DataFrame): Damage events or totals.
+
+    Returns:
+        pandas.DataFrame: ``damage``, ``hits``, ``critical`` and ``direct`` totals, indexed by
+        ``source``, ``target``, ``action`` and ``dot``.
+
+    Examples:
+        >>> damage = pd.DataFrame({
+        ...     'source': ['Bard'] * 3, 'target': ['Dummy'] * 3,
+        ...     'action': ['Shot', 'Shot', 'Windbite'], 'dot': [False, False, True],
+        ...     'damage': [100, 140, 50], 'critical': [True, False, False],
+        ...     'direct': [False, False, True],
+        ... })
+        >>> aggregate_damage(damage).loc[('Bard', 'Dummy', 'Shot', False)].tolist()
+        [240, 2, 1, 0]
+    """
+    grouped = damage.groupby(['source', 'target', 'action', 'dot'], observed=True, sort=False)
+
+    if 'hits' in damage:
+        return grouped[['damage', 'hits', 'critical', 'direct']].sum()
+
+    return grouped.agg(damage=('damage', 'sum'), hits=('damage', 'size'),
+                       critical=('critical', 'sum'), direct=('direct', 'sum'))
+
+
+def damage_table(totals: pd.DataFrame, by: str) -> pd.DataFrame:
+    """Summarize damage totals of each source by one other dimension.
+
+    Arguments:
+        totals (pandas.DataFrame): Totals from :func:`aggregate_damage`.
+        by (str): ``'target'`` or ``'action'``.
+
+    Returns:
+        pandas.DataFrame: Hit count, total damage, percentage of the source's damage, mean damage
+        per hit, and critical and direct hit rates, sorted by total damage.
+
+    Examples:
+        >>> totals = pd.DataFrame(
+        ...     {'damage': [240, 60], 'hits': [2, 1], 'critical': [1, 0], 'direct': [0, 1]},
+        ...     index=pd.MultiIndex.from_tuples([('Bard', 'Dummy', 'Shot', False),
+        ...                                      ('Bard', 'Dummy', 'Windbite', True)],
+        ...                                     names=['source', 'target', 'action', 'dot']))
+        >>> damage_table(totals, 'action').loc[('Bard', 'Shot')].tolist()
+        [2.0, 240.0, 80.0, 120.0, 50.0, 0.0]
+    """
+    grouped = totals.groupby(level=['source', by], observed=True).sum()
+    hits = grouped['hits']
+    source_damage = grouped['damage'].groupby(level='source', observed=True).transform('sum')
+
+    return pd.DataFrame({
+        '#': hits,
+        'sum': grouped['damage'],
+        'pct_total': grouped['damage'] / source_damage * 100,
+        'mean': grouped['damage'] / hits,
+        'critical': grouped['critical'] / hits * 100,
+        'direct': grouped['direct'] / hits * 100,
+    }).sort_values(by='sum', ascending=False)
+
+
 class TerminalReporter(Reporter):
+    """Report damage tables and DPS distributions to the log.
+
+    Arguments:
+        sim (simfantasy.simulator.Simulation): The simulation.
+        auras (pandas.DataFrame): Aura events.
+        damage (pandas.DataFrame): Damage events or totals, indexed by iteration.
+        resources (pandas.DataFrame): Resource events.
+        sketches (Optional[simfantasy.sketch.DamageSketches]): Sketches to print quantiles from,
+            e.g., kept by :meth:`Simulation.run <simfantasy.simulator.Simulation.run>`. Default:
+            sketched from the damage events.
+    """
+
+    def __init__(self, sim, auras: pd.DataFrame, damage: pd.DataFrame, resources: pd.DataFrame,
+                 sketches: DamageSketches = None) -> None:
+        super().__init__(sim, auras, damage, resources)
+
+        self.sketches: Optional[DamageSketches] = sketches
+
     def report(self):
         pd.set_option('display.width', None)
 
-        # @formatter:off
-        mean_dps = (self.damage.groupby([self.damage.index, 'source'])[
-                        'damage'].sum()) / self.sim.combat_length.total_seconds()
-        mean_dps = mean_dps.groupby('source').mean().to_frame()
-        LOGGER.info('Average DPS:\n\n%s\n', mean_dps)
+        sketches = self.sketches
+
+        if sketches is None:
+            sketches = DamageSketches(self.sim.combat_length)
+            sketches.update(self.damage, combat_lengths(self.sim, self.damage))
+
+        totals = aggregate_damage(self.damage)
+
+        # Iterations can differ in length, when enemies die, so DPS is averaged per iteration.
+        iterations = self.damage.index.nunique()
+        mean_dps = pd.Series({source: sketch.mean for source, sketch in sketches.dps.items()},
+                             name='mean', dtype=float).sort_index()
+
+        # Half-width of the confidence interval of the mean, in DPS and relative to the mean.
+        margin = pd.Series({source: sketch.margin(self.sim.confidence)
+                            for source, sketch in sketches.dps.items()}, name='margin', dtype=float)
+        error = (margin / mean_dps * 100).rename('error')
+
+        LOGGER.info('DPS (%s iterations, %s confidence):\n\n%s\n', iterations,
+                    format(self.sim.confidence, '.0%'),
+                    pd.concat([mean_dps, margin, error], axis=1).join(sketches.quantiles('dps')))
+
+        if sketches.controls:
+            LOGGER.info('Mean DPS with Critical and Direct Hit Control Variates (%s confidence):'
+                        '\n\n%s\n', format(self.sim.confidence, '.0%'),
+                        sketches.control_variates(self.sim.confidence))
+
+        LOGGER.info('Damage Dealt by Action\n\n%s\n', damage_table(totals, 'action'))
+
+        ticks = totals[totals.index.get_level_values('dot').to_numpy(dtype=bool)]
+        LOGGER.info('Tick Damage Dealt by Action\n\n%s\n', damage_table(ticks, 'action'))
+
+        LOGGER.info('Damage Dealt by Target\n\n%s\n', damage_table(totals, 'target'))
+
+        LOGGER.info('Damage per Iteration by Action\n\n%s\n',
+                    sketches.quantiles('action_damage'))
+
+        if sketches.hit_damage:
+            LOGGER.info('Damage per Hit by Action\n\n%s\n', sketches.quantiles('hit_damage'))
+
+
+def _add(total: Optional[Union[pd.Series, pd.DataFrame]],
+         other: Union[pd.Series, pd.DataFrame]) -> Union[pd.Series, pd.DataFrame]:
+    return other if total is None else total.add(other, fill_value=0)
+
+
+class DamageAggregates:
+    """Compact summary of damage events that reports can be built from.
+
+    The summary grows with the number of iterations, with the length of combat, and with the number
+    of distinct sources, targets and actions, but not with the number of events. It can be updated
+    one chunk of events at a time, e.g., while streaming a
+    :class:`~simfantasy.columnar.ColumnarExport`, and summaries of separate runs can be merged.
+
+    Arguments:
+        combat_length (datetime.timedelta): Length of each simulated encounter.
+        bin_width (Optional[datetime.timedelta]): Width of the time bins of
+            :meth:`dps_over_time`. Default: 5 seconds.
+
+    Attributes:
+        bin_width (datetime.timedelta): Width of the time bins of :meth:`dps_over_time`.
+        combat_length (datetime.timedelta): Length of each simulated encounter.
+        durations (Optional[pandas.Series]): Seconds each iteration lasted, for iterations that
+            didn't last ``combat_length``.
+        iteration_damage (Optional[pandas.Series]): Damage dealt in each iteration.
+        timeline (Optional[pandas.Series]): Damage dealt by each source in each time bin, summed
+            over all iterations. Only collected from events with an ``elapsed`` column.
+        totals (Optional[pandas.DataFrame]): Totals from :func:`aggregate_damage`.
+
+    Examples:
+        >>> damage = pd.DataFrame({
+        ...     'iteration': [0, 0, 1], 'elapsed': [1.0, 7.5, 2.0], 'source': ['Bard'] * 3,
+        ...     'target': ['Dummy'] * 3, 'action': ['Shot', 'Windbite', 'Shot'],
+        ...     'dot': [False, True, False], 'damage': [100, 50, 150],
+        ...     'critical': [False, False, True], 'direct': [False, False, False],
+        ... }).set_index('iteration')
+        >>> aggregates = DamageAggregates(timedelta(seconds=10))
+        >>> aggregates.update(damage[damage.index == 0])
+        >>> aggregates.update(damage[damage.index == 1])
+        >>> aggregates.dps.tolist()
+        [15.0, 15.0]
+        >>> aggregates.dps_over_time()['Bard'].tolist()
+        [25.0, 5.0]
+
+        Iterations that ended early, e.g., with a kill, only count the time they lasted:
+
+        >>> aggregates = DamageAggregates(timedelta(seconds=10))
+        >>> aggregates.update(damage[damage.index == 0])
+        >>> aggregates.update(damage[damage.index == 1], pd.Series([3.0], index=[1]))
+        >>> aggregates.dps.tolist()
+        [15.0, 50.0]
+        >>> aggregates.dps_over_time()['Bard'].tolist()
+        [31.25, 10.0]
+
+        Separate runs both number their iterations from 0, and are kept apart when merged:
+
+        >>> first, second = DamageAggregates(timedelta(seconds=10)), DamageAggregates(
+        ...     timedelta(seconds=10))
+        >>> first.update(damage[damage['action'] == 'Shot'].iloc[:1])
+        >>> second.update(damage[damage['action'] == 'Shot'].iloc[:1])
+        >>> merged = first.merge(second)
+        >>> merged.dps.tolist(), merged.dps.index.tolist()
+        ([10.0, 10.0], [0, 1])
+        >>> merged.dps_over_time()['Bard'].tolist()
+        [20.0]
+    """
+
+    def __init__(self, combat_length: timedelta, bin_width: timedelta = None) -> None:
+        if bin_width is None:
+            bin_width = timedelta(seconds=5)
 
-        def create_pct_total(original):
-            def pct_total(x):
-                return np.sum(x) / original.groupby('source')['damage'].sum() * 100
+        self.combat_length: timedelta = combat_length
+        self.bin_width: timedelta = bin_width
+        self.durations: Optional[pd.Series] = None
+        self.iteration_damage: Optional[pd.Series] = None
+        self.timeline: Optional[pd.Series] = None
+        self.totals: Optional[pd.DataFrame] = None
 
-            return pct_total
+    @classmethod
+    def from_export(cls, export: 'ColumnarExport', bin_width: timedelta = None
+                    ) -> 'DamageAggregates':
+        """Summarize an export one partition at a time.
 
-        def get_damage_grouping(df: pd.DataFrame, groupby):
-            group = df.groupby(groupby)
+        Arguments:
+            export (simfantasy.columnar.ColumnarExport): The export.
+            bin_width (Optional[datetime.timedelta]): See :class:`DamageAggregates`.
 
-            return group['damage'] \
-                .agg([np.size, np.sum, create_pct_total(df), np.mean]) \
-                .rename(columns={'size': '#'}) \
-                .join(group['critical', 'direct'].mean() * 100) \
-                .sort_values(by='sum', ascending=False)
+        Returns:
+            simfantasy.reporting.DamageAggregates: The summary.
+        """
+        aggregates = cls(export.combat_length, bin_width)
 
-        mean_dmg_per_action_df = get_damage_grouping(self.damage, ['source', 'action'])
-        LOGGER.info('Damage Dealt by Action\n\n%s\n', mean_dmg_per_action_df)
+        for frame in export.tables['damage'].frames():
+            durations = None
 
-        mean_tick_dmg_per_action_df = get_damage_grouping(self.damage.loc[self.damage['dot'] == True],
-                                                          ['source', 'action'])
-        LOGGER.info('Tick Damage Dealt by Action\n\n%s\n', mean_tick_dmg_per_action_df)
+            if export.durations is not None:
+                durations = export.durations.reindex(frame.index.unique()).dropna()
 
-        mean_dmg_per_target_df = get_damage_grouping(self.damage, ['source', 'target'])
-        LOGGER.info('Damage Dealt by Target\n\n%s\n', mean_dmg_per_target_df)
-        # @formatter:on
+            aggregates.update(frame, durations)
+
+        return aggregates
+
+    def update(self, damage: pd.DataFrame, durations: pd.Series = None) -> None:
+        """Add a chunk of damage events or totals, indexed by iteration.
+
+        Arguments:
+            damage (pandas.DataFrame): The chunk.
+            durations (Optional[pandas.Series]): Seconds each iteration of the chunk lasted,
+                indexed by iteration, e.g., when an enemy died early. Default: ``combat_length``.
+        """
+        if damage.empty:
+            return
+
+        if durations is not None:
+            self.durations = _add(self.durations, durations)
+
+        self.totals = _add(self.totals, aggregate_damage(damage))
+        self.iteration_damage = _add(self.iteration_damage,
+                                     damage.groupby(level='iteration')['damage'].sum())
+
+        if 'elapsed' in damage:
+            bins = (damage['elapsed'] // self.bin_width.total_seconds()).astype(int).rename('bin')
+            self.timeline = _add(self.timeline, damage['damage'].groupby(
+                [damage['source'].astype(str), bins]).sum())
+
+    def merge(self, other: 'DamageAggregates') -> 'DamageAggregates':
+        """Combine with the summary of other iterations of the same encounter.
+
+        Arguments:
+            other (simfantasy.reporting.DamageAggregates): The other summary. Its iterations are
+                numbered after this one's.
+
+        Returns:
+            simfantasy.reporting.DamageAggregates: A new summary of both.
+        """
+        merged = DamageAggregates(self.combat_length, self.bin_width)
+
+        # Every run numbers its iterations from 0, so the other run's come after these.
+        offset = 0 if self.iteration_damage is None else int(self.iteration_damage.index.max()) + 1
+        renumbered = {
+            name: None if getattr(other, name) is None else
+            getattr(other, name).rename(lambda iteration: iteration + offset)
+            for name in ('durations', 'iteration_damage')
+        }
+
+        for name in ('durations', 'iteration_damage', 'timeline', 'totals'):
+            mine, theirs = getattr(self, name), renumbered.get(name, getattr(other, name))
+            setattr(merged, name, theirs if mine is None else _add(mine, theirs)
+                    if theirs is not None else mine)
+
+        return merged
+
+    @property
+    def dps(self) -> pd.Series:
+        """Damage per second dealt in each iteration, by every source together."""
+        if self.iteration_damage is None:
+            return pd.Series(dtype=float)
+
+        return self.iteration_damage.sort_index() / self._lengths()
+
+    def _lengths(self) -> pd.Series:
+        """Seconds each iteration lasted."""
+        seconds = self.combat_length.total_seconds()
+
+        if self.durations is None:
+            return pd.Series(seconds, index=self.iteration_damage.index.sort_values())
+
+        return self.durations.reindex(self.iteration_damage.index.sort_values()).fillna(seconds)
+
+    def dps_histogram(self, bins: int = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Count iterations by DPS.
+
+        Arguments:
+            bins (Optional[int]): Number of bins. Default: 40.
+
+        Returns:
+            Tuple[numpy.ndarray, numpy.ndarray]: Iteration count of each bin, and bin edges.
+        """
+        if bins is None:
+            bins = 40
+
+        return np.histogram(self.dps, bins=bins)
+
+    def dps_over_time(self) -> pd.DataFrame:
+        """Average DPS of each source within each time bin.
+
+        Returns:
+            pandas.DataFrame: DPS, indexed by the start of each bin in seconds, with one column per
+            source.
+        """
+        if self.timeline is None:
+            return pd.DataFrame()
+
+        width = self.bin_width.total_seconds()
+        timeline = self.timeline.unstack('source', fill_value=0).sort_index()
+
+        starts = timeline.index.to_numpy() * width
+
+        # Seconds of each bin that iterations spent in combat, since some end early.
+        lengths = self._lengths().to_numpy()
+        exposure = np.clip(lengths[np.newaxis, :] - starts[:, np.newaxis], 0, width).sum(axis=1)
+
+        timeline = timeline.div(exposure, axis=0)
+        timeline.index = pd.Index(starts, name='elapsed')
+
+        return timeline
 
 
 class HTMLReporter(Reporter):
+    """Interactive report, built only from :class:`DamageAggregates`.
+
+    The report holds a DPS histogram, binned DPS over time, a damage table and a damage
+    distribution by action, so its size and render time stay the same however many iterations
+    were run.
+
+    Arguments:
+        sim (Optional[simfantasy.simulator.Simulation]): The simulation. Only needed when the
+            report is built from damage events.
+        auras (Optional[pandas.DataFrame]): Unused.
+        damage (Optional[pandas.DataFrame]): Damage events or totals, indexed by iteration.
+        resources (Optional[pandas.DataFrame]): Unused.
+        filename (Optional[str]): Where to save the report. Default: ``report.html``.
+        aggregates (Optional[simfantasy.reporting.DamageAggregates]): Summary to build the report
+            from, e.g., :meth:`DamageAggregates.from_export`, instead of damage events.
+    """
+
+    def __init__(self, sim=None, auras: pd.DataFrame = None, damage: pd.DataFrame = None,
+                 resources: pd.DataFrame = None, filename: str = None,
+                 aggregates: DamageAggregates = None) -> None:
+        super().__init__(sim, auras, damage, resources)
+
+        if filename is None:
+            filename = 'report.html'
+
+        self.filename: str = filename
+        self.aggregates: Optional[DamageAggregates] = aggregates
+
     def report(self):
-        bokeh.io.output_file('report.html')
-
-        mean_dmg_per_action_df = self.damage.groupby('action')[
-            'damage'].mean().sort_values().to_frame()
-        mean_dmg_per_action = bokeh.plotting.figure(y_range=list(mean_dmg_per_action_df.index),
-                                                    title='Mean Damage per Action')
-        mean_dmg_per_action.hbar(y='action', right='damage', height=0.5,
-                                 source=bokeh.models.ColumnDataSource(mean_dmg_per_action_df),
-                                 fill_color=bokeh.transform.factor_cmap('action',
-                                                                        palette=bokeh.palettes.inferno(
-                                                                            len(
-                                                                                mean_dmg_per_action_df.index)),
-                                                                        factors=sorted(
-                                                                            mean_dmg_per_action_df.index)))
-        dps_per_iteration_df = (
-                self.damage.groupby(self.damage.index)[
-                    'damage'].sum() / self.sim.combat_length.total_seconds()).to_frame()
-        dps_per_iteration = bokeh.plotting.figure(title='DPS per Iteration')
-        dps_per_iteration.circle(x='iteration', y='damage',
-                                 source=bokeh.models.ColumnDataSource(dps_per_iteration_df),
-                                 size=10, alpha=0.5)
-
-        total_dmg = self.damage['damage'].sum()
-        action_damage_df = (self.damage.groupby('action')['damage'].sum() / total_dmg).to_frame()
-        action_damage_pie = bokeh.plotting.figure(title='Damage Distribution',
-                                                  tools=[pie_hovertool])
+        aggregates = self.aggregates
+
+        if aggregates is None:
+            aggregates = DamageAggregates(self.sim.combat_length)
+            aggregates.update(self.damage, combat_lengths(self.sim, self.damage))
+
+        bokeh.io.output_file(self.filename)
+
+        counts, edges = aggregates.dps_histogram()
+        dps_histogram = bokeh.plotting.figure(title='DPS per Iteration', x_axis_label='DPS',
+                                              y_axis_label='Iterations')
+        dps_histogram.quad(top=counts, bottom=0, left=edges[:-1], right=edges[1:], alpha=0.5)
 
-        pie_slices = [p * 2 * pi for p in action_damage_df['damage'].sort_values().cumsum()]
+        dps_over_time = bokeh.plotting.figure(title='DPS over Time', x_axis_label='Seconds',
+                                              y_axis_label='DPS')
+        timeline = aggregates.dps_over_time()
 
-        action_damage_pie.wedge(x=0, y=0, radius=1,
-                                start_angle=pie_slices[:-1],
-                                end_angle=pie_slices[1:],
-                                fill_color=bokeh.palettes.inferno(len(action_damage_df) - 1))
+        for source, color in zip(timeline.columns, bokeh.palettes.Category10[10]):
+            dps_over_time.step(x=timeline.index, y=timeline[source], mode='after',
+                               legend_label=str(source), color=color)
+
+        actions = damage_table(aggregates.totals, 'action').reset_index()
+        actions['source'] = actions['source'].astype(str)
+        actions['action'] = actions['action'].astype(str)
+
+        action_table = bokeh.models.DataTable(
+            source=bokeh.models.ColumnDataSource(actions),
+            columns=[bokeh.models.TableColumn(field=column, title=column)
+                     for column in actions.columns],
+            width=800,
+        )
+
+        action_damage = actions.groupby('action')['sum'].sum().sort_values()
+        action_damage_df = pd.DataFrame({
+            'action': action_damage.index,
+            'share': action_damage.values / action_damage.sum() * 100,
+            'end_angle': action_damage.cumsum().values / action_damage.sum() * 2 * pi,
+        })
+        action_damage_df['start_angle'] = action_damage_df['end_angle'].shift(fill_value=0)
+        action_damage_df['color'] = bokeh.palettes.inferno(max(len(action_damage_df), 3))[
+            :len(action_damage_df)]
+
+        pie_hovertool = bokeh.models.HoverTool(tooltips=[('Action', '@action'),
+                                                         ('Share', '@share{0.0}%')])
+        action_damage_pie = bokeh.plotting.figure(title='Damage Distribution',
+                                                  tools=[pie_hovertool], match_aspect=True)
+        action_damage_pie.wedge(x=0, y=0, radius=1, start_angle='start_angle',
+                                end_angle='end_angle', fill_color='color',
+                                source=bokeh.models.ColumnDataSource(action_damage_df))
 
-        layout = bokeh.layouts.layout([mean_dmg_per_action, dps_per_iteration], action_damage_pie)
+        layout = bokeh.layouts.layout([[dps_histogram, dps_over_time],
+                                       [action_damage_pie], [action_table]])
 
         bokeh.io.save(layout)
@@ -0,0 +1,396 @@
+# -*- coding: utf-8 -*-
+"""Sources of random numbers for simulations.
+
+Every random outcome in a simulation, e.g., a critical hit roll or a proc, is drawn through
+:attr:`Simulation.random <simfantasy.simulator.Simulation.random>` and named by its draw site. By
+default, every site shares :mod:`numpy.random`. :class:`RandomStreams` instead gives every site
+its own stream, reseeded at the start of each iteration, so that two runs with different gear see
+the same outcomes at the same sites for as long as their rotations line up.
+
+:class:`AntitheticStreams` and :class:`QuasiRandomStreams` build on those streams to reduce the
+variance of estimates such as mean DPS, so fewer iterations reach the same precision. Select one
+with :attr:`Simulation.sampler <simfantasy.simulator.Simulation.sampler>`.
+"""
+
+import zlib
+from collections import defaultdict
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Type
+
+import numpy
+
+
+class GlobalRandom:
+    """Draw every random number from :mod:`numpy.random`, regardless of site.
+
+    Examples:
+        >>> numpy.random.seed(1)
+        >>> first = GlobalRandom().uniform('critical_hit')
+        >>> numpy.random.seed(1)
+        >>> first == numpy.random.uniform()
+        True
+    """
+
+    def reset(self, iteration: int) -> None:
+        """Prepare for a new iteration. :mod:`numpy.random` just carries on."""
+
+    def get_state(self) -> Any:
+        """Capture the state of every stream, e.g., to draw the same numbers again.
+
+        Returns:
+            Any: The state, for :meth:`set_state`.
+        """
+        return numpy.random.get_state()
+
+    def set_state(self, state: Any) -> None:
+        """Return every stream to a captured state.
+
+        Arguments:
+            state (Any): The state, from :meth:`get_state`.
+        """
+        numpy.random.set_state(state)
+
+    def uniform(self, site: str, low: float = None, high: float = None) -> float:
+        """Draw a number uniformly from ``[low, high)``.
+
+        Arguments:
+            site (str): Name of the draw site. Unused.
+            low (Optional[float]): Lower bound. Default: 0.
+            high (Optional[float]): Upper bound. Default: 1.
+
+        Returns:
+            float: The number.
+        """
+        if low is None:
+            low = 0.0
+
+        if high is None:
+            high = 1.0
+
+        return numpy.random.uniform(low, high)
+
+
+class RandomStreams(GlobalRandom):
+    """Draw the random numbers of each site from its own stream, reseeded for each iteration.
+
+    The stream of a site in an iteration only depends on the seed, the iteration and the site's
+    name, so runs that share a seed share their random numbers, i.e., they use common random
+    numbers.
+
+    Arguments:
+        seed (Optional[int]): Seed of every stream. Default: fresh entropy from the operating
+            system.
+
+    Attributes:
+        iteration (int): Current iteration.
+        seed (int): Seed of every stream.
+
+    Examples:
+        >>> first, second = RandomStreams(7), RandomStreams(7)
+        >>> first.reset(3)
+        >>> second.reset(3)
+
+        Draws at one site don't shift the draws at any other:
+
+        >>> _ = first.uniform('DamageEvent/Heavy Shot/critical_hit')
+        >>> first.uniform('HeavyShotAction/proc') == second.uniform('HeavyShotAction/proc')
+        True
+    """
+
+    def __init__(self, seed: int = None) -> None:
+        if seed is None:
+            seed = numpy.random.SeedSequence().entropy
+
+        self.seed: int = seed
+        self.iteration: int = 0
+
+        self._streams: Dict[str, numpy.random.Generator] = {}
+        self._draws: Dict[str, int] = defaultdict(int)
+
+    def reset(self, iteration: int) -> None:
+        """Restart every stream for a new iteration.
+
+        Arguments:
+            iteration (int): The iteration.
+        """
+        self.iteration = iteration
+        self._streams.clear()
+        self._draws.clear()
+
+    def stream(self, site: str) -> numpy.random.Generator:
+        """Return the stream of a draw site in the current iteration.
+
+        Arguments:
+            site (str): Name of the draw site.
+
+        Returns:
+            numpy.random.Generator: The stream.
+        """
+        stream: Optional[numpy.random.Generator] = self._streams.get(site)
+
+        if stream is None:
+            stream = self._streams[site] = numpy.random.default_rng(self._entropy(site))
+
+        return stream
+
+    def get_state(self) -> Any:
+        """Capture the state of every stream, as the number of numbers drawn from each.
+
+        Returns:
+            Any: The state, for :meth:`set_state`.
+
+        Examples:
+            >>> streams = RandomStreams(7)
+            >>> streams.reset(0)
+            >>> _ = streams.uniform('critical_hit')
+            >>> state = streams.get_state()
+            >>> first = streams.uniform('critical_hit'), streams.uniform('direct_hit')
+            >>> streams.set_state(state)
+            >>> first == (streams.uniform('critical_hit'), streams.uniform('direct_hit'))
+            True
+        """
+        return self.iteration, dict(self._draws)
+
+    def set_state(self, state: Any) -> None:
+        iteration, draws = state
+
+        if iteration != self.iteration:
+            self.reset(iteration)
+
+        # Only streams drawn from since are rewound, by restarting them and skipping ahead, as
+        # every number takes exactly one step of the generator.
+        for site in {*self._draws, *draws}:
+            count = draws.get(site, 0)
+
+            if self._draws.get(site, 0) == count:
+                continue
+
+            if count == 0:
+                self._streams.pop(site, None)
+            else:
+                stream = self._streams[site] = numpy.random.default_rng(self._entropy(site))
+                stream.bit_generator.advance(count)
+
+        self._draws.clear()
+        self._draws.update(draws)
+
+    def _entropy(self, site: str) -> List[int]:
+        return [self.seed, self.iteration, zlib.crc32(site.encode())]
+
+    def uniform(self, site: str, low: float = None, high: float = None) -> float:
+        if low is None:
+            low = 0.0
+
+        if high is None:
+            high = 1.0
+
+        self._draws[site] += 1
+
+        return self.stream(site).uniform(low, high)
+
+
+class AntitheticStreams(RandomStreams):
+    """Draw antithetic pairs of iterations.
+
+    Iterations ``2j`` and ``2j + 1`` share their streams, but every number ``u`` drawn in the odd
+    iteration is reflected to ``1 - u``. A lucky damage roll or critical hit in one iteration of
+    the pair is then an unlucky one in the other, and their noise partly cancels out of the mean.
+
+    Arguments:
+        seed (Optional[int]): See :class:`RandomStreams`.
+
+    Examples:
+        .. testsetup::
+            >>> def mean_dps(sampler, seed, iterations=32):
+            ...     streams, dps = sampler(seed), []
+            ...     for iteration in range(iterations):
+            ...         streams.reset(iteration)
+            ...         dps.append(sum(
+            ...             100 * streams.uniform('damage', 0.95, 1.05) *
+            ...             (1.5 if streams.uniform('critical_hit') < 0.2 else 1)
+            ...             for _ in range(20)))
+            ...     return numpy.mean(dps)
+            >>> def variance(sampler):
+            ...     return numpy.var([mean_dps(sampler, seed) for seed in range(50)])
+
+        >>> streams = AntitheticStreams(7)
+        >>> streams.reset(0)
+        >>> first = streams.uniform('critical_hit')
+        >>> streams.reset(1)
+        >>> first + streams.uniform('critical_hit')
+        1.0
+
+        The mean over the same number of iterations varies less than with plain streams:
+
+        >>> variance(AntitheticStreams) < variance(RandomStreams)
+        True
+    """
+
+    def _entropy(self, site: str) -> List[int]:
+        return [self.seed, self.iteration // 2, zlib.crc32(site.encode())]
+
+    def uniform(self, site: str, low: float = None, high: float = None) -> float:
+        if low is None:
+            low = 0.0
+
+        if high is None:
+            high = 1.0
+
+        self._draws[site] += 1
+
+        u = self.stream(site).random()
+
+        if self.iteration % 2:
+            u = 1 - u
+
+        return low + (high - low) * u
+
+
+@lru_cache(maxsize=None)
+def _steps(limit: int = 4000000, terms: int = 10, largest: int = 10) -> numpy.ndarray:
+    """Fractional parts of the square roots of primes, kept if they make even lattices.
+
+    The square roots of distinct primes are linearly independent over the rationals, so lattices
+    with different steps never line up. A step spreads the first ``n`` points of its lattice
+    evenly if the partial quotients of its continued fraction are small, so only steps with no
+    partial quotient above ``largest`` among the first ``terms`` are kept.
+    """
+    sieve = numpy.ones(limit // 2, dtype=bool)
+    sieve[0] = False
+
+    for odd in range(3, int(limit ** 0.5) + 1, 2):
+        if sieve[odd // 2]:
+            sieve[odd * odd // 2::odd] = False
+
+    primes = 2 * numpy.flatnonzero(sieve) + 1
+    root = numpy.floor(numpy.sqrt(primes)).astype(numpy.int64)
+
+    # Continued fractions of square roots, in exact integer arithmetic.
+    numerator = numpy.zeros_like(primes)
+    denominator = numpy.ones_like(primes)
+    quotient = root.copy()
+    worst = numpy.zeros_like(primes)
+
+    for _ in range(terms):
+        numerator = denominator * quotient - numerator
+        denominator = (primes - numerator ** 2) // denominator
+        quotient = (root + numerator) // denominator
+        worst = numpy.maximum(worst, quotient)
+
+    return numpy.sqrt(primes[worst <= largest]) % 1
+
+
+class QuasiRandomStreams(RandomStreams):
+    """Spread the numbers of each draw across iterations with a randomly shifted lattice.
+
+    The ``k``-th number drawn at a site in iteration ``i`` is ``(shift + i * step) mod 1``. The
+    shift is drawn once per site and ``k`` from the seed. The step is the fractional part of the
+    square root of a prime, picked by a hash of the site and ``k`` among tens of thousands that
+    spread their points evenly. Each draw then covers ``[0, 1)`` far more evenly over the
+    iterations than independent numbers do, while the random shift keeps every single number
+    uniformly distributed, so estimates stay unbiased.
+
+    Every draw needs a step of its own: two draws with the same step move in lockstep over the
+    iterations, one always a fixed distance ahead of the other, and outcomes that depend on both,
+    e.g., a hit that is both critical and direct, converge to the wrong frequency. Only draws
+    whose hashes pick the same step, about one pair in 70,000, are tied together that way.
+
+    This is a Kronecker sequence with a Cranley-Patterson rotation, standing in for a scrambled
+    Sobol sequence, which would need direction numbers from SciPy.
+
+    Arguments:
+        seed (Optional[int]): See :class:`RandomStreams`.
+
+    Examples:
+        .. testsetup::
+            >>> def mean_dps(sampler, seed, iterations=32):
+            ...     streams, dps = sampler(seed), []
+            ...     for iteration in range(iterations):
+            ...         streams.reset(iteration)
+            ...         dps.append(sum(
+            ...             100 * streams.uniform('damage', 0.95, 1.05) *
+            ...             (1.5 if streams.uniform('critical_hit') < 0.2 else 1)
+            ...             for _ in range(20)))
+            ...     return numpy.mean(dps)
+            >>> def variance(sampler):
+            ...     return numpy.var([mean_dps(sampler, seed) for seed in range(50)])
+
+        The first draw of a site is evenly spread over the iterations:
+
+        >>> streams = QuasiRandomStreams(7)
+        >>> draws = []
+        >>> for iteration in range(100):
+        ...     streams.reset(iteration)
+        ...     draws.append(streams.uniform('critical_hit'))
+        >>> numpy.histogram(draws, bins=4, range=(0, 1))[0].tolist()
+        [25, 25, 25, 25]
+
+        Draws at different sites are independent, so a hit is both critical and direct as often
+        as it should be, 6% of the time here, for any one seed:
+
+        >>> streams, both = QuasiRandomStreams(0), 0
+        >>> for iteration in range(5000):
+        ...     streams.reset(iteration)
+        ...     for _ in range(10):
+        ...         critical = streams.uniform('Heavy Shot/critical_hit') < 0.2
+        ...         both += critical and streams.uniform('Heavy Shot/direct_hit') < 0.3
+        >>> abs(both / 50000 - 0.06) < 0.005
+        True
+
+        The mean over the same number of iterations varies much less than with plain streams:
+
+        >>> variance(QuasiRandomStreams) * 4 < variance(RandomStreams)
+        True
+    """
+
+    def __init__(self, seed: int = None) -> None:
+        super().__init__(seed)
+
+        self._lattices: Dict[str, numpy.ndarray] = {}
+
+    def set_state(self, state: Any) -> None:
+        # Lattice points only depend on the number of draws, so there are no streams to rewind.
+        self.iteration, draws = state
+
+        self._draws.clear()
+        self._draws.update(draws)
+
+    def _lattice(self, site: str, draw: int) -> float:
+        lattice = self._lattices.get(site)
+
+        if lattice is None or draw >= len(lattice):
+            # Shifts don't depend on the iteration, and are extended from the same stream, so the
+            # k-th shift of a site is the same however far it was extended before.
+            generator = numpy.random.default_rng([self.seed, zlib.crc32(site.encode())])
+            steps = _steps()
+            count = 2 * draw + 16
+
+            lattice = self._lattices[site] = numpy.column_stack([
+                generator.random(count),
+                steps[[zlib.crc32('{0}/{1}'.format(site, k).encode()) % len(steps)
+                       for k in range(count)]],
+            ])
+
+        shift, step = lattice[draw]
+
+        return (shift + self.iteration * step) % 1
+
+    def uniform(self, site: str, low: float = None, high: float = None) -> float:
+        if low is None:
+            low = 0.0
+
+        if high is None:
+            high = 1.0
+
+        draw = self._draws[site]
+        self._draws[site] = draw + 1
+
+        return low + (high - low) * self._lattice(site, draw)
+
+
+SAMPLERS: Dict[str, Type[RandomStreams]] = {
+    'streams': RandomStreams,
+    'antithetic': AntitheticStreams,
+    'quasi': QuasiRandomStreams,
+}
+"""Samplers that :attr:`Simulation.sampler <simfantasy.simulator.Simulation.sampler>` can name."""
@@ -0,0 +1,420 @@
+# -*- coding: utf-8 -*-
+"""Search for rotations that beat an actor's priority list.
+
+Priority lists, e.g., :meth:`Bard.decide <simfantasy.jobs.bard.Bard.decide>`, are tuned by hand.
+:class:`RotationSearch` runs a beam search over what an actor does at each of its decision
+points instead, i.e., each time it is ready and some action can be performed, with the simulator
+itself as the transition model. A sequence of choices is scored by the DPS it leads to over a
+window of the encounter, e.g., the opener or a burst window, with the priority list taking over
+once the sequence runs out.
+
+Every sequence is played out in a batch of iterations with common random numbers, so sequences
+are compared on the same critical hits and procs. Sequences that share a prefix share its
+simulation too: the encounter is snapshotted at every decision point of the beam, see
+:mod:`simfantasy.snapshot`, and each choice is tried from there.
+
+The best sequence won on the very iterations it was picked on, so its gain there is biased
+upwards. It is measured against the priority list again, on fresh iterations, before it is
+reported.
+"""
+
+import logging
+import queue
+from datetime import timedelta
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy
+import pandas as pd
+
+from simfantasy.action import Action
+from simfantasy.compare import PairedComparison, common_random_numbers
+from simfantasy.event import ActorReadyEvent, Event
+from simfantasy.simulator import Simulation
+from simfantasy.snapshot import Snapshot
+
+LOGGER = logging.getLogger(__name__)
+
+Choices = Tuple[Optional[str], ...]
+"""Names of the actions to perform at successive decision points, None to follow the priority
+list."""
+
+
+class _Node(NamedTuple):
+    choices: Choices
+    snapshots: List[Optional[Snapshot]]
+    candidates: List[Optional[str]]
+    dps: numpy.ndarray
+
+
+class RotationSearchResult:
+    """The best sequence of choices a search found, against the priority list.
+
+    Arguments:
+        choices (Tuple[Optional[str], ...]): The best sequence of choices.
+        performed (List[Optional[str]]): Actions performed following the best choices, in the
+            first iteration, None where the actor waited.
+        priority (List[Optional[str]]): Actions performed following the priority list, in the
+            first iteration.
+        comparison (simfantasy.compare.PairedComparison): DPS over the window following the
+            priority list against following the best choices, in fresh iterations.
+        evaluated (int): Number of sequences played out.
+
+    Attributes:
+        choices (Tuple[Optional[str], ...]): The best sequence of choices.
+        comparison (simfantasy.compare.PairedComparison): DPS over the window following the
+            priority list against following the best choices, in fresh iterations that played
+            no part in the search.
+        evaluated (int): Number of sequences played out.
+        performed (List[Optional[str]]): Actions performed following the best choices.
+        priority (List[Optional[str]]): Actions performed following the priority list.
+    """
+
+    def __init__(self, choices: Choices, performed: List[Optional[str]],
+                 priority: List[Optional[str]], comparison: PairedComparison,
+                 evaluated: int) -> None:
+        self.choices: Choices = choices
+        self.performed: List[Optional[str]] = performed
+        self.priority: List[Optional[str]] = priority
+        self.comparison: PairedComparison = comparison
+        self.evaluated: int = evaluated
+
+    def table(self) -> pd.DataFrame:
+        """Tabulate the best actions against the priority list's.
+
+        Returns:
+            pandas.DataFrame: Action performed at each decision point following the best choices,
+            ``search``, and following the priority list, ``priority``, and whether they differ,
+            ``differs``.
+        """
+        steps = max(len(self.performed), len(self.priority))
+        search = [*self.performed, *[None] * (steps - len(self.performed))]
+        priority = [*self.priority, *[None] * (steps - len(self.priority))]
+
+        return pd.DataFrame({
+            'search': search,
+            'priority': priority,
+            'differs': [first != second for first, second in zip(search, priority)],
+        }, index=pd.RangeIndex(1, steps + 1, name='step'))
+
+    def report(self) -> None:
+        """Log the best actions and the DPS they gain."""
+        LOGGER.info('Best of %s sequences, against the priority list:\n\n%s\n',
+                    self.evaluated, self.table())
+        self.comparison.report()
+
+
+class RotationSearch:
+    """Beam search for the actions an actor performs at its decision points.
+
+    Arguments:
+        sim (simfantasy.simulator.Simulation): The simulation.
+        actor (simfantasy.actor.Actor): The actor whose actions are searched.
+        start (Optional[datetime.timedelta]): Start of the window, e.g., a burst window. The
+            priority list plays the encounter until then. Default: the start of combat, for the
+            opener.
+        length (Optional[datetime.timedelta]): Length of the window that sequences are scored
+            over, up to the end of combat. Default: 30 seconds.
+        width (Optional[int]): Number of sequences kept at each decision point. Default: 4.
+        depth (Optional[int]): Number of decision points to search. Default: 8.
+        rollouts (Optional[int]): Number of iterations each sequence is played out in.
+            Default: 4.
+        validation (Optional[int]): Number of fresh iterations the best sequence is compared
+            to the priority list in. Default: 16.
+        seed (Optional[int]): Seed of the common random numbers. Default: the simulation's seed.
+
+    Attributes:
+        actor (simfantasy.actor.Actor): The actor whose actions are searched.
+        depth (int): Number of decision points to search.
+        end (datetime.timedelta): End of the window.
+        rollouts (int): Number of iterations each sequence is played out in.
+        seed (Optional[int]): Seed of the common random numbers.
+        sim (simfantasy.simulator.Simulation): The simulation.
+        start (datetime.timedelta): Start of the window.
+        validation (int): Number of fresh iterations the best sequence is compared in.
+        width (int): Number of sequences kept at each decision point.
+
+    Examples:
+        .. testsetup::
+            >>> from simfantasy.actor import Actor
+            >>> from simfantasy.enum import Attribute, Race, Slot
+            >>> from simfantasy.equipment import Weapon
+            >>> from simfantasy.jobs.bard import Bard
+            >>> sim = Simulation(combat_length=timedelta(seconds=30))
+            >>> enemy = Actor(sim, Race.ENEMY)
+            >>> bard = Bard(sim, Race.HIGHLANDER, target=enemy, gear={
+            ...     Slot.WEAPON: Weapon(370, 70, 104, 3.04, 105.38, {Attribute.DEXTERITY: 347})})
+
+        >>> search = RotationSearch(sim, bard, length=timedelta(seconds=15), width=2, depth=3,
+        ...                         rollouts=2, validation=8, seed=1)
+        >>> result = search.search(report=False)
+        >>> result.choices, result.table()['differs'].tolist()
+        (('Raging Strikes', 'Barrage'), [True, True, True])
+
+        The best sequence is compared on iterations the search never saw, where it isn't sure to
+        win, but opening on the buffs still does:
+
+        >>> result.comparison.difference.index.tolist()
+        [2, 3, 4, 5, 6, 7, 8, 9]
+        >>> bool(result.comparison.mean - result.comparison.margin > 0)
+        True
+    """
+
+    def __init__(self, sim: Simulation, actor, start: timedelta = None, length: timedelta = None,
+                 width: int = None, depth: int = None, rollouts: int = None,
+                 validation: int = None, seed: int = None) -> None:
+        if start is None:
+            start = timedelta()
+
+        if length is None:
+            length = timedelta(seconds=30)
+
+        if width is None:
+            width = 4
+
+        if depth is None:
+            depth = 8
+
+        if rollouts is None:
+            rollouts = 4
+
+        if validation is None:
+            validation = 16
+
+        self.sim: Simulation = sim
+        self.actor = actor
+        self.start: timedelta = start
+        self.end: timedelta = min(start + length, sim.combat_length)
+        self.width: int = width
+        self.depth: int = depth
+        self.rollouts: int = rollouts
+        self.validation: int = validation
+        self.seed: Optional[int] = seed
+
+    def _actions(self) -> Dict[str, Action]:
+        """The actor's actions, by name, which it creates anew every iteration."""
+        return {action.name: action for action in vars(self.actor.actions).values()
+                if isinstance(action, Action)}
+
+    def _can_act(self, event: Event) -> bool:
+        if not isinstance(event, ActorReadyEvent) or event.actor is not self.actor:
+            return False
+
+        self.sim.current_time = event.timestamp
+
+        return any(action.ready for action in self._actions().values())
+
+    def _advance(self) -> bool:
+        """Play the encounter on to the actor's next decision point in the window.
+
+        Returns:
+            bool: True if the actor is at a decision point, with its
+            :class:`~simfantasy.event.ActorReadyEvent` next on the queue, False if the window is
+            over.
+        """
+        sim = self.sim
+        end = sim.start_time + self.end
+
+        sim._process_events(until=end, stop=self._can_act)  # pylint: disable=protected-access
+
+        return not sim.events.empty() and sim.events.queue[0][0] < end
+
+    def _step(self, choice: Optional[str]) -> Optional[str]:
+        """Act at a decision point.
+
+        Arguments:
+            choice (Optional[str]): Name of the action to perform. None, or an action that can't
+                be performed, to follow the priority list.
+
+        Returns:
+            Optional[str]: Name of the action performed, None if the actor waited.
+        """
+        _, _, event = self.sim.events.get()
+        action = self._actions().get(choice)
+
+        if action is None or not action.ready:
+            action = event.choose()
+
+        if action is None:
+            event.execute()
+
+            return None
+
+        action.perform()
+
+        return action.name
+
+    def _candidates(self) -> List[Optional[str]]:
+        return [name for name, action in self._actions().items() if action.ready]
+
+    def _dps(self) -> float:
+        """DPS the actor dealt over the window, once the window is over."""
+        start = self.start.total_seconds()
+        damage = sum(record['damage'] for record in self.actor.statistics['damage']
+                     if record['elapsed'] >= start)
+
+        return damage / (self.end - self.start).total_seconds()
+
+    def _expand(self, node: _Node, choice: Optional[str]) -> _Node:
+        """Play out a node's choices followed by one more, in every iteration."""
+        sim = self.sim
+        snapshots: List[Optional[Snapshot]] = []
+        candidates: List[Optional[str]] = [None]
+        dps = numpy.empty(len(node.snapshots))
+
+        for rollout, snapshot in enumerate(node.snapshots):
+            if snapshot is not None:
+                snapshot.restore()
+                self._step(choice)
+
+                if self._advance():
+                    snapshots.append(sim.snapshot())
+                    candidates.extend(name for name in self._candidates()
+                                      if name not in candidates)
+                else:
+                    snapshots.append(None)
+
+                sim._process_events(until=sim.start_time + self.end)  # pylint: disable=W0212
+
+                dps[rollout] = self._dps()
+            else:
+                snapshots.append(None)
+                dps[rollout] = node.dps[rollout]
+
+        if all(snapshot is None for snapshot in snapshots):
+            candidates = []
+
+        return _Node((*node.choices, choice), snapshots, candidates, dps)
+
+    def _play(self, snapshot: Snapshot, choices: Sequence[Optional[str]]) -> List[Optional[str]]:
+        """Replay choices from a decision point, and list the actions performed."""
+        snapshot.restore()
+        performed = []
+
+        for choice in [*choices, *[None] * (self.depth - len(choices))]:
+            performed.append(self._step(choice))
+
+            if not self._advance():
+                break
+
+        return performed
+
+    def _begin(self, iteration: int) -> Optional[Snapshot]:
+        """Start an iteration, and play it to the actor's first decision point in the window.
+
+        Returns:
+            Optional[simfantasy.snapshot.Snapshot]: The decision point, or None if the actor has
+            none in the window, which is then played to its end.
+        """
+        sim = self.sim
+
+        sim.events = queue.PriorityQueue()
+        sim._start_iteration(iteration)  # pylint: disable=protected-access
+        sim._process_events(until=sim.start_time + self.start)  # pylint: disable=W0212
+
+        if self._advance():
+            return sim.snapshot()
+
+        sim._process_events(until=sim.start_time + self.end)  # pylint: disable=W0212
+
+        return None
+
+    def _validate(self, choices: Choices) -> PairedComparison:
+        """Compare a sequence of choices to the priority list in fresh iterations."""
+        sim = self.sim
+        end = sim.start_time + self.end
+        iterations = range(self.rollouts, self.rollouts + self.validation)
+        priority = pd.Series(numpy.nan, index=iterations)
+        chosen = pd.Series(numpy.nan, index=iterations)
+
+        for iteration in iterations:
+            root = self._begin(iteration)
+
+            if root is None:
+                priority[iteration] = chosen[iteration] = self._dps()
+                continue
+
+            sim._process_events(until=end)  # pylint: disable=protected-access
+            priority[iteration] = self._dps()
+
+            self._play(root, choices)
+            sim._process_events(until=end)  # pylint: disable=protected-access
+            chosen[iteration] = self._dps()
+
+        return PairedComparison(priority, chosen, confidence=sim.confidence)
+
+    def search(self, report: bool = None) -> RotationSearchResult:
+        """Search for the sequence of choices with the highest mean DPS over the window.
+
+        Arguments:
+            report (Optional[bool]): True to log the best sequence. Default: True.
+
+        Returns:
+            simfantasy.search.RotationSearchResult: The best sequence.
+        """
+        if report is None:
+            report = True
+
+        sim = self.sim
+
+        with common_random_numbers(sim, self.seed):
+            sim._reset_random()  # pylint: disable=protected-access
+
+            roots: List[Optional[Snapshot]] = []
+            candidates: List[Optional[str]] = [None]
+
+            for rollout in range(self.rollouts):
+                root = self._begin(rollout)
+                roots.append(root)
+
+                if root is not None:
+                    candidates.extend(name for name in self._candidates()
+                                      if name not in candidates)
+
+            baseline = numpy.empty(self.rollouts)
+
+            for rollout, snapshot in enumerate(roots):
+                if snapshot is not None:
+                    snapshot.restore()
+
+                sim._process_events(until=sim.start_time + self.end)  # pylint: disable=W0212
+                baseline[rollout] = self._dps()
+
+            best = root = _Node((), roots, candidates, baseline)
+            beam = [root]
+            evaluated = 0
+
+            for _ in range(self.depth):
+                children: Dict[bytes, _Node] = {}
+
+                for node in beam:
+                    for choice in node.candidates:
+                        child = self._expand(node, choice)
+                        evaluated += 1
+
+                        # Choosing what the priority list would have chosen anyway leads to the
+                        # very same damage, and is kept once, as following the priority list.
+                        children.setdefault(child.dps.tobytes(), child)
+
+                beam = sorted(children.values(), key=lambda child: -child.dps.mean())[:self.width]
+
+                if not beam:
+                    break
+
+                if beam[0].dps.mean() > best.dps.mean():
+                    best = beam[0]
+
+            if roots[0] is None:
+                performed: List[Optional[str]] = []
+                priority: List[Optional[str]] = []
+            else:
+                performed = self._play(roots[0], best.choices)
+                priority = self._play(roots[0], ())
+
+            comparison = self._validate(best.choices)
+
+        result = RotationSearchResult(best.choices, performed, priority, comparison, evaluated)
+
+        if report is True:
+            result.report()
+
+        return result
@@ -4,17 +4,24 @@
 import logging
 import queue
 import re
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from typing import List, Optional, Pattern, TYPE_CHECKING, Tuple
+from os import PathLike
+from typing import Callable, Iterator, List, Optional, Pattern, TYPE_CHECKING, Tuple, Union
 
 import humanfriendly
+import numpy
 import pandas as pd
 
 from simfantasy.reporting import TerminalReporter
+from simfantasy.rng import GlobalRandom, RandomStreams, SAMPLERS
+from simfantasy.sketch import DamageSketches
 
 if TYPE_CHECKING:
     from simfantasy.actor import Actor
+    from simfantasy.encounter import Encounter
     from simfantasy.event import Event
+    from simfantasy.snapshot import Snapshot
 
 
 def configure_logging(log_level: int = None) -> None:
@@ -35,6 +42,59 @@ def configure_logging(log_level: int = None) -> None:
 LOGGER = logging.getLogger(__name__)
 
 
+class SimulationResults:
+    """Statistics collected by :meth:`Simulation.run`.
+
+    Arguments:
+        sim (simfantasy.simulator.Simulation): The simulation that produced the results.
+        auras (pandas.DataFrame): Aura applications, expirations, consumptions and refreshes.
+        damage (pandas.DataFrame): Damage dealt, one row per hit or tick.
+        resources (pandas.DataFrame): Resource changes.
+        sketches (Optional[simfantasy.sketch.DamageSketches]): Quantile sketches of DPS and damage.
+            Default: None.
+        durations (Optional[pandas.Series]): Seconds each iteration lasted, when combat can end
+            early with a kill, see :func:`~simfantasy.health.combat_lengths`. Default: None, for
+            iterations that all lasted ``combat_length``.
+
+    Attributes:
+        auras (pandas.DataFrame): Aura applications, expirations, consumptions and refreshes.
+        combat_length (datetime.timedelta): Length of each simulated encounter.
+        damage (pandas.DataFrame): Damage dealt, one row per hit or tick.
+        durations (Optional[pandas.Series]): Seconds each iteration lasted, if not all of
+            ``combat_length``.
+        resources (pandas.DataFrame): Resource changes.
+        sketches (Optional[simfantasy.sketch.DamageSketches]): Quantile sketches of DPS and damage.
+    """
+
+    def __init__(self, sim: 'Simulation', auras: pd.DataFrame, damage: pd.DataFrame,
+                 resources: pd.DataFrame, sketches: DamageSketches = None,
+                 durations: pd.Series = None) -> None:
+        self.combat_length: timedelta = sim.combat_length
+        self.durations: Optional[pd.Series] = durations
+        self.auras: pd.DataFrame = auras
+        self.damage: pd.DataFrame = damage
+        self.resources: pd.DataFrame = resources
+        self.sketches: Optional[DamageSketches] = sketches
+
+    def dps(self, source: str = None) -> pd.Series:
+        """Calculate the damage per second dealt in each iteration.
+
+        Arguments:
+            source (Optional[str]): Name of the actor to restrict damage to. Default: all actors.
+
+        Returns:
+            pandas.Series: DPS, indexed by iteration.
+        """
+        damage = self.damage if source is None else self.damage[self.damage['source'] == source]
+
+        damage = damage.groupby(level='iteration')['damage'].sum()
+
+        if self.durations is not None:
+            return damage / self.durations.reindex(damage.index)
+
+        return damage / self.combat_length.total_seconds()
+
+
 class Simulation:
     """Business logic for managing the simulated combat encounter and subsequent reporting.
 
@@ -51,14 +111,43 @@ class Simulation:
         iterations (Optional[int]): Number of encounters to simulate. Default: 100.
         log_action_attempts (Optional[bool]): True to log actions attempted by
             :class:`~simfantasy.actor.Actor` decision engines.
+        seed (Optional[int]): Seed for the random number generator, making runs reproducible.
+            Default: None.
+        target_error (Optional[float]): Stop once the mean DPS of every actor is known within
+            this error, relative to the mean, e.g., 0.001 for ±0.1%. ``iterations`` is then the
+            most iterations to run. Default: None, to always run ``iterations``.
+        confidence (Optional[float]): Confidence level of ``target_error``, and of the intervals
+            shown in reports. Default: 0.95.
+        min_iterations (Optional[int]): Fewest iterations to run before checking
+            ``target_error``. Default: 10.
+        common_random_numbers (Optional[bool]): True to give every draw site its own random
+            stream, reseeded from ``seed`` for each iteration, see
+            :class:`~simfantasy.rng.RandomStreams`. Runs that share a seed then share their random
+            numbers, e.g., for :func:`~simfantasy.compare.compare`. Default: False.
+        sampler (Optional[str]): Name of a variance-reducing sampler from
+            :data:`~simfantasy.rng.SAMPLERS`, e.g., ``'antithetic'`` or ``'quasi'``. Samplers
+            give every draw site its own stream as well. Reported intervals treat iterations as
+            independent, so with a sampler they overstate the remaining error. Default: None.
+        execute_health (Optional[float]): Fraction of an enemy's health that starts the execute
+            phase, for enemies with a health pool, see :mod:`simfantasy.health`, instead of
+            ``execute_time``. Default: None.
+        encounter (Optional[simfantasy.encounter.Encounter]): Script of downtime, adds, movement
+            and phases. Default: None.
 
     Attributes:
         actors (List[simfantasy.actor.Actor]): Actors involved in the encounter.
         combat_length (datetime.timedelta): Length of the encounter.
+        common_random_numbers (bool): True to give every draw site its own random stream.
+        confidence (float): Confidence level of ``target_error`` and of reported intervals.
         current_iteration (int): Current iteration index.
         current_time (datetime.datetime): "In game" timestamp.
+        encounter (Optional[simfantasy.encounter.Encounter]): Script of downtime, adds, movement
+            and phases.
         events (queue.PriorityQueue[simfantasy.event.Event]): Heapified list of upcoming events.
         execute_time (datetime.timedelta): Length of time to allow jobs to use "execute" actions.
+        execute_health (Optional[float]): Fraction of an enemy's health that starts the execute
+            phase.
+        executing (bool): True once an enemy's health has fallen to ``execute_health``.
         iterations (int): Number of encounters to simulate. Default: 100.
         log_action_attempts (bool): True to log actions attempted by
             :class:`~simfantasy.actor.Actor` decision engines.
@@ -66,13 +155,28 @@ class Simulation:
             class names.
         log_pops (bool): True to show events being popped off the queue. Default: True.
         log_pushes (bool): True to show events being placed on the queue. Default: True.
+        min_iterations (int): Fewest iterations to run before checking ``target_error``.
+        moving (bool): True while the encounter keeps everyone moving.
+        phase (Optional[str]): Name of the encounter's current phase.
+        random (simfantasy.rng.GlobalRandom): Where random outcomes are drawn from.
+        sampler (Optional[str]): Name of the variance-reducing sampler.
+        seed (Optional[int]): Seed for the random number generator.
         start_time (datetime.datetime): Time that combat started.
+        target_error (Optional[float]): Relative error of mean DPS to stop at.
+        timeline_due (datetime.datetime): When the encounter's next transition happens.
+        timeline_position (int): Number of the encounter's transitions that have happened.
+        turned (Tuple[Tuple[simfantasy.actor.Actor, simfantasy.actor.Actor], ...]): Actors that
+            the encounter's adds turned away from their targets, along with those targets.
+        untargetable (bool): True while the enemies can't be targeted.
     """
 
     def __init__(self, combat_length: timedelta = None, log_level: int = None,
                  log_event_filter: str = None, execute_time: timedelta = None,
                  log_pushes: bool = None, log_pops: bool = None, iterations: int = None,
-                 log_action_attempts: bool = None) -> None:
+                 log_action_attempts: bool = None, seed: int = None, target_error: float = None,
+                 confidence: float = None, min_iterations: int = None,
+                 common_random_numbers: bool = None, sampler: str = None,
+                 execute_health: float = None, encounter: 'Encounter' = None) -> None:
         # FIXME Do I even need to set these here? They aren't mutable.
         if combat_length is None:
             combat_length = timedelta(minutes=5)
@@ -83,6 +187,16 @@ class Simulation:
             execute_time = timedelta(seconds=60)
 
         self.execute_time: timedelta = execute_time
+        self.execute_health: Optional[float] = execute_health
+        self.executing: bool = False
+
+        self.encounter: Optional[Encounter] = encounter
+        self.timeline_position: int = 0
+        self.timeline_due: datetime = datetime.max
+        self.turned: Tuple = ()
+        self.untargetable: bool = False
+        self.moving: bool = False
+        self.phase: Optional[str] = None
 
         if iterations is None:
             iterations = 100
@@ -109,6 +223,32 @@ class Simulation:
 
         self.log_action_attempts: bool = log_action_attempts
 
+        self.seed: Optional[int] = seed
+
+        self.target_error: Optional[float] = target_error
+
+        if confidence is None:
+            confidence = 0.95
+
+        self.confidence: float = confidence
+
+        if min_iterations is None:
+            min_iterations = 10
+
+        self.min_iterations: int = min_iterations
+
+        if common_random_numbers is None:
+            common_random_numbers = False
+
+        self.common_random_numbers: bool = common_random_numbers
+
+        if sampler is not None and sampler not in SAMPLERS:
+            raise ValueError('Unknown sampler {0!r}, expected one of {1}.'.format(
+                sampler, ', '.join(SAMPLERS)))
+
+        self.sampler: Optional[str] = sampler
+        self.random: GlobalRandom = GlobalRandom()
+
         configure_logging(log_level)
 
         self.actors: List[Actor] = []
@@ -146,7 +286,13 @@ class Simulation:
             >>> sim.current_time += timedelta(seconds=45)
             >>> print("Misery's End") if sim.in_execute else print('Heavy Shot')
             Misery's End
+
+            With an ``execute_health``, it's up to the enemy's health instead, see
+            :mod:`simfantasy.health`.
         """
+        if self.execute_health is not None:
+            return self.executing
+
         return self.current_time + self.execute_time >= self.start_time + self.combat_length
 
     def unschedule(self, event) -> bool:
@@ -261,91 +407,205 @@ class Simulation:
                                     '.3f'),
                              event)
 
-    def run(self) -> None:
-        """Run the simulation and process all events."""
-        from simfantasy.event import ActorReadyEvent, CombatStartEvent, CombatEndEvent, \
-            ServerTickEvent
+    def snapshot(self) -> 'Snapshot':
+        """Capture the state of the running encounter, see :mod:`simfantasy.snapshot`.
+
+        Returns:
+            simfantasy.snapshot.Snapshot: The snapshot.
+        """
+        from simfantasy.snapshot import Snapshot
+
+        return Snapshot(self)
+
+    def restore(self, snapshot: 'Snapshot') -> None:
+        """Rewind the running encounter to a snapshot.
+
+        Arguments:
+            snapshot (simfantasy.snapshot.Snapshot): A snapshot of this simulation.
+        """
+        if snapshot.sim is not self:
+            raise ValueError('Snapshot was taken of a different simulation.')
+
+        snapshot.restore()
+
+    @contextmanager
+    def branch(self) -> Iterator['Snapshot']:
+        """Try something out, then rewind the encounter to where it was.
+
+        Yields:
+            simfantasy.snapshot.Snapshot: Snapshot of the encounter as it was, which can be
+            restored within the block as well, e.g., to try several things in turn.
+
+        Examples:
+            .. testsetup::
+                >>> from simfantasy.actor import Actor
+                >>> from simfantasy.enum import Attribute, Race, Slot
+                >>> from simfantasy.equipment import Weapon
+                >>> from simfantasy.jobs.bard import Bard
+                >>> sim = Simulation(combat_length=timedelta(seconds=30))
+                >>> enemy = Actor(sim, Race.ENEMY)
+                >>> bard = Bard(sim, Race.HIGHLANDER, target=enemy, gear={
+                ...     Slot.WEAPON: Weapon(370, 70, 104, 3.04, 105.38,
+                ...                         {Attribute.DEXTERITY: 347})})
+                >>> sim._reset_random()
+                >>> sim._start_iteration(0)
+                >>> sim._process_events(until=sim.start_time + timedelta(seconds=10))
+
+            >>> recast_at = bard.actions.barrage.can_recast_at
+            >>> with sim.branch():
+            ...     bard.actions.barrage.perform()
+            ...     sim._process_events(until=sim.start_time + timedelta(seconds=15))
+            >>> bard.actions.barrage.can_recast_at == recast_at
+            True
+        """
+        snapshot = self.snapshot()
+
+        try:
+            yield snapshot
+        finally:
+            snapshot.restore()
+
+    def run(self, report: bool = None, checkpoint: Union[str, PathLike] = None,
+            checkpoint_interval: int = None, resume: bool = None,
+            export: Union[str, PathLike] = None) -> SimulationResults:
+        """Run the simulation and process all events.
+
+        Arguments:
+            report (Optional[bool]): True to show the terminal report when finished.
+                Default: True.
+            checkpoint (Optional[Union[str, os.PathLike]]): Directory to periodically save
+                completed iterations to, see :class:`~simfantasy.checkpoint.Checkpoint`. Default:
+                None.
+            checkpoint_interval (Optional[int]): Number of iterations between checkpoints, which
+                is also the number of iterations in each exported partition. Default: 100.
+            resume (Optional[bool]): True to continue from the last checkpoint, if there is one,
+                rather than starting over. Default: False.
+            export (Optional[Union[str, os.PathLike]]): Directory to write every event to, in
+                columnar form, see :class:`~simfantasy.columnar.ColumnarExport`. Default: None.
+
+        Returns:
+            simfantasy.simulator.SimulationResults: Statistics collected from every completed
+            iteration. With a ``target_error``, that can be fewer than ``iterations``.
+        """
+        if report is None:
+            report = True
+
+        if checkpoint_interval is None:
+            checkpoint_interval = 100
+
+        if resume is None:
+            resume = False
+
+        from simfantasy.checkpoint import Checkpoint
+        from simfantasy.columnar import ColumnarWriter, TABLES
+        from simfantasy.health import combat_lengths
+
+        self._reset_random()
 
         auras_df = pd.DataFrame()
         damage_df = pd.DataFrame()
         resources_df = pd.DataFrame()
 
+        # Quantiles of DPS and damage, kept up to date as iterations complete.
+        sketches = DamageSketches(self.combat_length)
+
+        # Discard events left over from an interrupted run.
+        self.events = queue.PriorityQueue()
+
+        saver: Optional[Checkpoint] = None
+        first_iteration = 0
+
+        if checkpoint is not None:
+            saver = Checkpoint(self, checkpoint)
+
+            if resume is True:
+                frames = saver.load()
+
+                if frames is not None:
+                    auras_df, damage_df, resources_df = frames
+                    sketches.update(damage_df, combat_lengths(self, damage_df))
+                    first_iteration = saver.completed
+                    numpy.random.set_state(saver.rng_state)
+            else:
+                saver.clear()
+
+        writer: Optional[ColumnarWriter] = None
+
+        if export is not None:
+            writer = ColumnarWriter(export, self.combat_length, resume=resume)
+            writer.truncate(first_iteration)
+
+        # Number of completed iterations, along with the state of the random number generator
+        # right after them. Both are replaced at once, so an interruption can't separate them.
+        progress = first_iteration, numpy.random.get_state()
+        flushed = first_iteration
+        completed = first_iteration
+
+        def flush() -> None:
+            """Checkpoint and export the iterations completed since the last flush."""
+            nonlocal flushed
+
+            completed, rng_state = progress
+
+            if (saver is None and writer is None) or completed <= flushed:
+                return
+
+            frames = tuple(
+                df[df['iteration'].between(flushed, completed - 1)] if 'iteration' in df else df
+                for df in (auras_df, damage_df, resources_df)
+            )
+
+            if saver is not None:
+                saver.save(completed, rng_state, frames)  # type: ignore
+
+            if writer is not None:
+                writer.write(flushed, completed, dict(zip(TABLES, frames)),
+                             combat_lengths(self, frames[1]))
+
+            flushed = completed
+
+        pd_runtimes = pd.Series([], dtype=object)
+
         try:
             # Create a friendly progress indicator for the user.
             with humanfriendly.Spinner(label='Simulating', total=self.iterations) as spinner:
                 # Store iteration runtimes so we can predict overall runtime.
                 iteration_runtimes: List[timedelta] = []
 
-                for iteration in range(self.iterations):
+                for iteration in range(first_iteration, self.iterations):
                     pd_runtimes = pd.Series(iteration_runtimes)
 
                     iteration_start = datetime.now()
-                    self.current_iteration = iteration
 
-                    # Schedule the bookend events.
-                    self.schedule(CombatStartEvent(sim=self))
-                    self.schedule(CombatEndEvent(sim=self), self.combat_length)
+                    self._start_iteration(iteration)
+                    self._process_events()
 
-                    # Schedule the server ticks.
-                    for delta in range(3, int(self.combat_length.total_seconds()), 3):
-                        self.schedule(ServerTickEvent(sim=self), delta=timedelta(seconds=delta))
+                    # Combat ends early once an enemy with a health pool dies.
+                    duration: Optional[pd.Series] = None
 
-                    # TODO Maybe move this to Actor#arise?
-                    # Tell the actors to get ready.
-                    for actor in self.actors:
-                        self.schedule(ActorReadyEvent(sim=self, actor=actor))
-
-                    # Start the event loop.
-                    while not self.events.empty():
-                        _, _, event = self.events.get()
-
-                        # Ignore events that are flagged as unscheduled.
-                        if event.unscheduled is True:
-                            self.events.task_done()
-                            continue
-
-                        # Some event desync clearly happened.
-                        if event.timestamp < self.current_time:
-                            LOGGER.critical(
-                                '[%s] %s %s timestamp %s before current timestamp',
-                                self.current_iteration,
-                                self.relative_timestamp,
-                                event,
-                                (event.timestamp - self.start_time).total_seconds()
-                            )
-
-                        # Update the simulation's current time to the latest event.
-                        self.current_time = event.timestamp
-
-                        if self.log_pops is True:
-                            if self.log_event_filter is None or self.log_event_filter.match(
-                                    event.__class__.__name__) is not None:
-                                LOGGER.debug(
-                                    '[%s] <= %s %s',
-                                    self.current_iteration,
-                                    format(
-                                        abs(event.timestamp - self.start_time).total_seconds(),
-                                        '.3f'
-                                    ),
-                                    event
-                                )
-
-                        # Handle the event.
-                        event.execute()
-
-                        if not self.events.all_tasks_done:  # type: ignore
-                            self.events.task_done()
+                    if any(actor.health is not None for actor in self.actors):
+                        duration = pd.Series(
+                            [(self.current_time - self.start_time).total_seconds()],
+                            index=[iteration])
 
                     # Build statistical dataframes for the completed iteration.
                     for actor in self.actors:
                         auras_df = auras_df.append(pd.DataFrame(actor.statistics['auras']))
-                        damage_df = damage_df.append(pd.DataFrame(actor.statistics['damage']))
+                        actor_damage = pd.DataFrame(actor.statistics['damage'])
+                        damage_df = damage_df.append(actor_damage)
+                        sketches.update(actor_damage, duration)
                         resources_df = resources_df.append(
                             pd.DataFrame(actor.statistics['resources']))
 
                     # Add the iteration runtime to the collection.
                     iteration_runtimes.append(datetime.now() - iteration_start)
 
+                    progress = iteration + 1, numpy.random.get_state()
+                    completed = iteration + 1
+
+                    if completed % checkpoint_interval == 0:
+                        flush()
+
                     auras_df = auras_df.astype(dtype={
                         'aura': 'category',
                         'target': 'category',
@@ -362,7 +622,16 @@ class Simulation:
                         (pd_runtimes.mean() * (self.iterations - self.current_iteration)))
                     spinner.step(iteration)
 
-            LOGGER.info('Finished %s iterations in %s (mean %s).\n', self.iterations,
+                    if self.target_error is not None and completed >= self.min_iterations and \
+                            sketches.converged(self.target_error, self.confidence):
+                        LOGGER.info('Mean DPS is within %s at %s confidence.',
+                                    format(self.target_error, '.2%'),
+                                    format(self.confidence, '.0%'))
+                        break
+
+            flush()
+
+            LOGGER.info('Finished %s iterations in %s (mean %s).\n', completed,
                         pd_runtimes.sum(),
                         pd_runtimes.mean())
         except KeyboardInterrupt:  # Handle SIGINT.
@@ -370,15 +639,124 @@ class Simulation:
                             self.current_iteration,
                             self.iterations, pd_runtimes.sum())
 
+            # Keep the iterations that finished before the interruption.
+            flush()
+
         # TODO Everything.
         auras_df.set_index('iteration', inplace=True)
         damage_df.set_index('iteration', inplace=True)
         resources_df.set_index('iteration', inplace=True)
 
-        TerminalReporter(self, auras=auras_df, damage=damage_df, resources=resources_df).report()
-        # HTMLReporter(self, df).report()
+        if report is True:
+            TerminalReporter(self, auras=auras_df, damage=damage_df,
+                             resources=resources_df, sketches=sketches).report()
+            # HTMLReporter(self, df).report()
+
+            LOGGER.info('Quitting!')
 
-        LOGGER.info('Quitting!')
+        return SimulationResults(self, auras_df, damage_df, resources_df, sketches,
+                                 combat_lengths(self, damage_df))
+
+    def _reset_random(self) -> None:
+        """Seed and pick the source of random outcomes for a new run."""
+        if self.seed is not None:
+            numpy.random.seed(self.seed)
+
+        if self.sampler is not None:
+            self.random = SAMPLERS[self.sampler](self.seed)
+        elif self.common_random_numbers:
+            self.random = RandomStreams(self.seed)
+        else:
+            self.random = GlobalRandom()
+
+    def _start_iteration(self, iteration: int) -> None:
+        """Schedule the events that begin an iteration.
+
+        Arguments:
+            iteration (int): Index of the iteration.
+        """
+        from simfantasy.event import ActorReadyEvent, CombatStartEvent, CombatEndEvent, \
+            ServerTickEvent
+
+        self.current_iteration = iteration
+        self.random.reset(iteration)
+        self.executing = False
+
+        # Schedule the bookend events.
+        self.schedule(CombatStartEvent(sim=self))
+        self.schedule(CombatEndEvent(sim=self), self.combat_length)
+
+        # The encounter's script isn't scheduled, but merged into the event loop as it comes due.
+        if self.encounter is not None:
+            self.encounter.reset(self)
+
+        # Schedule the server ticks.
+        for delta in range(3, int(self.combat_length.total_seconds()), 3):
+            self.schedule(ServerTickEvent(sim=self), delta=timedelta(seconds=delta))
+
+        # TODO Maybe move this to Actor#arise?
+        # Tell the actors to get ready.
+        for actor in self.actors:
+            self.schedule(ActorReadyEvent(sim=self, actor=actor))
+
+    def _process_events(self, until: datetime = None,
+                        stop: Callable[['Event'], bool] = None) -> None:
+        """Run the event loop.
+
+        Arguments:
+            until (Optional[datetime.datetime]): Stop before the first event at or after this
+                time, leaving it on the queue. Default: None, to run until the queue is empty.
+            stop (Optional[Callable[[simfantasy.event.Event], bool]]): Stop before the first
+                scheduled event this returns True for, leaving it on the queue. Default: None.
+        """
+        while not self.events.empty():
+            timestamp, _, upcoming = self.events.queue[0]
+
+            if self.timeline_due <= timestamp and (until is None or self.timeline_due < until):
+                self.encounter.advance(self)
+                continue
+
+            if until is not None and timestamp >= until:
+                return
+
+            if stop is not None and not upcoming.unscheduled and stop(upcoming):
+                return
+
+            _, _, event = self.events.get()
+
+            # Ignore events that are flagged as unscheduled.
+            if event.unscheduled is True:
+                self.events.task_done()
+                continue
+
+            # Some event desync clearly happened.
+            if event.timestamp < self.current_time:
+                LOGGER.critical(
+                    '[%s] %s %s timestamp %s before current timestamp',
+                    self.current_iteration,
+                    self.relative_timestamp,
+                    event,
+                    (event.timestamp - self.start_time).total_seconds()
+                )
+
+            # Update the simulation's current time to the latest event.
+            self.current_time = event.timestamp
+
+            if self.log_pops is True:
+                if self.log_event_filter is None or self.log_event_filter.match(
+                        event.__class__.__name__) is not None:
+                    LOGGER.debug(
+                        '[%s] <= %s %s',
+                        self.current_iteration,
+                        format(abs(event.timestamp - self.start_time).total_seconds(), '.3f'),
+                        event
+                    )
+
+            # Handle the event.
+            event.execute()
+
+            if not self.events.all_tasks_done:  # type: ignore
+                self.events.task_done()
 
     @property
     def relative_timestamp(self) -> str:
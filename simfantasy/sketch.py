@@ -0,0 +1,474 @@
+# -*- coding: utf-8 -*-
+"""Mergeable quantile sketches of damage distributions.
+
+A :class:`QuantileSketch` summarizes any number of values in a bounded amount of memory, and
+answers quantile queries within a small rank error. Sketches of separate runs, e.g., from parallel
+workers, merge into a sketch of all of their values, in any order and grouping.
+"""
+
+from datetime import timedelta
+from statistics import NormalDist
+from typing import Dict, List, Sequence, Tuple, Union
+
+import numpy
+import pandas as pd
+
+from simfantasy.estimate import ControlVariateEstimator
+
+DEVIATIONS = ('critical_deviation', 'direct_deviation')
+"""Damage columns used as control variates of DPS, see :mod:`simfantasy.estimate`."""
+
+QUANTILES = (0.05, 0.5, 0.95)
+"""Quantiles shown by reports, besides the minimum and maximum."""
+
+
+class QuantileSketch:
+    """KLL sketch of a stream of values.
+
+    Values are kept in a hierarchy of compactors, where each value at level ``h`` stands for
+    ``2 ** h`` values of the stream. When a compactor is full, it is sorted and every other value
+    is promoted to the next level. Which half is promoted is chosen at random, so that the errors
+    of successive compactions cancel out rather than pile up. The choices are drawn from a
+    generator of the sketch's own, with a fixed seed, so that sketches don't consume the
+    simulation's random numbers and results stay reproducible.
+
+    The exact mean and variance are kept alongside, using Chan's pairwise update so that they
+    merge as well.
+
+    Arguments:
+        k (Optional[int]): Capacity of the top compactor, trading memory for accuracy. The
+            largest rank error over all quantiles stays within about ``3.5 / k``, e.g., 0.4% at
+            the default, as measured on up to 2 million values, added one at a time, in chunks,
+            or merged from parts. A sketch keeps about ``2 * k`` values. Default: 800.
+
+    Attributes:
+        compactors (List[numpy.ndarray]): Values kept at each level.
+        count (int): Number of values added.
+        k (int): Capacity of the top compactor.
+        max (float): Largest value added.
+        mean (float): Mean of the values added, or NaN if there are none.
+        min (float): Smallest value added.
+
+    Examples:
+        >>> sketch = QuantileSketch()
+        >>> sketch.add(numpy.arange(100000))
+        >>> sketch.count, sketch.min, sketch.max
+        (100000, 0.0, 99999.0)
+        >>> sketch.size < 1000
+        True
+        >>> abs(sketch.quantile(0.5) - 50000) < 1000
+        True
+
+        Sketches of separate parts of a stream merge into a sketch of the whole stream:
+
+        >>> first, second = QuantileSketch(), QuantileSketch()
+        >>> first.add(numpy.arange(0, 50000))
+        >>> second.add(numpy.arange(50000, 100000))
+        >>> merged = first.merge(second)
+        >>> merged.count, merged.max
+        (100000, 99999.0)
+        >>> abs(merged.quantile(0.95) - 95000) < 1000
+        True
+        >>> merged.mean, merged.mean == numpy.arange(100000).mean()
+        (49999.5, True)
+    """
+
+    def __init__(self, k: int = None) -> None:
+        if k is None:
+            k = 800
+
+        self.k: int = k
+        self.compactors: List[numpy.ndarray] = [numpy.empty(0)]
+        self.count: int = 0
+        self.min: float = numpy.inf
+        self.max: float = -numpy.inf
+        self.mean: float = numpy.nan
+
+        self._m2: float = 0.0
+        self._random: numpy.random.Generator = numpy.random.default_rng(0)
+
+    @property
+    def size(self) -> int:
+        """Number of values kept."""
+        return sum(len(compactor) for compactor in self.compactors)
+
+    @property
+    def variance(self) -> float:
+        """Sample variance of the values added, or NaN if there are fewer than two."""
+        if self.count < 2:
+            return numpy.nan
+
+        return self._m2 / (self.count - 1)
+
+    def margin(self, confidence: float = None) -> float:
+        """Half-width of the normal confidence interval of the mean.
+
+        Arguments:
+            confidence (Optional[float]): Confidence level. Default: 0.95.
+
+        Returns:
+            float: The true mean is within this distance of :attr:`mean` with the given
+            confidence, or NaN if there are fewer than two values.
+
+        Examples:
+            >>> sketch = QuantileSketch()
+            >>> sketch.add([98, 102] * 50)
+            >>> round(sketch.margin(), 3)
+            0.394
+        """
+        if confidence is None:
+            confidence = 0.95
+
+        z = NormalDist().inv_cdf((1 + confidence) / 2)
+
+        return z * numpy.sqrt(self.variance / self.count)
+
+    def _moments(self, count: int, mean: float, m2: float) -> None:
+        if count == 0:
+            return
+
+        if self.count == 0:
+            self.mean, self._m2 = mean, m2
+
+            return
+
+        total = self.count + count
+        delta = mean - self.mean
+
+        self.mean += delta * count / total
+        self._m2 += m2 + delta ** 2 * self.count * count / total
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.compactors) - level - 1
+
+        return max(2, int(numpy.ceil(self.k * (2 / 3) ** depth)))
+
+    def _compress(self) -> None:
+        compressed = False
+
+        while not compressed:
+            compressed = True
+
+            for level, items in enumerate(self.compactors):
+                if len(items) <= self._capacity(level):
+                    continue
+
+                compressed = False
+
+                if level + 1 == len(self.compactors):
+                    self.compactors.append(numpy.empty(0))
+
+                items = numpy.sort(items)
+                kept = len(items) % 2
+
+                self.compactors[level] = items[len(items) - kept:]
+                self.compactors[level + 1] = numpy.concatenate([
+                    self.compactors[level + 1],
+                    items[self._random.integers(2):len(items) - kept:2],
+                ])
+
+    def add(self, values: Union[float, Sequence[float], numpy.ndarray]) -> None:
+        """Add one or many values.
+
+        Arguments:
+            values (Union[float, Sequence[float], numpy.ndarray]): The values.
+        """
+        values = numpy.asarray(values, dtype=float).ravel()
+
+        if not values.size:
+            return
+
+        mean = values.mean()
+        self._moments(values.size, mean, ((values - mean) ** 2).sum())
+
+        self.count += values.size
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+
+        self.compactors[0] = numpy.concatenate([self.compactors[0], values])
+        self._compress()
+
+    def merge(self, other: 'QuantileSketch') -> 'QuantileSketch':
+        """Combine with the sketch of other values.
+
+        Arguments:
+            other (simfantasy.sketch.QuantileSketch): The other sketch.
+
+        Returns:
+            simfantasy.sketch.QuantileSketch: A new sketch of the values of both.
+        """
+        merged = QuantileSketch(self.k)
+        height = max(len(self.compactors), len(other.compactors))
+
+        merged.compactors = [
+            numpy.concatenate([sketch.compactors[level] for sketch in (self, other)
+                               if level < len(sketch.compactors)])
+            for level in range(height)
+        ]
+        for sketch in (self, other):
+            merged._moments(sketch.count, sketch.mean, sketch._m2)
+            merged.count += sketch.count
+
+        merged.min = min(self.min, other.min)
+        merged.max = max(self.max, other.max)
+
+        merged._compress()
+
+        return merged
+
+    def quantile(self, q: Union[float, Sequence[float]]) -> Union[float, numpy.ndarray]:
+        """Estimate one or many quantiles.
+
+        Arguments:
+            q (Union[float, Sequence[float]]): Quantiles, between 0 and 1.
+
+        Returns:
+            Union[float, numpy.ndarray]: The estimates, or NaN if no values were added.
+        """
+        q = numpy.asarray(q, dtype=float)
+
+        if self.count == 0:
+            return numpy.full(q.shape, numpy.nan)[()]
+
+        items = numpy.concatenate(self.compactors)
+        weights = numpy.concatenate([numpy.full(len(compactor), 2 ** level)
+                                     for level, compactor in enumerate(self.compactors)])
+
+        order = numpy.argsort(items, kind='stable')
+        items, weights = items[order], weights[order]
+
+        # Each value counts for the run of values it replaced, all at or below it.
+        ranks = numpy.cumsum(weights)
+
+        indices = numpy.searchsorted(ranks, q * weights.sum())
+        estimates = items[numpy.minimum(indices, len(items) - 1)]
+        estimates = numpy.where(q <= 0, self.min, numpy.where(q >= 1, self.max, estimates))
+
+        return numpy.clip(estimates, self.min, self.max)[()]
+
+
+def _merge_sketches(mine: Dict, theirs: Dict) -> Dict:
+    merged = dict(mine)
+
+    for key, sketch in theirs.items():
+        merged[key] = sketch if key not in merged else merged[key].merge(sketch)
+
+    return merged
+
+
+class DamageSketches:
+    """Quantile sketches of DPS and damage, kept while a simulation runs.
+
+    When damage events have :data:`DEVIATIONS` columns, control variate estimates of each source's
+    mean DPS are kept as well.
+
+    Arguments:
+        combat_length (datetime.timedelta): Length of each simulated encounter.
+        k (Optional[int]): See :class:`QuantileSketch`.
+
+    Attributes:
+        action_damage (Dict[Tuple[str, str], simfantasy.sketch.QuantileSketch]): Damage dealt by
+            each action of each source in each iteration where it was used.
+        combat_length (datetime.timedelta): Length of each simulated encounter.
+        controls (Dict[str, simfantasy.estimate.ControlVariateEstimator]): DPS of each source in
+            each iteration, with the critical hit deviations of hits and of ticks, and the direct
+            hit deviations, as controls.
+        dps (Dict[str, simfantasy.sketch.QuantileSketch]): DPS of each source in each iteration.
+        hit_damage (Dict[Tuple[str, str], simfantasy.sketch.QuantileSketch]): Damage of each hit
+            or tick of each action of each source.
+        k (Optional[int]): See :class:`QuantileSketch`.
+
+    Examples:
+        >>> damage = pd.DataFrame({
+        ...     'iteration': [0, 0, 1, 1], 'source': ['Bard'] * 4,
+        ...     'action': ['Shot', 'Shot', 'Shot', 'Windbite'], 'damage': [100, 140, 150, 50],
+        ... })
+        >>> sketches = DamageSketches(timedelta(seconds=10))
+        >>> sketches.update(damage)
+        >>> sketches.quantiles('dps').loc['Bard'].tolist()
+        [20.0, 20.0, 20.0, 24.0, 24.0]
+        >>> sketches.quantiles('hit_damage').loc[('Bard', 'Shot')].tolist()
+        [100.0, 100.0, 140.0, 150.0, 150.0]
+    """
+
+    def __init__(self, combat_length: timedelta, k: int = None) -> None:
+        self.combat_length: timedelta = combat_length
+        self.k: int = k
+
+        self.dps: Dict[str, QuantileSketch] = {}
+        self.action_damage: Dict[Tuple[str, str], QuantileSketch] = {}
+        self.hit_damage: Dict[Tuple[str, str], QuantileSketch] = {}
+        self.controls: Dict[str, ControlVariateEstimator] = {}
+
+    def _sketch(self, sketches: Dict, key) -> QuantileSketch:
+        if key not in sketches:
+            sketches[key] = QuantileSketch(self.k)
+
+        return sketches[key]
+
+    def update(self, damage: pd.DataFrame, durations: pd.Series = None) -> None:
+        """Add a chunk of damage events, with an ``iteration`` column or index.
+
+        Every iteration of a source must be added in the same chunk. Damage totals, e.g., from
+        :func:`simfantasy.cache.summarize_damage`, can be added too, but have no hits to sketch.
+
+        Arguments:
+            damage (pandas.DataFrame): The chunk.
+            durations (Optional[pandas.Series]): Seconds each iteration of the chunk lasted,
+                indexed by iteration, e.g., when an enemy died early. Default: ``combat_length``.
+        """
+        if damage.empty:
+            return
+
+        if 'iteration' in damage:
+            iterations = damage['iteration'].to_numpy()
+        else:
+            iterations = damage.index.get_level_values('iteration').to_numpy()
+
+        sources = damage['source'].astype(str).to_numpy()
+        actions = damage['action'].astype(str).to_numpy()
+
+        totals = damage['damage'].groupby([iterations, sources, actions], sort=False).sum()
+
+        for (source, action), values in totals.groupby(level=[1, 2], sort=False):
+            self._sketch(self.action_damage, (source, action)).add(values.to_numpy())
+
+        seconds = self.combat_length.total_seconds()
+
+        def per_second(values: Union[pd.Series, pd.DataFrame]) -> Union[pd.Series, pd.DataFrame]:
+            if durations is None:
+                return values / seconds
+
+            return values.div(durations.reindex(values.index.get_level_values(0)).to_numpy(),
+                              axis=0)
+
+        for source, values in totals.groupby(level=[0, 1], sort=False).sum().groupby(level=1):
+            self._sketch(self.dps, source).add(per_second(values).to_numpy())
+
+        if 'hits' not in damage:
+            hits = damage['damage'].groupby([sources, actions], sort=False)
+
+            for (source, action), values in hits:
+                self._sketch(self.hit_damage, (source, action)).add(values.to_numpy())
+
+        if all(column in damage for column in DEVIATIONS):
+            # Critical ticks often trigger procs, so they get a control of their own.
+            periodic = damage['dot'].to_numpy(dtype=bool)
+            critical, direct = (damage[column].to_numpy() for column in DEVIATIONS)
+
+            luck = per_second(pd.DataFrame({
+                'damage': damage['damage'].to_numpy(),
+                'critical': numpy.where(periodic, 0, critical),
+                'periodic_critical': numpy.where(periodic, critical, 0),
+                'direct': direct,
+            }).groupby([iterations, sources], sort=False).sum())
+
+            for source, values in luck.groupby(level=1, sort=False):
+                if source not in self.controls:
+                    self.controls[source] = ControlVariateEstimator(3)
+
+                self.controls[source].add(values['damage'].to_numpy(),
+                                          values.drop(columns='damage').to_numpy())
+
+    def converged(self, target_error: float, confidence: float = None) -> bool:
+        """Check whether the mean DPS of every source is known precisely enough.
+
+        Arguments:
+            target_error (float): Largest acceptable half-width of the confidence interval,
+                relative to the mean, e.g., 0.001 for ±0.1%.
+            confidence (Optional[float]): Confidence level. Default: 0.95.
+
+        Returns:
+            bool: True if every source's interval is narrow enough.
+        """
+        return bool(self.dps) and all(sketch.margin(confidence) <= target_error * abs(sketch.mean)
+                                      for sketch in self.dps.values())
+
+    def merge(self, other: 'DamageSketches') -> 'DamageSketches':
+        """Combine with the sketches of other iterations of the same encounter.
+
+        Arguments:
+            other (simfantasy.sketch.DamageSketches): The other sketches.
+
+        Returns:
+            simfantasy.sketch.DamageSketches: New sketches of both.
+        """
+        merged = DamageSketches(self.combat_length, self.k)
+
+        for name in ('dps', 'action_damage', 'hit_damage', 'controls'):
+            setattr(merged, name, _merge_sketches(getattr(self, name), getattr(other, name)))
+
+        return merged
+
+    def rename(self, names: Dict[str, str]) -> 'DamageSketches':
+        """Replace source names, e.g., of actors loaded from the cache.
+
+        Arguments:
+            names (Dict[str, str]): New name of each source. Missing sources keep their name.
+
+        Returns:
+            simfantasy.sketch.DamageSketches: The same sketches, under the new names.
+        """
+        renamed = DamageSketches(self.combat_length, self.k)
+
+        renamed.dps = {names.get(source, source): sketch for source, sketch in self.dps.items()}
+        renamed.controls = {names.get(source, source): estimator
+                            for source, estimator in self.controls.items()}
+
+        for name in ('action_damage', 'hit_damage'):
+            setattr(renamed, name, {
+                (names.get(source, source), action): sketch
+                for (source, action), sketch in getattr(self, name).items()
+            })
+
+        return renamed
+
+    def control_variates(self, confidence: float = None) -> pd.DataFrame:
+        """Tabulate plain and control variate estimates of each source's mean DPS.
+
+        Arguments:
+            confidence (Optional[float]): Confidence level of the intervals. Default: 0.95.
+
+        Returns:
+            pandas.DataFrame: One row per source, with the plain ``mean`` and its ``margin``, the
+            ``adjusted`` mean and its ``adjusted_margin``, and the ``reduction`` of variance.
+        """
+        columns = ['mean', 'margin', 'adjusted', 'adjusted_margin', 'reduction']
+
+        rows = [[estimator.mean, estimator.margin(confidence), estimator.adjusted,
+                 estimator.adjusted_margin(confidence), estimator.variance_reduction]
+                for estimator in self.controls.values()]
+
+        return pd.DataFrame(rows, index=pd.Index(list(self.controls), name='source'),
+                            columns=columns, dtype=float).sort_index()
+
+    def quantiles(self, statistic: str, q: Sequence[float] = None) -> pd.DataFrame:
+        """Tabulate the minimum, maximum and quantiles of one statistic.
+
+        Arguments:
+            statistic (str): ``'dps'``, ``'action_damage'`` or ``'hit_damage'``.
+            q (Optional[Sequence[float]]): Quantiles between the minimum and maximum. Default:
+                :data:`QUANTILES`.
+
+        Returns:
+            pandas.DataFrame: One row per source, or per source and action, with columns ``min``,
+            ``p5``, ``p50``, ``p95`` and ``max`` by default.
+        """
+        if q is None:
+            q = QUANTILES
+
+        sketches: Dict = getattr(self, statistic)
+        columns = ['min'] + ['p{0:g}'.format(quantile * 100) for quantile in q] + ['max']
+
+        if not sketches:
+            return pd.DataFrame(columns=columns, dtype=float)
+
+        rows = [[sketch.min, *numpy.atleast_1d(sketch.quantile(q)), sketch.max]
+                for sketch in sketches.values()]
+
+        if statistic == 'dps':
+            index = pd.Index(list(sketches), name='source')
+        else:
+            index = pd.MultiIndex.from_tuples(list(sketches), names=['source', 'action'])
+
+        return pd.DataFrame(rows, index=index, columns=columns, dtype=float).sort_index()
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""Snapshots of a running simulation, to look ahead and rewind.
+
+A :class:`Snapshot` captures everything an encounter can change: the simulation's clock and event
+calendar, and the state of every actor, action, aura and event reachable from them, e.g.,
+cooldowns, resources and stacks, along with the state of the random streams. Restoring it rewinds
+the simulation in place, so different choices can be tried from the same moment, e.g., with
+:meth:`Simulation.branch <simfantasy.simulator.Simulation.branch>`.
+
+Snapshots are shallow: each object's attributes are copied, but the values they hold are shared,
+since the simulation replaces values such as timestamps, tuples and stat blocks rather than
+changing them. Only lists, dicts and sets are copied along, and the logs in
+:attr:`Actor.statistics <simfantasy.actor.Actor.statistics>` without their records, which never
+change once logged. That keeps a snapshot to a few hundred small dicts, and far cheaper than
+:func:`copy.deepcopy`, which would also copy the gear, the stat blocks and every value.
+"""
+
+from enum import Enum
+from typing import Any, Dict, List, Tuple
+
+from simfantasy.simulator import Simulation
+
+_LEAF, _TUPLE, _LIST, _DICT, _SET, _OBJECT = range(1, 7)
+
+_kinds: Dict[type, int] = {tuple: _TUPLE, list: _LIST, dict: _DICT, set: _SET}
+"""How the snapshot treats instances of each class found so far."""
+
+
+def _kind(cls: type) -> int:
+    kind = _kinds.get(cls)
+
+    if kind is None:
+        if issubclass(cls, tuple):
+            kind = _TUPLE
+        elif issubclass(cls, list):
+            kind = _LIST
+        elif issubclass(cls, dict):
+            kind = _DICT
+        elif issubclass(cls, set):
+            kind = _SET
+        elif cls.__module__.startswith('simfantasy.') and cls.__dictoffset__ != 0 and \
+                not issubclass(cls, (Enum, Simulation)):
+            kind = _OBJECT
+        else:
+            kind = _LEAF
+
+        _kinds[cls] = kind
+
+    return kind
+
+
+class Snapshot:
+    """State of a running simulation at one moment.
+
+    Arguments:
+        sim (simfantasy.simulator.Simulation): The simulation.
+
+    Attributes:
+        sim (simfantasy.simulator.Simulation): The simulation.
+
+    Examples:
+        .. testsetup::
+            >>> from datetime import timedelta
+            >>> from simfantasy.actor import Actor
+            >>> from simfantasy.enum import Attribute, Race, Slot
+            >>> from simfantasy.equipment import Weapon
+            >>> from simfantasy.jobs.bard import Bard
+            >>> sim = Simulation(combat_length=timedelta(seconds=30),
+            ...                  common_random_numbers=True, seed=3)
+            >>> enemy = Actor(sim, Race.ENEMY)
+            >>> bard = Bard(sim, Race.HIGHLANDER, target=enemy, gear={
+            ...     Slot.WEAPON: Weapon(370, 70, 104, 3.04, 105.38, {Attribute.DEXTERITY: 347})})
+            >>> sim._reset_random()
+            >>> sim._start_iteration(0)
+            >>> def damage():
+            ...     return sum(record['damage'] for record in bard.statistics['damage'])
+
+        Halfway through an encounter:
+
+        >>> sim._process_events(until=sim.start_time + timedelta(seconds=15))
+        >>> snapshot = Snapshot(sim)
+        >>> sim._process_events()
+        >>> first = damage()
+
+        Rewinding plays the rest of the encounter out the same way again:
+
+        >>> snapshot.restore()
+        >>> damage() < first
+        True
+        >>> sim._process_events()
+        >>> damage() == first
+        True
+    """
+
+    def __init__(self, sim: Simulation) -> None:
+        self.sim: Simulation = sim
+
+        self._simulation: Dict[str, Any] = vars(sim).copy()
+        self._unfinished_tasks: int = sim.events.unfinished_tasks
+        self._heap: List[Tuple] = sim.events.queue.copy()
+        self._random: Any = sim.random.get_state()
+        self._logs: List[Tuple[list, list]] = [
+            (log, log.copy()) for actor in sim.actors for log in actor.statistics.values()
+        ]
+
+        self._objects: List[Tuple[object, Dict[str, Any]]] = []
+        self._lists: List[Tuple[list, list]] = []
+        self._dicts: List[Tuple[dict, dict]] = []
+        self._sets: List[Tuple[set, set]] = []
+
+        # Records in logs never change once logged, so logs are copied without them.
+        seen = {id(actor.statistics) for actor in sim.actors}
+        kinds = _kinds
+        pending: List[Any] = [*sim.actors, *self._heap]
+
+        while pending:
+            value = pending.pop()
+            kind = _kinds.get(type(value)) or _kind(type(value))
+
+            if kind == _TUPLE:
+                pending += [item for item in value if kinds.get(type(item)) != _LEAF]
+                continue
+
+            if kind == _LEAF or id(value) in seen:
+                continue
+
+            seen.add(id(value))
+
+            if kind == _OBJECT:
+                state = vars(value).copy()
+                self._objects.append((value, state))
+                items = state.values()
+            elif kind == _DICT:
+                self._dicts.append((value, value.copy()))
+                items = value.values()
+            elif kind == _LIST:
+                self._lists.append((value, value.copy()))
+                items = value
+            else:
+                self._sets.append((value, value.copy()))
+                continue
+
+            # Values that can't hold state are left out up front, as they are most of them.
+            pending += [item for item in items if kinds.get(type(item)) != _LEAF]
+
+    def restore(self) -> None:
+        """Rewind the simulation to this snapshot.
+
+        A snapshot can be restored any number of times.
+        """
+        sim = self.sim
+
+        for value, state in self._objects:
+            attributes = vars(value)
+            attributes.clear()
+            attributes.update(state)
+
+        for value, items in self._lists:
+            value[:] = items
+
+        for value, items in self._dicts:
+            value.clear()
+            value.update(items)
+
+        for value, items in self._sets:
+            value.clear()
+            value.update(items)
+
+        for log, records in self._logs:
+            log[:] = records
+
+        vars(sim).update(self._simulation)
+        sim.events.queue[:] = self._heap
+        sim.events.unfinished_tasks = self._unfinished_tasks
+        sim.random.set_state(self._random)
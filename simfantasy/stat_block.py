@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+"""Immutable attribute totals computed once per level, job, clan and set of gear."""
+
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, Iterable, Mapping, Optional, Tuple, Union
+
+import numpy
+
+from simfantasy.common_math import base_stats_by_job, job_index, main_stat_per_level, \
+    piety_per_level, race_index, racial_attribute_bonuses, sub_stat_per_level
+from simfantasy.enum import Attribute, Job, Race, Role, Slot
+from simfantasy.equipment import Item, Weapon
+
+ItemKey = Tuple[Tuple[int, int], ...]
+GearKey = Tuple[Tuple[int, ItemKey], ...]
+StatBlockKey = Tuple[int, Optional[Job], Optional[Role], Optional[Race], GearKey]
+
+_attributes: Tuple[Attribute, ...] = tuple(Attribute)
+
+
+def item_key(item: Item) -> ItemKey:
+    """Summarize the attributes granted by an item and its melds.
+
+    Two items that grant the same attribute totals produce the same key, regardless of how those
+    totals are split between the item itself and its materia.
+
+    Arguments:
+        item (simfantasy.equipment.Item): The item to summarize.
+
+    Returns:
+        Tuple[Tuple[int, int], ...]: Sorted pairs of attribute value and total bonus.
+
+    Examples:
+        >>> from simfantasy.equipment import Materia
+        >>> ring = Item(370, Slot.RING, {Attribute.DEXTERITY: 149},
+        ...             melds=[Materia(Attribute.DEXTERITY, 1), Materia(Attribute.VITALITY, 25)])
+        >>> item_key(ring) == ((Attribute.DEXTERITY.value, 150), (Attribute.VITALITY.value, 25))
+        True
+    """
+    totals: Dict[int, int] = {}
+
+    for attribute, bonus in item.stats.items():
+        totals[attribute.value] = totals.get(attribute.value, 0) + bonus
+
+    for materia in item.melds:
+        totals[materia.attribute.value] = totals.get(materia.attribute.value, 0) + materia.bonus
+
+    return tuple(sorted(totals.items()))
+
+
+def gear_key(gear: Mapping[Slot, Union[Item, Weapon]]) -> GearKey:
+    """Summarize the attributes granted by a collection of equipment.
+
+    Arguments:
+        gear (Mapping[~simfantasy.enum.Slot, ~simfantasy.equipment.Item]): Equipped items.
+
+    Returns:
+        Tuple[Tuple[int, Tuple[Tuple[int, int], ...]], ...]: Sorted pairs of slot value and
+        :func:`item_key`.
+    """
+    return tuple(sorted((slot.value, item_key(item)) for slot, item in gear.items()))
+
+
+@lru_cache(maxsize=None)
+def _item_vector(key: ItemKey) -> numpy.ndarray:
+    vector = numpy.zeros(len(Attribute) + 1, dtype=numpy.int64)
+
+    for attribute_value, bonus in key:
+        vector[attribute_value] += bonus
+
+    vector.setflags(write=False)
+
+    return vector
+
+
+def _base_vector(level: int, job: Optional[Job], role: Optional[Role],
+                 race: Optional[Race]) -> numpy.ndarray:
+    main_stat = int(main_stat_per_level[level])
+    sub_stat = int(sub_stat_per_level[level])
+
+    vector = numpy.floor(main_stat * (base_stats_by_job[job_index(job)] / 100)).astype(numpy.int64)
+    vector += racial_attribute_bonuses[race_index(race)]
+
+    for attribute in (Attribute.CRITICAL_HIT, Attribute.DIRECT_HIT, Attribute.SKILL_SPEED,
+                      Attribute.TENACITY):
+        vector[attribute.value] += sub_stat
+
+    vector[Attribute.DETERMINATION.value] += main_stat
+    vector[Attribute.PIETY.value] += main_stat
+
+    if role is Role.HEALER:
+        vector[Attribute.PIETY.value] += piety_per_level[level]
+
+    return vector
+
+
+class StatBlock:
+    """Immutable attribute totals for a level, job, clan and set of gear.
+
+    Stat blocks are memoized on their inputs, so every iteration of a simulation, and every
+    simulation in the same process, shares a single instance for identical actors. Use
+    :func:`calculate_stat_block` to obtain one rather than instantiating this class directly.
+
+    Arguments:
+        key (Tuple): The level, job, role, clan and :func:`gear_key` the block was computed from.
+        values (numpy.ndarray): Attribute totals, indexed by :attr:`Attribute.value`.
+
+    Attributes:
+        key (Tuple): The level, job, role, clan and :func:`gear_key` the block was computed from.
+        values (numpy.ndarray): Read-only attribute totals, indexed by :attr:`Attribute.value`.
+    """
+
+    __slots__ = ('key', 'values', '_items', '_hash')
+
+    def __init__(self, key: StatBlockKey, values: numpy.ndarray) -> None:
+        values.setflags(write=False)
+
+        self.key: StatBlockKey = key
+        self.values: numpy.ndarray = values
+        self._items: Tuple[Tuple[Attribute, int], ...] = tuple(
+            (attribute, int(values[attribute.value])) for attribute in _attributes
+        )
+        self._hash = hash(key)
+
+    @property
+    def level(self) -> int:
+        return self.key[0]
+
+    @property
+    def job(self) -> Optional[Job]:
+        return self.key[1]
+
+    @property
+    def role(self) -> Optional[Role]:
+        return self.key[2]
+
+    @property
+    def race(self) -> Optional[Race]:
+        return self.key[3]
+
+    @property
+    def gear(self) -> GearKey:
+        return self.key[4]
+
+    def __getitem__(self, attribute: Attribute) -> int:
+        return int(self.values[attribute.value])
+
+    def as_dict(self) -> Dict[Attribute, int]:
+        """Return a new, mutable mapping of attributes to totals.
+
+        Actors start every iteration from one of these copies, so that buffs which modify stats
+        in place never leak back into the shared block.
+
+        Returns:
+            Dict[~simfantasy.enum.Attribute, int]: Mapping of every attribute to its total.
+        """
+        return dict(self._items)
+
+    def with_item(self, slot: Slot, item: Optional[Item]) -> 'StatBlock':
+        """Derive the block for the same actor with a single slot re-equipped.
+
+        Only the difference between the outgoing and incoming item is applied, which keeps gear
+        sweeps that swap one slot at a time from recomputing every other item.
+
+        Arguments:
+            slot (simfantasy.enum.Slot): The slot being changed.
+            item (Optional[simfantasy.equipment.Item]): The new item, or None to empty the slot.
+
+        Returns:
+            simfantasy.stat_block.StatBlock: The memoized block for the new gear.
+
+        Examples:
+            >>> bow = Weapon(370, 70, 104, 3.04, 105.38, {Attribute.DEXTERITY: 347})
+            >>> naked = calculate_stat_block(70, Job.BARD, Role.DPS, Race.HIGHLANDER, {})
+            >>> armed = naked.with_item(Slot.WEAPON, bow)
+            >>> armed[Attribute.DEXTERITY] - naked[Attribute.DEXTERITY]
+            347
+            >>> armed is calculate_stat_block(70, Job.BARD, Role.DPS, Race.HIGHLANDER,
+            ...                               {Slot.WEAPON: bow})
+            True
+        """
+        gear = dict(self.gear)
+        values = self.values.copy()
+
+        if slot.value in gear:
+            values -= _item_vector(gear.pop(slot.value))
+
+        if item is not None:
+            gear[slot.value] = item_key(item)
+            values += _item_vector(gear[slot.value])
+
+        key = self.key[:4] + (tuple(sorted(gear.items())),)
+
+        return _remember(key, lambda: values)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, StatBlock) and self.key == other.key
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    def __str__(self) -> str:
+        return '<{cls} job={job} race={race} level={level}>'.format(
+            cls=self.__class__.__name__,
+            job=self.job,
+            race=self.race,
+            level=self.level,
+        )
+
+
+_stat_blocks: 'OrderedDict[StatBlockKey, StatBlock]' = OrderedDict()
+
+stat_block_cache_size: int = 65536
+"""Maximum number of distinct stat blocks remembered before the least recently used is evicted."""
+
+
+def _remember(key: StatBlockKey, compute) -> StatBlock:
+    try:
+        stat_block = _stat_blocks[key]
+        _stat_blocks.move_to_end(key)
+    except KeyError:
+        stat_block = _stat_blocks[key] = StatBlock(key, compute())
+
+        while len(_stat_blocks) > stat_block_cache_size:
+            _stat_blocks.popitem(last=False)
+
+    return stat_block
+
+
+def calculate_stat_block(level: int, job: Optional[Job], role: Optional[Role],
+                         race: Optional[Race],
+                         gear: Mapping[Slot, Union[Item, Weapon]]) -> StatBlock:
+    """Get the stat block for an actor, computing it only if these inputs were never seen.
+
+    Base stats follow :meth:`simfantasy.actor.Actor.calculate_base_stats`, and gear bonuses follow
+    :meth:`simfantasy.actor.Actor.apply_gear_attribute_bonuses`.
+
+    Arguments:
+        level (int): Level of the actor.
+        job (Optional[simfantasy.enum.Job]): The actor's job specialization.
+        role (Optional[simfantasy.enum.Role]): The actor's role.
+        race (Optional[simfantasy.enum.Race]): Race and clan of the actor.
+        gear (Mapping[~simfantasy.enum.Slot, ~simfantasy.equipment.Item]): Equipped items.
+
+    Returns:
+        simfantasy.stat_block.StatBlock: The memoized block.
+
+    Examples:
+        >>> block = calculate_stat_block(70, Job.BARD, Role.DPS, Race.HIGHLANDER, {})
+        >>> block[Attribute.DEXTERITY], block[Attribute.CRITICAL_HIT]
+        (335, 364)
+        >>> block is calculate_stat_block(70, Job.BARD, Role.DPS, Race.HIGHLANDER, {})
+        True
+    """
+    key = (level, job, role, race, gear_key(gear))
+
+    def compute() -> numpy.ndarray:
+        values = _base_vector(level, job, role, race)
+
+        for _, key_for_item in key[4]:
+            values += _item_vector(key_for_item)
+
+        return values
+
+    return _remember(key, compute)
+
+
+def clear_stat_block_cache(keys: Iterable[StatBlockKey] = None) -> None:
+    """Forget memoized stat blocks.
+
+    Arguments:
+        keys (Optional[Iterable[Tuple]]): Specific keys to forget. Default: all of them.
+    """
+    if keys is None:
+        _stat_blocks.clear()
+    else:
+        for key in keys:
+            _stat_blocks.pop(key, None)
@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+"""Stat weights, i.e., the DPS gained per point of each attribute.
+
+Each attribute is raised by a small amount with a materia on one item, and every variant is
+simulated alongside the baseline with common random numbers, see
+:func:`~simfantasy.compare.common_random_numbers`. The gain is measured on the per-iteration
+difference to the baseline, which is far less noisy than the runs themselves, and the variants
+run in parallel processes, so a full set of weights costs about as much wall time as a single run.
+"""
+
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from copy import copy
+from typing import Dict, Hashable, Mapping, Optional, Sequence, Union
+
+import pandas as pd
+
+from simfantasy.compare import PairedComparison, common_random_numbers, equipped
+from simfantasy.enum import Attribute, Slot
+from simfantasy.equipment import Item, Materia, Weapon
+from simfantasy.simulator import Simulation
+from simfantasy.tiers import tier_index
+
+LOGGER = logging.getLogger(__name__)
+
+STAT_WEIGHT_ATTRIBUTES = (Attribute.DEXTERITY, Attribute.CRITICAL_HIT, Attribute.DIRECT_HIT,
+                          Attribute.DETERMINATION, Attribute.SKILL_SPEED)
+"""Attributes weighed by default. Weights are normalized to the first one."""
+
+_SIMULATION: Optional[Simulation] = None
+"""Simulation being weighed, inherited by forked worker processes."""
+
+
+def perturb(item: Union[Item, Weapon], attribute: Attribute, delta: int) -> Union[Item, Weapon]:
+    """Copy an item with an extra materia.
+
+    Arguments:
+        item (simfantasy.equipment.Item): The item.
+        attribute (simfantasy.enum.Attribute): Attribute of the materia.
+        delta (int): Bonus of the materia.
+
+    Returns:
+        simfantasy.equipment.Item: The copy.
+
+    Examples:
+        >>> ring = Item(370, Slot.RING, {Attribute.DEXTERITY: 149})
+        >>> [(materia.attribute.name, materia.bonus)
+        ...  for materia in perturb(ring, Attribute.CRITICAL_HIT, 50).melds]
+        [('CRITICAL_HIT', 50)]
+        >>> ring.melds
+        []
+    """
+    perturbed = copy(item)
+    perturbed.melds = [*item.melds, Materia(attribute, delta)]
+
+    return perturbed
+
+
+def _run(index: int, gear: Mapping[Slot, Union[Item, Weapon]],
+         sim: Simulation = None) -> pd.Series:
+    if sim is None:
+        sim = _SIMULATION
+
+    actor = sim.actors[index]
+
+    with equipped(actor, gear):
+        return sim.run(report=False).dps(actor.name)
+
+
+class StatWeights:
+    """DPS gained per point of each attribute.
+
+    Arguments:
+        comparisons (Dict[~simfantasy.enum.Attribute, simfantasy.compare.PairedComparison]):
+            Baseline against each raised attribute.
+        delta (int): Points added to each attribute.
+        to_next (Optional[Dict[~simfantasy.enum.Attribute, int]]): Points each attribute of the
+            baseline needs to reach its next tier.
+
+    Attributes:
+        comparisons (Dict[~simfantasy.enum.Attribute, simfantasy.compare.PairedComparison]):
+            Baseline against each raised attribute.
+        delta (int): Points added to each attribute.
+        to_next (Dict[~simfantasy.enum.Attribute, int]): Points each attribute of the baseline
+            needs to reach its next tier.
+    """
+
+    def __init__(self, comparisons: Dict[Attribute, PairedComparison], delta: int,
+                 to_next: Dict[Attribute, int] = None) -> None:
+        if to_next is None:
+            to_next = {}
+
+        self.comparisons: Dict[Attribute, PairedComparison] = comparisons
+        self.delta: int = delta
+        self.to_next: Dict[Attribute, int] = to_next
+
+    def table(self) -> pd.DataFrame:
+        """Tabulate the weights.
+
+        Returns:
+            pandas.DataFrame: DPS gained per point of each attribute, ``weight``, with the
+            half-width of its confidence interval, ``margin``, the weight relative to the
+            first attribute, ``normalized``, and the points the baseline needs to reach the next
+            tier, ``to_next``.
+        """
+        weights = pd.DataFrame({
+            'weight': [comparison.mean / self.delta for comparison in self.comparisons.values()],
+            'margin': [comparison.margin / self.delta for comparison in self.comparisons.values()],
+        }, index=pd.Index([attribute.name for attribute in self.comparisons], name='attribute'))
+
+        weights['normalized'] = weights['weight'] / weights['weight'].iloc[0]
+        weights['to_next'] = [self.to_next.get(attribute) for attribute in self.comparisons]
+
+        return weights
+
+    def report(self) -> None:
+        """Log the weights."""
+        comparison = next(iter(self.comparisons.values()))
+
+        LOGGER.info('Stat weights (+%s points, %s iterations, %s confidence):\n\n%s\n',
+                    self.delta, len(comparison.difference),
+                    format(comparison.confidence, '.0%'), self.table())
+
+
+def stat_weights(sim: Simulation, actor, attributes: Sequence[Attribute] = None,
+                 delta: int = None, slot: Slot = None, processes: int = None,
+                 report: bool = None) -> StatWeights:
+    """Measure the DPS an actor gains per point of each attribute.
+
+    Arguments:
+        sim (simfantasy.simulator.Simulation): The simulation.
+        actor (simfantasy.actor.Actor): The actor to weigh.
+        attributes (Optional[Sequence[~simfantasy.enum.Attribute]]): Attributes to weigh.
+            Default: :data:`STAT_WEIGHT_ATTRIBUTES`.
+        delta (Optional[int]): Points added to each attribute. Small enough to keep DPS roughly
+            linear, large enough to cross the tiers of attributes like skill speed. Default: 50.
+        slot (Optional[~simfantasy.enum.Slot]): Slot of the item that gets the extra materia.
+            Default: :data:`~simfantasy.enum.Slot.WEAPON`.
+        processes (Optional[int]): Number of worker processes. 1 runs every variant in this
+            process, as do platforms that can't fork. Default: one per variant, up to the number
+            of CPUs.
+        report (Optional[bool]): True to log the weights. Default: True.
+
+    Returns:
+        simfantasy.stat_weights.StatWeights: The weights.
+
+    Examples:
+        .. testsetup::
+            >>> from datetime import timedelta
+            >>> from simfantasy.actor import Actor
+            >>> from simfantasy.enum import Race
+            >>> from simfantasy.jobs.bard import Bard
+            >>> sim = Simulation(combat_length=timedelta(seconds=30), iterations=10, seed=3)
+            >>> enemy = Actor(sim, Race.ENEMY)
+            >>> bard = Bard(sim, Race.HIGHLANDER, target=enemy, gear={
+            ...     Slot.WEAPON: Weapon(370, 70, 104, 3.04, 105.38, {Attribute.DEXTERITY: 347})})
+
+        >>> weights = stat_weights(sim, bard, attributes=[Attribute.DEXTERITY], report=False)
+        >>> table = weights.table()
+        >>> table.columns.tolist(), table.index.tolist()
+        (['weight', 'margin', 'normalized', 'to_next'], ['DEXTERITY'])
+        >>> bool(table.loc['DEXTERITY', 'weight'] > table.loc['DEXTERITY', 'margin'])
+        True
+    """
+    global _SIMULATION
+
+    if attributes is None:
+        attributes = STAT_WEIGHT_ATTRIBUTES
+
+    if delta is None:
+        delta = 50
+
+    if slot is None:
+        slot = Slot.WEAPON
+
+    if report is None:
+        report = True
+
+    index = sim.actors.index(actor)
+    item = actor.gear[slot]
+
+    tiers = tier_index(actor.level)
+    baseline_block = actor.stat_block
+
+    # Every variant is simulated, rather than assumed to match the baseline when it stays in its
+    # tiers, so a weight never hides an effect that tiers miss, e.g., an undeclared stat buff.
+    variants: Dict[Hashable, Dict[Slot, Union[Item, Weapon]]] = {None: {}}
+    variants.update({attribute: {slot: perturb(item, attribute, delta)}
+                     for attribute in attributes})
+
+    if processes is None:
+        processes = min(len(variants), os.cpu_count() or 1)
+
+    with common_random_numbers(sim):
+        if processes == 1 or 'fork' not in multiprocessing.get_all_start_methods():
+            dps = {key: _run(index, gear, sim) for key, gear in variants.items()}
+        else:
+            # Workers inherit the simulation when forked, since its event queue can't be pickled.
+            _SIMULATION = sim
+
+            try:
+                with ProcessPoolExecutor(processes,
+                                         mp_context=multiprocessing.get_context('fork')) as pool:
+                    futures = {key: pool.submit(_run, index, gear)
+                               for key, gear in variants.items()}
+                    dps = {key: future.result() for key, future in futures.items()}
+            finally:
+                _SIMULATION = None
+
+    baseline = dps.pop(None)
+
+    weights = StatWeights({
+        attribute: PairedComparison(baseline, dps[attribute], confidence=sim.confidence)
+        for attribute in attributes
+    }, delta, {
+        attribute: tiers.points_to_next(attribute, baseline_block[attribute])
+        for attribute in attributes
+    })
+
+    if report is True:
+        weights.report()
+
+    return weights
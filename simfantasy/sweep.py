@@ -0,0 +1,514 @@
+# -*- coding: utf-8 -*-
+"""DPS over a range of combat lengths, from one long simulation.
+
+The damage dealt up to a moment of an encounter doesn't depend on how long the encounter lasts,
+save for the execute phase, see :attr:`~simfantasy.simulator.Simulation.in_execute`, which starts
+:attr:`~simfantasy.simulator.Simulation.execute_time` before the end. So
+:func:`sweep_combat_lengths` simulates each iteration once, to the longest length, and reads the
+damage of every shorter length off the prefix sums of its damage. Lengths that share an execute
+phase boundary share a run, and the others branch off the encounter just before their execute
+phase starts, see :meth:`~simfantasy.simulator.Simulation.branch`, and only run on to their own
+end. Lengths ``L1 < ... < Ln`` then cost about ``Ln + (n - 1) * execute_time`` of simulated
+combat, rather than ``L1 + ... + Ln``.
+
+An enemy with a health pool can die before a length is up, see
+:func:`~simfantasy.health.combat_lengths`. Each run then records when combat ended, and the
+lengths past that last only as long, as they would on their own.
+
+Real pulls don't all last the same, either. :func:`sweep_fight_lengths` takes a distribution of
+combat lengths, :class:`FightLengths`, sweeps its lengths, each with its own execute phase, and
+weighs their DPS by how likely they are.
+"""
+
+import logging
+import queue
+from datetime import datetime, timedelta
+from statistics import NormalDist
+from typing import Dict, List, Sequence
+
+import numpy
+import pandas as pd
+
+from simfantasy.simulator import Simulation
+
+LOGGER = logging.getLogger(__name__)
+
+
+def _end_combat(sim: Simulation, combat_length: timedelta) -> None:
+    """End a running encounter after a different combat length.
+
+    Arguments:
+        sim (simfantasy.simulator.Simulation): The simulation.
+        combat_length (datetime.timedelta): The new combat length.
+    """
+    from simfantasy.event import CombatEndEvent
+
+    sim.combat_length = combat_length
+
+    # Combat ends before anything else that happens at the same time, as it does in a run.
+    end = CombatEndEvent(sim)
+    end.timestamp = sim.start_time + combat_length
+    sim.events.put((end.timestamp, datetime.min, end))
+
+
+def _prefix_damage(sim: Simulation, records: Dict[str, List[Dict]],
+                   lengths: Sequence[timedelta]) -> Dict[str, numpy.ndarray]:
+    """Total the damage each actor dealt before each length.
+
+    Arguments:
+        sim (simfantasy.simulator.Simulation): The simulation.
+        records (Dict[str, List[Dict]]): Damage records of each actor, in the order they were
+            dealt.
+        lengths (Sequence[datetime.timedelta]): The combat lengths.
+
+    Returns:
+        Dict[str, numpy.ndarray]: Damage of each actor before each length.
+    """
+    seconds = [length.total_seconds() for length in lengths]
+    totals = {}
+
+    for actor in sim.actors:
+        actor_records = records[actor.name]
+        elapsed = numpy.fromiter((record['elapsed'] for record in actor_records), dtype=float,
+                                 count=len(actor_records))
+        damage = numpy.fromiter((record['damage'] for record in actor_records), dtype=float,
+                                count=len(actor_records))
+
+        # Damage dealt at the very end of an encounter isn't part of it, see _end_combat.
+        cumulative = numpy.concatenate(([0.0], numpy.cumsum(damage)))
+        totals[actor.name] = cumulative[numpy.searchsorted(elapsed, seconds, side='left')]
+
+    return totals
+
+
+class CombatLengthSweep:
+    """DPS of each actor at each of several combat lengths.
+
+    Arguments:
+        damage (pandas.DataFrame): Damage dealt by each actor, ``source``, before each length,
+            ``length``, in each iteration, ``iteration``, and the seconds combat lasted at that
+            length, ``seconds``.
+        confidence (Optional[float]): Confidence level of the intervals. Default: 0.95.
+
+    Attributes:
+        confidence (float): Confidence level of the intervals.
+        damage (pandas.DataFrame): Damage dealt by each actor before each length, in each
+            iteration, and the seconds combat lasted.
+    """
+
+    def __init__(self, damage: pd.DataFrame, confidence: float = None) -> None:
+        if confidence is None:
+            confidence = 0.95
+
+        self.confidence: float = confidence
+        self.damage: pd.DataFrame = damage
+
+    def dps(self, source: str = None) -> pd.DataFrame:
+        """Calculate the damage per second dealt in each iteration.
+
+        Arguments:
+            source (Optional[str]): Name of the actor to restrict damage to. Default: all actors.
+
+        Returns:
+            pandas.DataFrame: DPS, indexed by iteration, with a column for each length.
+        """
+        damage = self.damage if source is None else self.damage[self.damage['source'] == source]
+        seconds = damage.pivot_table(index='iteration', columns='length', values='seconds',
+                                     aggfunc='first')
+        damage = damage.pivot_table(index='iteration', columns='length', values='damage',
+                                    aggfunc='sum')
+
+        return damage / seconds
+
+    def table(self, source: str = None) -> pd.DataFrame:
+        """Tabulate mean DPS against combat length.
+
+        Arguments:
+            source (Optional[str]): Name of the actor to restrict damage to. Default: all actors.
+
+        Returns:
+            pandas.DataFrame: Mean DPS at each length, ``dps``, and the half-width of its
+            confidence interval, ``margin``.
+        """
+        dps = self.dps(source)
+        z = NormalDist().inv_cdf((1 + self.confidence) / 2)
+
+        return pd.DataFrame({
+            'dps': dps.mean(),
+            'margin': z * dps.std() / numpy.sqrt(len(dps)),
+        })
+
+    def report(self, source: str = None) -> None:
+        """Log mean DPS against combat length.
+
+        Arguments:
+            source (Optional[str]): Name of the actor to restrict damage to. Default: all actors.
+        """
+        LOGGER.info('DPS by combat length (%s iterations, %s confidence):\n\n%s\n',
+                    self.damage['iteration'].nunique(), format(self.confidence, '.0%'),
+                    self.table(source))
+
+
+def sweep_combat_lengths(sim: Simulation, lengths: Sequence[timedelta],
+                         report: bool = None) -> CombatLengthSweep:
+    """Measure DPS at several combat lengths at once.
+
+    Every length runs :attr:`~simfantasy.simulator.Simulation.iterations` iterations, without
+    stopping early for a ``target_error``. Lengths behave exactly as if they were each run on their
+    own, even when an enemy dies before they are up, and with common random numbers, see
+    :class:`~simfantasy.rng.RandomStreams`, they even draw the same random numbers.
+
+    Arguments:
+        sim (simfantasy.simulator.Simulation): The simulation. Its ``combat_length`` is ignored.
+        lengths (Sequence[datetime.timedelta]): The combat lengths.
+        report (Optional[bool]): True to log the table. Default: True.
+
+    Returns:
+        simfantasy.sweep.CombatLengthSweep: DPS at each length.
+
+    Examples:
+        .. testsetup::
+            >>> from simfantasy.actor import Actor
+            >>> from simfantasy.enum import Attribute, Race, Slot
+            >>> from simfantasy.equipment import Weapon
+            >>> from simfantasy.jobs.bard import Bard
+            >>> sim = Simulation(iterations=5, execute_time=timedelta(seconds=10),
+            ...                  common_random_numbers=True, seed=5)
+            >>> enemy = Actor(sim, Race.ENEMY)
+            >>> bard = Bard(sim, Race.HIGHLANDER, target=enemy, gear={
+            ...     Slot.WEAPON: Weapon(370, 70, 104, 3.04, 105.38, {Attribute.DEXTERITY: 347})})
+
+        >>> lengths = [timedelta(seconds=seconds) for seconds in (20, 30, 45)]
+        >>> sweep = sweep_combat_lengths(sim, lengths, report=False)
+        >>> sweep.table().columns.tolist(), len(sweep.table())
+        (['dps', 'margin'], 3)
+
+        The same as a run of just one of the lengths:
+
+        >>> sim.combat_length = timedelta(seconds=30)
+        >>> run = sim.run(report=False).dps(bard.name)
+        >>> numpy.allclose(sweep.dps(bard.name)[timedelta(seconds=30)], run)
+        True
+
+        Including when the enemy dies first:
+
+        >>> bard.target = Actor(sim, Race.ENEMY, health=25000)
+        >>> sweep = sweep_combat_lengths(sim, lengths, report=False)
+        >>> sim.combat_length = timedelta(seconds=45)
+        >>> results = sim.run(report=False)
+        >>> bool((results.durations < 45).all())
+        True
+        >>> numpy.allclose(sweep.dps(bard.name)[timedelta(seconds=45)], results.dps(bard.name))
+        True
+    """
+    if report is None:
+        report = True
+
+    lengths = sorted(set(lengths))
+    longest = lengths[-1]
+
+    # Lengths whose execute phases start at the same time share a run, up to the longest of them.
+    groups: Dict[timedelta, List[timedelta]] = {}
+
+    for length in lengths:
+        groups.setdefault(max(length - sim.execute_time, timedelta()), []).append(length)
+
+    trunk = groups.pop(max(longest - sim.execute_time, timedelta()))
+
+    combat_length = sim.combat_length
+    sim.combat_length = longest
+    sim._reset_random()  # pylint: disable=protected-access
+
+    rows: List[Dict] = []
+
+    def collect(records: Dict[str, List[Dict]], group: List[timedelta]) -> None:
+        # An enemy with a health pool can die first, and combat then lasted only until then.
+        ended = sim.current_time - sim.start_time
+
+        for source, damage in _prefix_damage(sim, records, group).items():
+            rows.extend({'iteration': iteration, 'source': source, 'length': length,
+                         'damage': total, 'seconds': min(length, ended).total_seconds()}
+                        for length, total in zip(group, damage))
+
+    try:
+        for iteration in range(sim.iterations):
+            sim.events = queue.PriorityQueue()
+            sim._start_iteration(iteration)  # pylint: disable=protected-access
+
+            for boundary, group in sorted(groups.items()):
+                sim._process_events(until=sim.start_time + boundary)  # pylint: disable=W0212
+
+                # Combat is already over, the same for this group as for the longest lengths.
+                if sim.events.empty():
+                    collect({actor.name: actor.statistics['damage'] for actor in sim.actors},
+                            group)
+                    continue
+
+                with sim.branch():
+                    _end_combat(sim, group[-1])
+                    sim._process_events()  # pylint: disable=protected-access
+
+                    collect({actor.name: actor.statistics['damage'] for actor in sim.actors},
+                            group)
+
+            sim._process_events()  # pylint: disable=protected-access
+
+            collect({actor.name: actor.statistics['damage'] for actor in sim.actors}, trunk)
+    finally:
+        sim.combat_length = combat_length
+
+    sweep = CombatLengthSweep(pd.DataFrame(rows), confidence=sim.confidence)
+
+    if report is True:
+        sweep.report()
+
+    return sweep
+
+
+class FightLengths:
+    """A distribution of combat lengths.
+
+    Arguments:
+        lengths (Sequence[datetime.timedelta]): The combat lengths.
+        weights (Optional[Sequence[float]]): How likely each length is, relative to the others.
+            Default: equally likely.
+
+    Attributes:
+        lengths (List[datetime.timedelta]): The distinct combat lengths, in order.
+        weights (numpy.ndarray): Probability of each length.
+
+    Examples:
+        >>> fight_lengths = FightLengths([timedelta(seconds=30), timedelta(seconds=60),
+        ...                               timedelta(seconds=30)])
+        >>> [str(length) for length in fight_lengths.lengths], fight_lengths.weights.round(3)
+        (['0:00:30', '0:01:00'], array([0.667, 0.333]))
+        >>> fight_lengths.mean
+        datetime.timedelta(seconds=40)
+    """
+
+    def __init__(self, lengths: Sequence[timedelta], weights: Sequence[float] = None) -> None:
+        if weights is None:
+            weights = [1.0] * len(lengths)
+
+        if len(weights) != len(lengths):
+            raise ValueError('Expected a weight for each of {0} combat lengths, got {1}.'.format(
+                len(lengths), len(weights)))
+
+        if any(length <= timedelta() for length in lengths) or any(w < 0 for w in weights) or \
+                sum(weights) <= 0:
+            raise ValueError('Combat lengths must be positive, and weights non-negative.')
+
+        totals: Dict[timedelta, float] = {}
+
+        for length, weight in zip(lengths, weights):
+            if weight > 0:
+                totals[length] = totals.get(length, 0.0) + weight
+
+        self.lengths: List[timedelta] = sorted(totals)
+        self.weights: numpy.ndarray = numpy.array([totals[length] for length in self.lengths])
+        self.weights /= self.weights.sum()
+
+    @classmethod
+    def normal(cls, mean: timedelta, deviation: timedelta,
+               step: timedelta = None) -> 'FightLengths':
+        """Discretize a normal distribution of combat lengths.
+
+        Lengths are spaced ``step`` apart, out to three deviations either side of the mean, and
+        each carries the probability of the lengths that round to it.
+
+        Arguments:
+            mean (datetime.timedelta): Mean combat length.
+            deviation (datetime.timedelta): Standard deviation of the combat length.
+            step (Optional[datetime.timedelta]): Spacing of the lengths. Default: 5 seconds.
+
+        Returns:
+            simfantasy.sweep.FightLengths: The distribution.
+
+        Examples:
+            >>> fight_lengths = FightLengths.normal(timedelta(minutes=5), timedelta(seconds=10))
+            >>> len(fight_lengths.lengths), fight_lengths.lengths[0], fight_lengths.lengths[-1]
+            (13, datetime.timedelta(seconds=270), datetime.timedelta(seconds=330))
+            >>> round(fight_lengths.weights.sum(), 6)
+            1.0
+        """
+        if step is None:
+            step = timedelta(seconds=5)
+
+        distribution = NormalDist(mean.total_seconds(), deviation.total_seconds())
+        width = step.total_seconds()
+        count = int(3 * deviation / step)
+        lengths = [mean + step * offset for offset in range(-count, count + 1)]
+        lengths = [length for length in lengths if length > timedelta()]
+
+        # The outermost lengths take the tails as well.
+        edges = [length.total_seconds() + width / 2 for length in lengths[:-1]]
+        cdf = [0.0, *(distribution.cdf(edge) for edge in edges), 1.0]
+
+        return cls(lengths, numpy.diff(cdf))
+
+    @property
+    def mean(self) -> timedelta:
+        """The mean combat length."""
+        return timedelta(seconds=float(numpy.dot(
+            [length.total_seconds() for length in self.lengths], self.weights)))
+
+    def sample(self, size: int, generator: numpy.random.Generator) -> List[timedelta]:
+        """Draw combat lengths.
+
+        Arguments:
+            size (int): Number of lengths to draw.
+            generator (numpy.random.Generator): Where to draw them from.
+
+        Returns:
+            List[datetime.timedelta]: The lengths.
+        """
+        return [self.lengths[index]
+                for index in generator.choice(len(self.lengths), size=size, p=self.weights)]
+
+
+class FightLengthSweep(CombatLengthSweep):
+    """DPS of each actor over a distribution of combat lengths.
+
+    Every iteration is simulated at each of the distribution's lengths, and also draws a length
+    of its own, as a pull would. :meth:`weighted_dps` averages each iteration's DPS over the
+    distribution, and is the better estimate of the mean, as it doesn't add the spread of the
+    drawn lengths to the spread of the damage. :meth:`sampled_dps` keeps that spread in, for the
+    range of DPS individual pulls see.
+
+    Arguments:
+        damage (pandas.DataFrame): Damage dealt by each actor, ``source``, before each length,
+            ``length``, in each iteration, ``iteration``.
+        fight_lengths (simfantasy.sweep.FightLengths): The distribution of combat lengths.
+        sampled (pandas.Series): Combat length drawn for each iteration.
+        confidence (Optional[float]): Confidence level of the intervals. Default: 0.95.
+
+    Attributes:
+        confidence (float): Confidence level of the intervals.
+        damage (pandas.DataFrame): Damage dealt by each actor before each length, in each
+            iteration.
+        fight_lengths (simfantasy.sweep.FightLengths): The distribution of combat lengths.
+        sampled (pandas.Series): Combat length drawn for each iteration.
+    """
+
+    def __init__(self, damage: pd.DataFrame, fight_lengths: FightLengths, sampled: pd.Series,
+                 confidence: float = None) -> None:
+        super().__init__(damage, confidence)
+
+        self.fight_lengths: FightLengths = fight_lengths
+        self.sampled: pd.Series = sampled
+
+    def weighted_dps(self, source: str = None) -> pd.Series:
+        """Average the DPS of each iteration over the distribution of combat lengths.
+
+        Arguments:
+            source (Optional[str]): Name of the actor to restrict damage to. Default: all actors.
+
+        Returns:
+            pandas.Series: Expected DPS, indexed by iteration.
+        """
+        dps = self.dps(source)[self.fight_lengths.lengths]
+
+        return pd.Series(dps.to_numpy() @ self.fight_lengths.weights, index=dps.index)
+
+    def sampled_dps(self, source: str = None) -> pd.Series:
+        """Calculate the DPS of each iteration at the combat length it drew.
+
+        Arguments:
+            source (Optional[str]): Name of the actor to restrict damage to. Default: all actors.
+
+        Returns:
+            pandas.Series: DPS, indexed by iteration.
+        """
+        dps = self.dps(source)
+        sampled = self.sampled[dps.index]
+        columns = dps.columns.get_indexer(sampled)
+
+        return pd.Series(dps.to_numpy()[numpy.arange(len(dps)), columns], index=dps.index)
+
+    def summary(self, source: str = None) -> pd.DataFrame:
+        """Tabulate mean DPS over the distribution of combat lengths.
+
+        Arguments:
+            source (Optional[str]): Name of the actor to restrict damage to. Default: all actors.
+
+        Returns:
+            pandas.DataFrame: Mean DPS, ``dps``, and the half-width of its confidence interval,
+            ``margin``, weighted over the distribution, ``weighted``, and at the drawn lengths,
+            ``sampled``.
+        """
+        z = NormalDist().inv_cdf((1 + self.confidence) / 2)
+        rows = {'weighted': self.weighted_dps(source), 'sampled': self.sampled_dps(source)}
+
+        return pd.DataFrame({
+            'dps': {name: dps.mean() for name, dps in rows.items()},
+            'margin': {name: z * dps.std() / numpy.sqrt(len(dps)) for name, dps in rows.items()},
+        })
+
+    def report(self, source: str = None) -> None:
+        """Log mean DPS over the distribution of combat lengths, and at each length.
+
+        Arguments:
+            source (Optional[str]): Name of the actor to restrict damage to. Default: all actors.
+        """
+        super().report(source)
+
+        LOGGER.info('DPS over combat lengths of %s on average:\n\n%s\n',
+                    self.fight_lengths.mean, self.summary(source))
+
+
+def sweep_fight_lengths(sim: Simulation, fight_lengths: FightLengths,
+                        report: bool = None) -> FightLengthSweep:
+    """Measure DPS over a distribution of combat lengths.
+
+    Each iteration is one timeline, simulated to the longest length and cut short at the others,
+    see :func:`sweep_combat_lengths`, so each length's execute phase still starts
+    :attr:`~simfantasy.simulator.Simulation.execute_time` before its own end.
+
+    Arguments:
+        sim (simfantasy.simulator.Simulation): The simulation. Its ``combat_length`` is ignored.
+        fight_lengths (simfantasy.sweep.FightLengths): The distribution of combat lengths.
+        report (Optional[bool]): True to log the tables. Default: True.
+
+    Returns:
+        simfantasy.sweep.FightLengthSweep: DPS over the distribution.
+
+    Examples:
+        .. testsetup::
+            >>> from simfantasy.actor import Actor
+            >>> from simfantasy.enum import Attribute, Race, Slot
+            >>> from simfantasy.equipment import Weapon
+            >>> from simfantasy.jobs.bard import Bard
+            >>> sim = Simulation(iterations=5, execute_time=timedelta(seconds=10), seed=5)
+            >>> enemy = Actor(sim, Race.ENEMY)
+            >>> bard = Bard(sim, Race.HIGHLANDER, target=enemy, gear={
+            ...     Slot.WEAPON: Weapon(370, 70, 104, 3.04, 105.38, {Attribute.DEXTERITY: 347})})
+
+        Pulls that last 20 seconds one time in four, and 30 seconds otherwise:
+
+        >>> fight_lengths = FightLengths([timedelta(seconds=20), timedelta(seconds=30)], [1, 3])
+        >>> sweep = sweep_fight_lengths(sim, fight_lengths, report=False)
+        >>> sweep.summary().index.tolist()
+        ['weighted', 'sampled']
+        >>> by_length = sweep.dps(bard.name).mean()
+        >>> expected = numpy.dot(by_length[fight_lengths.lengths], [0.25, 0.75])
+        >>> bool(numpy.isclose(sweep.weighted_dps(bard.name).mean(), expected))
+        True
+        >>> sweep.sampled.isin(fight_lengths.lengths).all()
+        True
+    """
+    if report is None:
+        report = True
+
+    sweep = sweep_combat_lengths(sim, fight_lengths.lengths, report=False)
+
+    # Drawn apart from the encounter's own random numbers, which stay the same as in a sweep.
+    generator = numpy.random.default_rng(sim.seed)
+    sampled = pd.Series(fight_lengths.sample(sim.iterations, generator),
+                        index=pd.RangeIndex(sim.iterations, name='iteration'))
+
+    result = FightLengthSweep(sweep.damage, fight_lengths, sampled, confidence=sim.confidence)
+
+    if report is True:
+        result.report()
+
+    return result
@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+"""Tiers of attribute values, i.e., ranges of values that every formula treats the same.
+
+Every formula that reads a secondary or main attribute, e.g., :attr:`DamageEvent.damage
+<simfantasy.event.DamageEvent.damage>`, :attr:`~simfantasy.event.DamageEvent.critical_hit_chance`,
+:attr:`~simfantasy.event.DamageEvent.direct_hit_chance` or
+:func:`~simfantasy.action.action_speed`, only depends on ``floor(multiplier * (value - offset) /
+divisor)``. Values with the same floor are one tier, and gear sets whose attributes fall in the
+same tiers deal exactly the same damage, so they only need to be simulated once.
+
+Auras can multiply attributes during combat, e.g., :class:`~simfantasy.jobs.bard.StraightShotBuff`
+raises critical hit by 10%, and two values in one tier can fall in different tiers once
+multiplied. Tier vectors therefore include the tiers of the multiplied values of the actor's
+:attr:`~simfantasy.actor.Actor.stat_buffs`.
+"""
+
+from functools import lru_cache
+from itertools import combinations
+from math import floor, prod
+from typing import Dict, Optional, Sequence, TYPE_CHECKING, Tuple, Type, Union
+
+import numpy
+
+from simfantasy.common_math import divisor_per_level, main_stat_per_level, sub_stat_per_level
+from simfantasy.enum import Attribute
+from simfantasy.stat_block import StatBlock
+
+if TYPE_CHECKING:
+    from simfantasy.aura import Aura
+
+TierVector = Tuple[int, ...]
+
+_attributes: Tuple[Attribute, ...] = tuple(Attribute)
+
+
+@lru_cache(maxsize=None)
+def stat_multipliers(buffs: Tuple[Type['Aura'], ...]) -> Tuple[Tuple[Attribute, float], ...]:
+    """Find every multiplier that a combination of auras can apply to each attribute.
+
+    Arguments:
+        buffs (Tuple[Type[simfantasy.aura.Aura], ...]): Aura classes with
+            :attr:`~simfantasy.aura.Aura.stat_multipliers`, e.g., an actor's
+            :attr:`~simfantasy.actor.Actor.stat_buffs`.
+
+    Returns:
+        Tuple[Tuple[~simfantasy.enum.Attribute, float], ...]: Pairs of attribute and combined
+        multiplier, for every non-empty combination of the auras that multiply the attribute.
+
+    Examples:
+        >>> from simfantasy.jobs.bard import StraightShotBuff
+        >>> stat_multipliers((StraightShotBuff,))
+        ((<Attribute.CRITICAL_HIT: 6>, 1.1),)
+    """
+    factors: Dict[Attribute, list] = {}
+
+    for buff in buffs:
+        for attribute, multiplier in (buff.stat_multipliers or {}).items():
+            factors.setdefault(attribute, []).append(multiplier)
+
+    return tuple(
+        (attribute, prod(combination))
+        for attribute in sorted(factors, key=lambda attribute: attribute.value)
+        for size in range(1, len(factors[attribute]) + 1)
+        for combination in combinations(factors[attribute], size)
+    )
+
+
+class TierIndex:
+    """Tiers of every attribute at a level.
+
+    Attributes without a tiered formula, e.g., :data:`~simfantasy.enum.Attribute.VITALITY`, are
+    their own tiers, one per point.
+
+    Arguments:
+        level (Optional[int]): Level of the actor. Default: 70.
+
+    Attributes:
+        formulas (Dict[~simfantasy.enum.Attribute, Tuple[int, int, int]]): Multiplier, offset and
+            divisor of each tiered attribute.
+        level (int): Level of the actor.
+
+    Examples:
+        >>> index = TierIndex(70)
+        >>> index.tier(Attribute.CRITICAL_HIT, 1493), index.tier(Attribute.CRITICAL_HIT, 1503)
+        (104, 104)
+        >>> index.next_breakpoint(Attribute.CRITICAL_HIT, 1500)
+        1504
+        >>> index.points_to_next(Attribute.CRITICAL_HIT, 1500)
+        4
+        >>> index.floor(Attribute.CRITICAL_HIT, 1500)
+        1493
+        >>> index.points_to_next(Attribute.VITALITY, 1500)
+        1
+    """
+
+    def __init__(self, level: int = None) -> None:
+        if level is None:
+            level = 70
+
+        main_stat = int(main_stat_per_level[level])
+        sub_stat = int(sub_stat_per_level[level])
+        divisor = int(divisor_per_level[level])
+
+        self.level: int = level
+        self.formulas: Dict[Attribute, Tuple[int, int, int]] = {
+            Attribute.STRENGTH: (125, 292, 292),
+            Attribute.DEXTERITY: (125, 292, 292),
+            Attribute.INTELLIGENCE: (125, 292, 292),
+            Attribute.MIND: (125, 292, 292),
+            Attribute.CRITICAL_HIT: (200, sub_stat, divisor),
+            Attribute.DETERMINATION: (130, main_stat, divisor),
+            Attribute.DIRECT_HIT: (550, sub_stat, divisor),
+            Attribute.SKILL_SPEED: (130, sub_stat, divisor),
+            Attribute.SPELL_SPEED: (130, sub_stat, divisor),
+            Attribute.TENACITY: (100, sub_stat, divisor),
+        }
+
+    def tier(self, attribute: Attribute, value: int) -> int:
+        """Find the tier of an attribute value.
+
+        Arguments:
+            attribute (simfantasy.enum.Attribute): The attribute.
+            value (int): The value.
+
+        Returns:
+            int: The tier.
+        """
+        formula = self.formulas.get(attribute)
+
+        if formula is None:
+            return floor(value)
+
+        multiplier, offset, divisor = formula
+
+        # Values multiplied by an aura aren't whole, and are floored as the formulas do.
+        if value != int(value):
+            return floor(multiplier * (value - offset) / divisor)
+
+        # Exact integer division, which agrees with the floats in the formulas, since no quotient
+        # there comes within rounding error of an integer without being one.
+        return multiplier * (int(value) - offset) // divisor
+
+    def breakpoint(self, attribute: Attribute, tier: int) -> int:
+        """Find the lowest value of an attribute in a tier.
+
+        Arguments:
+            attribute (simfantasy.enum.Attribute): The attribute.
+            tier (int): The tier.
+
+        Returns:
+            int: The value.
+        """
+        formula = self.formulas.get(attribute)
+
+        if formula is None:
+            return tier
+
+        multiplier, offset, divisor = formula
+
+        return offset - (-tier * divisor // multiplier)
+
+    def floor(self, attribute: Attribute, value: int) -> int:
+        """Find the lowest value of an attribute that is as good as a value.
+
+        Arguments:
+            attribute (simfantasy.enum.Attribute): The attribute.
+            value (int): The value.
+
+        Returns:
+            int: The lowest value in the same tier.
+        """
+        return self.breakpoint(attribute, self.tier(attribute, value))
+
+    def next_breakpoint(self, attribute: Attribute, value: int) -> int:
+        """Find the lowest value of an attribute that is better than a value.
+
+        Arguments:
+            attribute (simfantasy.enum.Attribute): The attribute.
+            value (int): The value.
+
+        Returns:
+            int: The lowest value in the next tier.
+        """
+        return self.breakpoint(attribute, self.tier(attribute, value) + 1)
+
+    def points_to_next(self, attribute: Attribute, value: int) -> int:
+        """Count the points an attribute value needs to reach the next tier.
+
+        Arguments:
+            attribute (simfantasy.enum.Attribute): The attribute.
+            value (int): The value.
+
+        Returns:
+            int: The number of points.
+        """
+        return self.next_breakpoint(attribute, value) - int(value)
+
+    def tiers(self, stats: Union[StatBlock, numpy.ndarray],
+              buffs: Sequence[Type['Aura']] = None) -> TierVector:
+        """Canonicalize attribute totals to their tiers.
+
+        Arguments:
+            stats (Union[simfantasy.stat_block.StatBlock, numpy.ndarray]): A stat block, or
+                attribute totals indexed by :attr:`Attribute.value`.
+            buffs (Optional[Sequence[Type[simfantasy.aura.Aura]]]): Auras that can multiply the
+                attributes during combat, e.g., the actor's
+                :attr:`~simfantasy.actor.Actor.stat_buffs`. Default: None.
+
+        Returns:
+            Tuple[int, ...]: The tier of every attribute, in :class:`~simfantasy.enum.Attribute`
+            order, followed by the tiers of the multiplied attributes, see
+            :func:`stat_multipliers`.
+
+        Examples:
+            >>> from simfantasy.enum import Job, Race, Role, Slot
+            >>> from simfantasy.equipment import Item
+            >>> from simfantasy.stat_block import calculate_stat_block
+            >>> block = calculate_stat_block(70, Job.BARD, Role.DPS, Race.HIGHLANDER, {})
+            >>> index = TierIndex(70)
+            >>> ring = Item(370, Slot.RING, {Attribute.CRITICAL_HIT: 5})
+            >>> index.tiers(block.with_item(Slot.RING, ring)) == index.tiers(block)
+            True
+
+            Values in one tier can fall in different tiers once multiplied by an aura:
+
+            >>> from simfantasy.jobs.bard import StraightShotBuff
+            >>> block = block.with_item(Slot.RING, Item(370, Slot.RING,
+            ...                                         {Attribute.CRITICAL_HIT: 1237}))
+            >>> ring = Item(370, Slot.RING, {Attribute.CRITICAL_HIT: 1240})
+            >>> index.tiers(block.with_item(Slot.RING, ring)) == index.tiers(block)
+            True
+            >>> (index.tiers(block.with_item(Slot.RING, ring), (StraightShotBuff,)) ==
+            ...  index.tiers(block, (StraightShotBuff,)))
+            False
+        """
+        values = stats.values if isinstance(stats, StatBlock) else stats
+        tiers = tuple(self.tier(attribute, values[attribute.value]) for attribute in _attributes)
+
+        if not buffs:
+            return tiers
+
+        return tiers + tuple(self.tier(attribute, values[attribute.value] * multiplier)
+                             for attribute, multiplier in stat_multipliers(tuple(buffs)))
+
+
+@lru_cache(maxsize=None)
+def tier_index(level: Optional[int] = None) -> TierIndex:
+    """Get the shared tier index of a level.
+
+    Arguments:
+        level (Optional[int]): Level of the actor. Default: 70.
+
+    Returns:
+        simfantasy.tiers.TierIndex: The index.
+    """
+    return TierIndex(level)